@@ -0,0 +1,467 @@
+"""GUI-free assistant engine.
+
+Everything the assistant does between receiving a message and showing the
+answer lives here: loading the spaCy model and the catalog, extracting
+items, matching them to shelves and wording the reply. The Tk app, the
+headless resolver and the HTTP service all share it.
+"""
+import json
+import random
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from catalog_index import CatalogIndex, get_catalog_index, plural_variants
+from catalog_reload import Catalog
+from compiled_catalog import is_compiled_catalog, open_compiled_catalog
+from intent_router import (CLEAR_LIST, GREETING, HELP, PRINT_LIST, PRODUCT, REMOVE_ITEMS, SHOW_LIST, THANKS,
+                           IntentRouter, removal_target)
+from phrase_matcher import tokenize
+from lexicon_extractor import LexiconExtractor
+from query_cache import MAX_CACHED_QUERIES, QueryCache
+from rule_extractor import rule_extract_items
+from stage_metrics import StageMetrics
+from stock_feed import StockSnapshot
+
+# spaCy model (or LexiconExtractor), loaded lazily by load_nlp() so callers decide when to pay for it
+nlp = None
+_nlp_lock = threading.Lock()
+
+# Extraction backends: the spaCy pipeline, or lexicon_extractor for kiosks without the memory for it
+EXTRACTORS = ["spacy", "lexicon"]
+extractor = "spacy"
+
+# Catalog the lexicon backend takes its vocabulary from (kept current by AssistantEngine.swap_catalog)
+_extraction_catalog = None
+
+MODEL_MISSING_MESSAGE = "spaCy model 'en_core_web_sm' not found. Please install it:\npython -m spacy download en_core_web_sm"
+
+# Pipeline components extract_items never reads (it only needs POS tags, lemmas and stop words)
+UNUSED_PIPES = ["parser", "ner"]
+
+THANK_YOU_RESPONSES = [
+    "You're very welcome! 😊 I'm always happy to help you find what you need. Have a wonderful shopping experience! 🛒✨",
+    "My pleasure! 🌟 Thank you for using our smart shopping assistant. Hope you found everything you needed! Come back anytime! 👋",
+    "You're most welcome! 🤗 It was great helping you today. Enjoy your shopping and have a fantastic day! 🎉",
+    "Glad I could help! 😄 Thanks for choosing our AI assistant. Wishing you a pleasant shopping trip! 🛍️"
+]
+
+GREETING_RESPONSES = [
+    "Hello there! 😊 How can I help you with your shopping today? Just tell me what you're looking for! 🛒",
+    "Hi! Nice to meet you! 👋 What items can I help you locate in our store today?",
+    "Greetings! 🌟 I'm ready to help you find anything in our store! What do you need?"
+]
+
+HELP_RESPONSE = "🤖 I can help you find products in our store!\n\n• Tell me what you need: 'I need apples and milk'\n• Ask where something is: 'Where can I find bread?'\n• Add quantities: 'I need 3 apples'\n• Say 'remove milk' to take something off your list\n• Say 'show my list', 'print my list' or 'start over' to manage your shopping list"
+
+# Replies to list commands; the client performs the matching reply["action"]
+LIST_COMMAND_RESPONSES = {
+    SHOW_LIST: "📋 Here's your shopping list!",
+    PRINT_LIST: "🖨️ Saving your shopping list...",
+    CLEAR_LIST: "🗑️ Starting a new session..."
+}
+
+REMOVE_UNCLEAR_RESPONSE = "🤔 Which item should I take off your list? Try something like 'remove milk'."
+
+# Number words understood in front of an item ("two apples")
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "twelve": 12, "dozen": 12
+}
+
+# Units allowed between a number and its item ("2 bags of rice")
+QUANTITY_UNITS = frozenset("""
+bag bags bottle bottles box boxes can cans carton cartons jar jars pack packs packet packets
+loaf loaves tin tins tub tubs kg kilo kilos kilograms litre litres liter liters dozen bunch bunches
+""".split())
+
+WARMING_UP_RESPONSE = "⏳ I'm still warming up and loading our store layout.\n\nPlease ask me again in a moment!"
+
+HELPFUL_RESPONSES = [
+    "I couldn't identify any specific items from your message. 🤔\n\nCould you please mention what you're looking for? For example:\n• 'I need apples and milk'\n• 'Where can I find bread?'\n• 'Looking for cleaning supplies'",
+    "I'm not sure what items you're looking for. 😅\n\nTry being more specific about the products you need. I can help you find anything from fruits to cleaning supplies!",
+    "Hmm, I didn't catch any product names there. 🧐\n\nJust tell me what items you want to buy, and I'll show you exactly where to find them!"
+]
+
+ACKNOWLEDGMENTS = [
+    "Perfect! Let me help you find those items right away! 🔍",
+    "Great choice! I'll locate those items for you instantly! ⚡",
+    "Excellent! Let me check our store layout for you! 📍",
+    "Sure thing! Finding the best locations for your items! 🎯"
+]
+
+FOLLOWUP_QUESTIONS = [
+    "Anything else you'd like to add to your shopping list? 🛍️",
+    "Is there anything else you're looking for today? 😊",
+    "Would you like me to help you find any other items? 🤔",
+    "Any other products you need help locating? 📦",
+    "What else can I help you find in our store? 🛒"
+]
+
+CATEGORY_ICONS = {
+    "fruits": "🍎", "dairy": "🥛", "bakery": "🍞", "stationary": "📝",
+    "cleaning": "🧽", "beverages": "☕", "snacks": "🍿", "eggs": "🥚",
+    "frozen": "🧊", "vegetables": "🥬", "canned": "🥫", "spices": "🧂"
+}
+
+# Choose the backend load_nlp() loads; it cannot change once one is loaded
+def select_extractor(name: str):
+    global extractor
+    if name not in EXTRACTORS:
+        raise ValueError(f"unknown extractor {name!r} (choose from {', '.join(EXTRACTORS)})")
+    with _nlp_lock:
+        if nlp is not None and name != extractor:
+            raise RuntimeError(f"the {extractor} extractor is already loaded")
+        extractor = name
+
+# Load the selected backend (for spaCy this raises OSError if the model is not installed)
+def load_nlp():
+    global nlp
+    with _nlp_lock:
+        if nlp is None:
+            if extractor == "lexicon":
+                nlp = LexiconExtractor(_extraction_catalog)
+            else:
+                import spacy
+                nlp = spacy.load("en_core_web_sm")
+    return nlp
+
+# Give the lexicon backend the words of a new catalog
+def set_extraction_catalog(products_db: Dict):
+    global _extraction_catalog
+    _extraction_catalog = products_db
+    model = nlp
+    if isinstance(model, LexiconExtractor):
+        model.set_catalog(products_db)
+
+def nlp_loaded() -> bool:
+    return nlp is not None
+
+# Read product database (raises FileNotFoundError); compiled catalogs are opened with mmap
+def read_products(path: str = 'products.json') -> Dict:
+    if is_compiled_catalog(path):
+        return open_compiled_catalog(path)
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def _items_from_doc(doc) -> List[str]:
+    items = []
+    for token in doc:
+        if token.pos_ in ["NOUN", "PROPN"] and not token.is_stop and not token.is_space:
+            items.append(token.lemma_)  # Use lemma for better matching
+    return list(set(items))
+
+# Extract nouns from user input using NLP (rule-based until the model has loaded)
+def extract_items(text: str) -> List[str]:
+    model = nlp
+    if model is None:
+        return rule_extract_items(text)
+    if isinstance(model, LexiconExtractor):
+        return model.extract(text)
+    doc = model(text.lower())
+    return _items_from_doc(doc)
+
+# Stream many utterances through nlp.pipe, yielding (text, items) pairs in input order
+def iter_extract_items(texts: Iterable[str], batch_size: int = 256, n_process: int = 1) -> Iterator[Tuple[str, List[str]]]:
+    model = load_nlp()
+    if isinstance(model, LexiconExtractor):
+        # No pipeline to batch through; the lexicon is fast enough one text at a time
+        for text in texts:
+            yield text, model.extract(text)
+        return
+    disabled = [name for name in UNUSED_PIPES if name in model.pipe_names]
+    pairs = ((text.lower(), text) for text in texts)
+    for doc, text in model.pipe(pairs, as_tuples=True, batch_size=batch_size,
+                              n_process=n_process, disable=disabled):
+        yield text, _items_from_doc(doc)
+
+# Batch version of extract_items: one list of items per input utterance
+def extract_items_batch(texts: Iterable[str], batch_size: int = 256, n_process: int = 1) -> List[List[str]]:
+    return [items for _, items in iter_extract_items(texts, batch_size, n_process)]
+
+# Put whole catalog phrases ("ice cream", "toilet paper") in place of the single words they cover
+def add_catalog_phrases(text: str, items: List[str], index: CatalogIndex) -> List[str]:
+    phrases, covered = index.find_phrases(text)
+    if not phrases:
+        return items
+    covered_forms = {form for word in covered for form in plural_variants(word)}
+    return phrases + [item for item in items if item not in covered_forms and item not in phrases]
+
+def _number(word: str) -> Optional[int]:
+    if word.isdigit():
+        return int(word)
+    return NUMBER_WORDS.get(word)
+
+# Numbers and units that belong to a quantity ("two", "bags" in "two bags of rice") are not items
+def drop_quantity_words(text: str, items: List[str]) -> List[str]:
+    words = tokenize(text)
+    quantity_words = set()
+    for position, word in enumerate(words):
+        if _number(word):
+            quantity_words.add(word)
+            if position + 1 < len(words) and words[position + 1] in QUANTITY_UNITS:
+                quantity_words.update(plural_variants(words[position + 1]))
+    if not quantity_words:
+        return items
+    return [item for item in items if item not in quantity_words]
+
+# Quantities written in front of items ("3 apples", "two bags of rice"); items without one are left out
+def extract_quantities(text: str, items: List[str]) -> Dict[str, int]:
+    words = tokenize(text)
+    quantities = {}
+    for item in items:
+        first = item.split()[0] if item.split() else item
+        for position, word in enumerate(words):
+            if first not in plural_variants(word) and word not in plural_variants(first):
+                continue
+            before = words[max(0, position - 3):position]
+            # "3 apples", "2 bags rice", "2 bags of rice"
+            if before and before[-1] == "of":
+                before = before[:-1]
+            if before and before[-1] in QUANTITY_UNITS and len(before) > 1 and _number(before[-2]):
+                before = before[:-1]
+            number = _number(before[-1]) if before else None
+            if number:
+                quantities[item] = number
+            break
+    return quantities
+
+# Improved item matching function
+def find_item_in_database(item: str, products_db: Dict, index: Optional[CatalogIndex] = None) -> Dict:
+    """Find item in database with better matching logic"""
+    if index is None:
+        index = get_catalog_index(products_db)
+    # Through lookup_many so an item nothing else places still gets the semantic fallback
+    return index.lookup_many([item])[item]
+
+# Find shelf locations with improved matching; with a stock snapshot tracked items say whether they are in stock
+def find_shelves(items: List[str], products_db: Dict, index: Optional[CatalogIndex] = None,
+                 stock: Optional[StockSnapshot] = None) -> Dict[str, Dict]:
+    if index is None:
+        index = get_catalog_index(products_db)
+    results = index.lookup_many(items)
+    return stock.annotate(results) if stock is not None else results
+
+# Whole-word intent checks (see intent_router.py); "chips" is no longer a greeting
+_classifier = IntentRouter()
+
+def is_greeting(text: str) -> bool:
+    return _classifier.classify(text) == GREETING
+
+def is_thank_you(text: str) -> bool:
+    return _classifier.classify(text) == THANKS
+
+def format_results(results: Dict[str, Dict], route: Optional[List[str]] = None) -> str:
+    # Create results message with enhanced formatting
+    result_lines = ["🔍 **Shelf Locations Found:**"]
+    result_lines.append("═" * 40)
+
+    categories_found = {}
+    not_found = []
+
+    for item, info in results.items():
+        if info["category"] != "unknown":
+            if info["category"] not in categories_found:
+                categories_found[info["category"]] = []
+            categories_found[info["category"]].append((item, info["shelf"], info.get("matched"), info.get("in_stock")))
+        else:
+            not_found.append(item)
+
+    # Walking order when a route is known (see route_planner.py)
+    if route is not None:
+        rank = {category: number for number, category in enumerate(route)}
+        categories_found = dict(sorted(categories_found.items(), key=lambda entry: rank.get(entry[0], len(rank))))
+
+    # Display items by category with better icons
+    for category, items in categories_found.items():
+        category_name = category.replace('_', ' ').title()
+        icon = CATEGORY_ICONS.get(category, "📁")
+        result_lines.append(f"\n{icon} **{category_name} Section:**")
+        for item, shelf, matched, in_stock in items:
+            # Only items the stock feed tracks carry in_stock (see stock_feed.py)
+            availability = "" if in_stock is None else (" · ✅ In stock" if in_stock else " · ⚠️ Out of stock")
+            if matched:
+                # Typo-tolerant match: say which product we took the item to be
+                result_lines.append(f"   ✓ {item.capitalize()} (did you mean {matched}?) → {shelf}{availability}")
+            else:
+                result_lines.append(f"   ✓ {item.capitalize()} → {shelf}{availability}")
+
+    # Display not found items
+    if not_found:
+        result_lines.append("\n❌ **Items Not Available:**")
+        for item in not_found:
+            result_lines.append(f"   • {item.capitalize()} → Sorry, not in our current inventory")
+
+    # Add helpful tip
+    if categories_found and route is not None:
+        result_lines.append("\n💡 **Shopping Tip:** Sections are listed in walking order from the entrance!")
+    elif categories_found:
+        result_lines.append("\n💡 **Shopping Tip:** Visit sections in order for efficient shopping!")
+
+    return "\n".join(result_lines)
+
+
+class AssistantEngine:
+    """Turns customer messages into replies; holds the catalog and the query cache"""
+
+    def __init__(self, products_db: Optional[Dict] = None, cache_size: int = MAX_CACHED_QUERIES,
+                 metrics: Optional[StageMetrics] = None):
+        # The whole catalog is one immutable snapshot, replaced by a single assignment
+        self.catalog: Optional[Catalog] = None
+        self.catalog_ready = threading.Event()
+        self.query_cache = QueryCache(cache_size)
+        self.router = IntentRouter()
+        # Per-stage timings (intent, spacy, matching, formatting); pass StageMetrics(enabled=False) to turn off
+        self.metrics = metrics if metrics is not None else StageMetrics()
+        # Optional nlp_pool.NLPWorkerPool; batches then run in worker processes instead of this one
+        self.nlp_pool = None
+        # Live stock levels, swapped in by a stock_feed.StockFeed the same way as the catalog (None: not tracked)
+        self.stock: Optional[StockSnapshot] = None
+        if products_db is not None:
+            self.set_catalog(products_db)
+
+    @property
+    def products_db(self) -> Dict:
+        catalog = self.catalog
+        return catalog.products_db if catalog is not None else {}
+
+    @property
+    def catalog_index(self) -> Optional[CatalogIndex]:
+        catalog = self.catalog
+        return catalog.index if catalog is not None else None
+
+    def set_catalog(self, products_db: Dict):
+        self.swap_catalog(Catalog(products_db))
+
+    def load_catalog(self, path: str = 'products.json'):
+        self.swap_catalog(Catalog.from_file(path))
+
+    def swap_catalog(self, catalog: Catalog):
+        set_extraction_catalog(catalog.products_db)
+        pool = self.nlp_pool
+        if pool is not None:
+            # Worker processes hold their own copy of the lexicon's vocabulary
+            pool.refresh_vocabulary()
+        self.catalog = catalog
+        self.catalog_ready.set()
+
+    def swap_stock(self, snapshot: StockSnapshot):
+        self.stock = snapshot
+
+    def plan_route(self, categories: List[str]) -> List[str]:
+        """Order store sections into a short walk (the catalog needs shelf positions for this)"""
+        catalog = self.catalog
+        planner = catalog.route_planner() if catalog is not None else None
+        if not planner:
+            # No shelf positions, so there is no walk to plan: alphabetical, like the shopping list
+            return sorted(set(categories))
+        return planner.order(categories)
+
+    def items_named(self, text: str) -> List[str]:
+        """Items mentioned in ``text``, without looking up their shelves"""
+        items = extract_items(text)
+        catalog = self.catalog
+        if catalog is not None:
+            items = add_catalog_phrases(text, items, catalog.index)
+        return drop_quantity_words(text, items)
+
+    def resolve(self, text: str) -> Tuple[List[str], Dict[str, Dict]]:
+        """Extract the items in one message and find their shelves"""
+        return self.resolve_many([text])[0]
+
+    def resolve_many(self, texts: List[str]) -> List[Tuple[List[str], Dict[str, Dict]]]:
+        """Resolve several messages, sending the uncached ones through spaCy as one batch"""
+        # Take the catalog once so a concurrent reload cannot mix two versions in one answer
+        catalog = self.catalog
+        index = catalog.index
+        resolved = [self.query_cache.get(text, catalog) for text in texts]
+        pending = [position for position, entry in enumerate(resolved) if entry is None]
+        if not pending:
+            return self.with_stock(resolved)
+
+        pending_texts = [texts[position] for position in pending]
+        model_loaded = nlp_loaded()
+        started = time.perf_counter()
+        pool = self.nlp_pool
+        # With a worker pool even single messages go to a worker, so concurrent callers use every core
+        if model_loaded and pool is not None:
+            extracted = pool.extract(pending_texts)
+        elif model_loaded and len(pending_texts) > 1:
+            extracted = extract_items_batch(pending_texts)
+        else:
+            extracted = [extract_items(text) for text in pending_texts]
+        self.metrics.record("spacy", started, len(pending_texts))
+
+        for position, items in zip(pending, extracted):
+            started = time.perf_counter()
+            items = drop_quantity_words(texts[position], add_catalog_phrases(texts[position], items, index))
+            results = find_shelves(items, catalog.products_db, index) if items else {}
+            self.metrics.record("matching", started)
+            resolved[position] = (items, results)
+            # Answers from the warm-up extractor are not cached, the model would do better
+            if model_loaded:
+                self.query_cache.put(texts[position], catalog, items, results)
+        return self.with_stock(resolved)
+
+    def with_stock(self, resolved: List[Tuple[List[str], Dict[str, Dict]]]) -> List[Tuple[List[str], Dict[str, Dict]]]:
+        """Add current stock levels to resolved queries; cached answers stay stock-free so they never go stale"""
+        stock = self.stock
+        if stock is None:
+            return resolved
+        return [(items, stock.annotate(results)) for items, results in resolved]
+
+    def build_reply(self, user_text: str) -> Dict:
+        """Work out the assistant's reply to one message"""
+        return self.build_replies([user_text])[0]
+
+    def build_replies(self, texts: List[str]) -> List[Dict]:
+        """Reply to several messages; the ones needing NLP share one spaCy batch"""
+        replies = [{"messages": [], "results": None, "followup": None, "action": None,
+                    "quantities": None, "remove": None} for _ in texts]
+        product_queries = []
+
+        for reply, user_text in zip(replies, texts):
+            # Only product queries go on to item extraction
+            started = time.perf_counter()
+            intent = self.router.route(user_text)
+            self.metrics.record("intent", started)
+            if intent == THANKS:
+                reply["messages"].append(random.choice(THANK_YOU_RESPONSES))
+            elif intent == GREETING:
+                reply["messages"].append(random.choice(GREETING_RESPONSES))
+            elif intent == HELP:
+                reply["messages"].append(HELP_RESPONSE)
+            elif intent == REMOVE_ITEMS:
+                # The client owns the list, so it does the removal and says what happened
+                items = self.items_named(removal_target(user_text))
+                if items:
+                    reply["action"] = REMOVE_ITEMS
+                    reply["remove"] = items
+                else:
+                    reply["messages"].append(REMOVE_UNCLEAR_RESPONSE)
+            elif intent != PRODUCT:
+                reply["messages"].append(LIST_COMMAND_RESPONSES[intent])
+                reply["action"] = intent
+            elif not self.catalog_ready.is_set():
+                reply["messages"].append(WARMING_UP_RESPONSE)
+            else:
+                product_queries.append((reply, user_text))
+
+        if product_queries:
+            resolved = self.resolve_many([user_text for _, user_text in product_queries])
+            for (reply, user_text), (items, results) in zip(product_queries, resolved):
+                if not items:
+                    reply["messages"].append(random.choice(HELPFUL_RESPONSES))
+                    continue
+                reply["messages"].append(random.choice(ACKNOWLEDGMENTS))
+                reply["results"] = results
+                reply["quantities"] = extract_quantities(user_text, items) or None
+                started = time.perf_counter()
+                # Without shelf positions in the catalog there is no route to follow
+                planner = self.catalog.route_planner()
+                route = planner.order(info["category"] for info in results.values()) if planner else None
+                reply["messages"].append(format_results(results, route))
+                self.metrics.record("formatting", started)
+                # Ask for more items after showing results
+                reply["followup"] = random.choice(FOLLOWUP_QUESTIONS)
+        return replies
@@ -0,0 +1,477 @@
+"""Headless assistant service.
+
+Serves the assistant engine over a small local HTTP/JSON API so several
+kiosks can share one spaCy model:
+
+    python assistant_service.py --port 8765
+    python assistant_service.py --nlp-workers 4     # spread the NLP stage over 4 processes
+    python assistant_service.py --stock-file stock.jsonl   # show live in-stock/out-of-stock (see stock_feed.py)
+    python assistant_service.py --extractor lexicon        # no spaCy, for low-memory machines
+    python chatbot_gui.py --server http://127.0.0.1:8765
+
+Endpoints:
+    POST /reply    {"text": ..., "session": ...}  -> {"messages", "results", "followup"}
+    POST /resolve  {"queries": [...]}             -> {"results": [{"query", "items", "shelves"}]}
+    POST /route    {"categories": [...]}          -> {"route": [...]} in walking order
+    GET  /health                                  -> readiness and queue depth
+    GET  /stats                                   -> batching, session, cache, intent and stage timings
+
+Messages from all sessions are collected into micro-batches for the NLP
+stage. When the queue is full, new messages are refused with 503 and a
+Retry-After header instead of piling up.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import assistant_engine
+from assistant_engine import MODEL_MISSING_MESSAGE, AssistantEngine
+from catalog_reload import RELOAD_INTERVAL_SECONDS, Catalog, CatalogWatcher
+from nlp_pool import MICRO_BATCH, NLPWorkerPool
+from query_cache import MAX_CACHED_QUERIES
+from stock_feed import StockFeed
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Micro-batching of the NLP stage
+MAX_BATCH = 64
+MAX_BATCH_WAIT_MS = 5
+
+# Backpressure: messages waiting for the NLP stage before new ones get a 503
+MAX_QUEUE = 1024
+RETRY_AFTER_SECONDS = 1
+
+MAX_BODY_BYTES = 1024 * 1024
+MAX_RESOLVE_QUERIES = 1000
+MAX_ROUTE_CATEGORIES = 1000
+
+# Sessions idle for longer than this are forgotten
+SESSION_TTL_SECONDS = 30 * 60
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class Overloaded(Exception):
+    """Raised when the NLP queue is full"""
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ReplyBatcher:
+    """Collects messages from all sessions and answers them in micro-batches.
+
+    All engine work runs on one executor thread, so the spaCy model is never
+    used concurrently and replies come back in submission order.
+    """
+
+    def __init__(self, engine, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_BATCH_WAIT_MS,
+                 max_queue: int = MAX_QUEUE):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue: Optional[asyncio.Queue] = None
+        self.max_queue = max_queue
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="assistant-nlp")
+        self.batches = 0
+        self.batched_messages = 0
+        self.largest_batch = 0
+        self.rejected = 0
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=self.max_queue)
+        return asyncio.get_running_loop().create_task(self.run())
+
+    def submit(self, text: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((text, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise Overloaded()
+        return future
+
+    async def run_in_engine(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.batches += 1
+            self.batched_messages += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            try:
+                replies = await self.run_in_engine(self.engine.build_replies, [text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), reply in zip(batch, replies):
+                if not future.done():
+                    future.set_result(reply)
+
+    def stats(self) -> Dict:
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "max_queue": self.max_queue,
+            "batches": self.batches,
+            "batched_messages": self.batched_messages,
+            "average_batch": self.batched_messages / self.batches if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "rejected": self.rejected
+        }
+
+
+class AssistantService:
+    def __init__(self, engine, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_BATCH_WAIT_MS,
+                 max_queue: int = MAX_QUEUE, catalog_watcher: Optional[CatalogWatcher] = None,
+                 stock_feed: Optional[StockFeed] = None):
+        self.engine = engine
+        self.catalog_watcher = catalog_watcher
+        self.stock_feed = stock_feed
+        self.batcher = ReplyBatcher(engine, max_batch, max_wait_ms, max_queue)
+        self.sessions: Dict[str, Dict] = {}
+        self.started = time.time()
+        self.requests = 0
+        self.server = None
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, load_model: bool = True):
+        loop = asyncio.get_running_loop()
+        self.batcher.start()
+        loop.create_task(self.prune_sessions())
+        if load_model:
+            # Quick rule-based answers are served until the model is ready
+            loop.run_in_executor(None, self.load_model)
+        self.server = await asyncio.start_server(self.handle_connection, host, port)
+        return self.server
+
+    def load_model(self):
+        try:
+            assistant_engine.load_nlp()
+        except (OSError, ImportError):
+            print(MODEL_MISSING_MESSAGE)
+            print("Serving rule-based answers only.")
+
+    async def prune_sessions(self):
+        while True:
+            await asyncio.sleep(60)
+            cutoff = time.time() - SESSION_TTL_SECONDS
+            for session_id in [s for s, info in self.sessions.items() if info["last_seen"] < cutoff]:
+                del self.sessions[session_id]
+
+    def session(self, session_id: str) -> Dict:
+        info = self.sessions.get(session_id)
+        if info is None:
+            info = self.sessions[session_id] = {"messages": 0, "last_seen": time.time(), "lock": asyncio.Lock()}
+        info["last_seen"] = time.time()
+        return info
+
+    async def reply(self, payload: Dict) -> Dict:
+        text = payload.get("text")
+        if not isinstance(text, str) or not text.strip():
+            raise HTTPError(400, "'text' must be a non-empty string")
+        info = self.session(str(payload.get("session", "default")))
+        # Messages from one session are answered strictly in the order they arrived
+        async with info["lock"]:
+            reply = await self.batcher.submit(text.strip())
+        info["messages"] += 1
+        return reply
+
+    async def resolve(self, payload: Dict) -> Dict:
+        queries = payload.get("queries")
+        if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+            raise HTTPError(400, "'queries' must be a list of strings")
+        if len(queries) > MAX_RESOLVE_QUERIES:
+            raise HTTPError(413, f"at most {MAX_RESOLVE_QUERIES} queries per request")
+        resolved = await self.batcher.run_in_engine(self.engine.resolve_many, queries)
+        return {"results": [{"query": query, "items": sorted(items), "shelves": shelves}
+                            for query, (items, shelves) in zip(queries, resolved)]}
+
+    async def plan_route(self, payload: Dict) -> Dict:
+        categories = payload.get("categories")
+        if not isinstance(categories, list) or not all(isinstance(category, str) for category in categories):
+            raise HTTPError(400, "'categories' must be a list of strings")
+        if len(categories) > MAX_ROUTE_CATEGORIES:
+            raise HTTPError(413, f"at most {MAX_ROUTE_CATEGORIES} categories per request")
+        return {"route": await self.batcher.run_in_engine(self.engine.plan_route, categories)}
+
+    def health(self) -> Dict:
+        return {
+            "status": "ok",
+            "catalog_ready": self.engine.catalog_ready.is_set(),
+            "model_loaded": assistant_engine.nlp_loaded(),
+            "extractor": assistant_engine.extractor,
+            "catalog_terms": len(self.engine.catalog_index) if self.engine.catalog_index else 0,
+            "catalog_version": self.engine.catalog.version if self.engine.catalog else None,
+            "stock_version": self.engine.stock.version if self.engine.stock else None,
+            "queue_depth": self.batcher.queue.qsize() if self.batcher.queue else 0,
+            "nlp_pool": self.pool_health()
+        }
+
+    def pool_health(self) -> Optional[Dict]:
+        pool = self.engine.nlp_pool
+        if pool is None:
+            return None
+        stats = pool.stats()
+        return {
+            "workers": stats["workers"],
+            "alive": sum(1 for worker in stats["per_worker"] if worker["alive"]),
+            "queue_depth": stats["queue_depth"],
+            "in_flight": stats["in_flight"]
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "uptime_seconds": time.time() - self.started,
+            "requests": self.requests,
+            "active_sessions": len(self.sessions),
+            "batching": self.batcher.stats(),
+            "cache": self.engine.query_cache.stats(),
+            "intents": self.engine.router.stats(),
+            "stages": self.engine.metrics.summary(),
+            "nlp_pool": self.engine.nlp_pool.stats() if self.engine.nlp_pool else None,
+            "catalog": self.engine.catalog.info() if self.engine.catalog else None,
+            "catalog_reload": self.catalog_watcher.stats() if self.catalog_watcher else None,
+            "stock_feed": self.stock_feed.stats() if self.stock_feed else None
+        }
+
+    async def route(self, method: str, path: str, body: bytes) -> Dict:
+        path = urllib.parse.urlsplit(path).path
+        if path in ("/health", "/stats"):
+            if method != "GET":
+                raise HTTPError(405, f"{path} only supports GET")
+            return self.health() if path == "/health" else self.stats()
+        if path in ("/reply", "/resolve", "/route"):
+            if method != "POST":
+                raise HTTPError(405, f"{path} only supports POST")
+            try:
+                payload = json.loads(body.decode("utf-8") or "{}")
+            except (UnicodeDecodeError, json.JSONDecodeError):
+                raise HTTPError(400, "body must be JSON")
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "body must be a JSON object")
+            handler = {"/reply": self.reply, "/resolve": self.resolve, "/route": self.plan_route}[path]
+            return await handler(payload)
+        raise HTTPError(404, f"no such endpoint: {path}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                length = int(headers.get("content-length", 0))
+                extra_headers = {}
+                if length > MAX_BODY_BYTES:
+                    status, payload, keep_alive = 413, {"error": "request body too large"}, False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    self.requests += 1
+                    try:
+                        status, payload = 200, await self.route(method, path, body)
+                    except HTTPError as e:
+                        status, payload = e.status, {"error": e.message}
+                    except Overloaded:
+                        status, payload = 503, {"error": "assistant is busy, please retry"}
+                        extra_headers["Retry-After"] = str(RETRY_AFTER_SECONDS)
+                    except Exception as e:
+                        status, payload = 500, {"error": str(e)}
+
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                head = [f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}",
+                        "Content-Type: application/json; charset=utf-8",
+                        f"Content-Length: {len(data)}",
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                head += [f"{name}: {value}" for name, value in extra_headers.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+class ServiceClient:
+    """Blocking client for the service, used by the Tk app in thin-client mode.
+
+    Offers the same build_reply() as the local engine. Busy (503) answers are
+    retried after the server's Retry-After delay. Requests from different
+    threads take turns on the one keep-alive connection.
+    """
+
+    def __init__(self, base_url: str, kiosk_id: str = "kiosk", timeout: float = 10.0, retries: int = 3):
+        parts = urllib.parse.urlsplit(base_url)
+        self.host = parts.hostname or DEFAULT_HOST
+        self.port = parts.port or DEFAULT_PORT
+        self.kiosk_id = kiosk_id
+        self.timeout = timeout
+        self.retries = retries
+        self.connection = None
+        self._lock = threading.Lock()
+        # The service owns the catalog, so the client is ready straight away
+        self.catalog_ready = threading.Event()
+        self.catalog_ready.set()
+
+    def request(self, method: str, path: str, payload: Optional[Dict] = None) -> Dict:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        with self._lock:
+            return self._send(method, path, body, headers)
+
+    def _send(self, method: str, path: str, body: Optional[bytes], headers: Dict) -> Dict:
+        for attempt in range(self.retries + 1):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = json.loads(response.read().decode("utf-8"))
+            except (http.client.HTTPException, ConnectionError, OSError):
+                # Stale keep-alive connection; reconnect once per attempt
+                self.connection.close()
+                self.connection = None
+                if attempt == self.retries:
+                    raise
+                continue
+            if response.status == 503 and attempt < self.retries:
+                time.sleep(float(response.getheader("Retry-After", RETRY_AFTER_SECONDS)))
+                continue
+            if response.status != 200:
+                raise RuntimeError(f"assistant service error {response.status}: {data.get('error')}")
+            return data
+        raise RuntimeError("assistant service is busy")
+
+    def build_reply(self, text: str, session=0) -> Dict:
+        return self.request("POST", "/reply", {"text": text, "session": f"{self.kiosk_id}-{session}"})
+
+    def resolve_many(self, queries: List[str]) -> List[Dict]:
+        return self.request("POST", "/resolve", {"queries": queries})["results"]
+
+    def plan_route(self, categories: List[str]) -> List[str]:
+        return self.request("POST", "/route", {"categories": list(categories)})["route"]
+
+    def health(self) -> Dict:
+        return self.request("GET", "/health")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the supermarket assistant over local HTTP/JSON")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--products", default="products.json", help="product database (default: products.json)")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="messages per NLP micro-batch")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_BATCH_WAIT_MS,
+                        help="how long a batch waits to fill up")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE,
+                        help="queued messages before new ones are refused with 503")
+    parser.add_argument("--cache-size", type=int, default=MAX_CACHED_QUERIES, help="query cache entries")
+    parser.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL_SECONDS,
+                        help="seconds between checks of the product file for changes (0 disables hot reload)")
+    parser.add_argument("--nlp-workers", type=int, default=0,
+                        help="run spaCy in this many worker processes (default: 0, in the service process)")
+    parser.add_argument("--micro-batch", type=int, default=MICRO_BATCH,
+                        help="most messages sent to one NLP worker at a time")
+    parser.add_argument("--stock-file", metavar="PATH",
+                        help="follow live stock levels appended to this JSON-lines file")
+    parser.add_argument("--stock-port", type=int, metavar="PORT",
+                        help="receive live stock levels as UDP datagrams on this local port")
+    parser.add_argument("--extractor", choices=assistant_engine.EXTRACTORS, default="spacy",
+                        help="item extraction backend (lexicon: no spaCy, for low-memory machines)")
+    args = parser.parse_args(argv)
+
+    assistant_engine.select_extractor(args.extractor)
+    engine = AssistantEngine(cache_size=args.cache_size)
+    try:
+        engine.swap_catalog(Catalog.from_file(args.products))
+    except FileNotFoundError:
+        parser.error(f"{args.products} file not found")
+    except ValueError as e:
+        parser.error(f"{args.products} is not a valid catalog: {e}")
+
+    load_model = True
+    if args.nlp_workers > 0:
+        # The model is loaded once here and the workers are forked from this process
+        # before any other thread is started
+        try:
+            assistant_engine.load_nlp()
+        except (OSError, ImportError):
+            parser.error(MODEL_MISSING_MESSAGE)
+        engine.nlp_pool = NLPWorkerPool(args.nlp_workers, args.micro_batch).start()
+        load_model = False
+        print(f"Started {args.nlp_workers} NLP worker processes ({engine.nlp_pool.start_method})")
+
+    watcher = None
+    if args.reload_interval > 0:
+        watcher = CatalogWatcher(engine, args.products, args.reload_interval,
+                                 on_reload=lambda catalog: print(f"Catalog version {catalog.version} loaded "
+                                                                 f"in {catalog.load_seconds * 1000:.1f} ms"),
+                                 on_error=lambda e: print(f"Rejected catalog update: {e}")).start()
+    stock_feed = None
+    if args.stock_file or args.stock_port is not None:
+        try:
+            stock_feed = StockFeed(engine, args.stock_file, args.stock_port,
+                                   on_error=lambda e: print(f"Rejected stock update: {e}")).start()
+        except OSError as e:
+            parser.error(f"stock feed could not start: {e}")
+    service = AssistantService(engine, args.max_batch, args.max_wait_ms, args.max_queue, watcher, stock_feed)
+
+    async def serve():
+        server = await service.start(args.host, args.port, load_model)
+        print(f"Assistant service listening on http://{args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if engine.nlp_pool is not None:
+            engine.nlp_pool.close()
+        if stock_feed is not None:
+            stock_feed.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,507 @@
+"""Benchmarks for the extraction, matching and rendering hot paths.
+
+Generates synthetic catalogs in the products.json schema and a kiosk-like
+query corpus, then measures per-operation latency percentiles, throughput
+and peak memory for each stage:
+
+    python benchmarks.py -o bench.json
+    python benchmarks.py --sizes 1000,1000000 --stages index_build,find_item_in_database
+    python benchmarks.py --baseline bench.json --threshold 0.25
+    python benchmarks.py --stages nlp_pool --pool-workers 1,2,4,8
+    python benchmarks.py --stages stock_feed --stock-rate 20000
+    python benchmarks.py --stages typeahead --sizes 100000
+    python benchmarks.py --stages extract_items,lexicon_extraction
+
+With --baseline the run fails (exit status 1) when any stage's p50 or p95
+latency is more than --threshold slower than in the baseline file. The Tk
+stages start an Xvfb virtual display when no display is available, and are
+reported as skipped when neither exists.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Sequence
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from assistant_engine import (AssistantEngine, extract_items, extract_items_batch, find_item_in_database,
+                              find_shelves, format_results, load_nlp)
+from assistant_service import MAX_BATCH
+from catalog_index import CatalogIndex
+from lexicon_extractor import LexiconExtractor
+from nlp_pool import NLPWorkerPool
+from service_load_test import percentile, sample_queries
+from stock_feed import StockFeed
+from typeahead import Typeahead, catalog_terms
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+STAGES = ["index_build", "extract_items", "find_item_in_database", "find_shelves", "semantic_fallback",
+          "lexicon_extraction", "stock_feed", "typeahead", "add_message", "nlp_pool"]
+DEFAULT_QUERIES = 2000
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_REPEAT = 3
+
+# Stock updates per second fed in while the stock_feed stage queries
+DEFAULT_STOCK_RATE = 5000
+
+# Latency differences below this are timer noise and never count as regressions
+NOISE_FLOOR_MS = 0.02
+
+# Operations traced with tracemalloc for the peak-memory figure (tracing slows them down)
+MEMORY_SAMPLE = 500
+
+PRODUCT_NOUNS = ["apples", "bananas", "milk", "cheese", "bread", "cookies", "coffee", "tea", "juice",
+                 "chips", "chocolate", "nuts", "rice", "pasta", "beans", "soup", "sauce", "yogurt",
+                 "butter", "eggs", "sausages", "fish", "chicken", "tomatoes", "onions", "potatoes",
+                 "carrots", "peppers", "shampoo", "soap", "detergent", "paper towels", "toilet paper",
+                 "pens", "notebooks", "batteries", "cereal", "crackers", "ice cream", "energy drinks",
+                 "water", "soda", "vinegar", "oil", "flour", "sugar", "salt", "honey", "jam", "noodles"]
+MODIFIERS = ["organic", "fresh", "frozen", "low fat", "whole", "sliced", "spicy", "sweet", "salted",
+             "smoked", "mini", "large", "family size", "gluten free", "vanilla", "strawberry", "classic",
+             "premium", "light", "dark", "roasted", "green", "red", "baby", "instant", "natural"]
+# Items only the semantic fallback can place, grouped as they would leave one query unresolved
+UNPLACED_GROUPS = [["soft drink"], ["crisps", "cola"], ["veggies", "choc", "mince"], ["notepad"],
+                   ["washing up liquid", "biro"], ["brownies", "latte", "spud", "toffee"]]
+SYLLABLES = ["ka", "lo", "mi", "ra", "ve", "to", "su", "ne", "pa", "ri", "zo", "bel", "mar", "tin",
+             "dor", "fen", "gal", "hov", "jun", "kel"]
+
+
+def synthetic_catalog(size: int, seed: int = 3) -> Dict:
+    """A products.json-shaped catalog with ``size`` distinct item names"""
+    rng = random.Random(seed)
+    names: List[str] = []
+    seen = set()
+
+    def add(name: str):
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+
+    for noun in PRODUCT_NOUNS:
+        add(noun)
+    for modifier in MODIFIERS:
+        for noun in PRODUCT_NOUNS:
+            if len(names) < size:
+                add(f"{modifier} {noun}")
+    # Past the modifier combinations, invent brand names
+    while len(names) < size:
+        brand = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+        add(f"{brand} {rng.choice(PRODUCT_NOUNS)}")
+    names = names[:size]
+    rng.shuffle(names)
+
+    category_count = max(10, size // 500)
+    per_category = -(-size // category_count)
+    return {
+        f"category_{number}": {
+            "shelf": f"Shelf {number + 1} - Aisle {number // 4 + 1}",
+            "items": names[start:start + per_category]
+        }
+        for number, start in enumerate(range(0, size, per_category))
+    }
+
+
+def misspell(word: str, rng: random.Random) -> str:
+    if len(word) < 5:
+        return word
+    position = rng.randrange(1, len(word) - 1)
+    if rng.random() < 0.5:
+        return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+    return word[:position] + word[position + 1:]
+
+
+def query_corpus(products_db: Dict, count: int = DEFAULT_QUERIES, seed: int = 5) -> List[str]:
+    """Kiosk-like messages, about one in ten with a misspelt product"""
+    rng = random.Random(seed)
+    queries = sample_queries(products_db, count, seed)
+    terms = [item for data in products_db.values() for item in data["items"]]
+    for position in range(0, count, 10):
+        queries[position] = f"where is the {misspell(rng.choice(terms), rng)}"
+    return queries
+
+
+def measure(operation: Callable, inputs: Sequence, repeat: int = 1) -> Dict:
+    """Time ``operation`` on every input, then trace a sample of them for peak memory"""
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for value in inputs:
+            op_started = time.perf_counter()
+            operation(value)
+            latencies.append(time.perf_counter() - op_started)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    for value in inputs[:MEMORY_SAMPLE]:
+        operation(value)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return summarize(latencies, elapsed, peak)
+
+
+def summarize(latencies: List[float], elapsed: float, peak_bytes: int) -> Dict:
+    return {
+        "operations": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 4),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+        "throughput_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "peak_memory_kb": round(peak_bytes / 1024, 1)
+    }
+
+
+def bench_index_build(products_db: Dict) -> Dict:
+    started = time.perf_counter()
+    CatalogIndex(products_db)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    index = CatalogIndex(products_db)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = summarize([elapsed], elapsed, peak)
+    result["terms"] = len(index)
+    return result
+
+
+def bench_matching(products_db: Dict, queries: List[str], stages: List[str], repeat: int = DEFAULT_REPEAT) -> Dict:
+    index = CatalogIndex(products_db)
+    extracted = [extract_items(query) for query in queries]
+    results = {}
+    if "find_item_in_database" in stages:
+        terms = [item for items in extracted for item in items]
+        results["find_item_in_database"] = measure(lambda item: find_item_in_database(item, products_db, index),
+                                                   terms, repeat)
+    if "find_shelves" in stages:
+        results["find_shelves"] = measure(lambda items: find_shelves(items, products_db, index), extracted, repeat)
+    if "semantic_fallback" in stages:
+        # One matrix product per query's leftovers; skipped without NumPy
+        semantic = index.semantic_index()
+        if semantic is not None:
+            groups = [UNPLACED_GROUPS[number % len(UNPLACED_GROUPS)] for number in range(len(queries))]
+            results["semantic_fallback"] = measure(semantic.match, groups, repeat)
+    return results
+
+
+def bench_stock_feed(products_db: Dict, queries: List[str], repeat: int = DEFAULT_REPEAT,
+                     rate: int = DEFAULT_STOCK_RATE) -> Dict:
+    """find_shelves with stock levels, while a StockFeed applies ``rate`` updates a second (idle figures alongside)"""
+    index = CatalogIndex(products_db)
+    extracted = [extract_items(query) for query in queries]
+    engine = AssistantEngine()
+    feed = StockFeed(engine).start()
+    # Every catalog item is tracked, so each new snapshot copies all of them
+    terms = sorted({item for data in products_db.values() for item in data["items"]})
+    feed.push(json.dumps({"item": term, "quantity": 10}) for term in terms)
+    while engine.stock.updates < len(terms):
+        time.sleep(feed.interval)
+
+    def query(items):
+        return find_shelves(items, products_db, index, engine.stock)
+
+    idle = measure(query, extracted, repeat)
+    rng = random.Random(11)
+    stop = threading.Event()
+    received = feed.received
+
+    def produce():
+        sent, started = 0, time.perf_counter()
+        while not stop.is_set():
+            # Updates go out in 10 ms bursts, as a stock system flushing its own buffer would send them
+            burst = max(1, rate // 100)
+            feed.push(json.dumps({"item": rng.choice(terms), "delta": rng.choice([-1, -1, 2])}) for _ in range(burst))
+            sent += burst
+            time.sleep(max(0.0, started + sent / rate - time.perf_counter()))
+
+    producer = threading.Thread(target=produce, daemon=True)
+    started = time.perf_counter()
+    producer.start()
+    try:
+        result = measure(query, extracted, repeat)
+    finally:
+        stop.set()
+        producer.join()
+        elapsed = time.perf_counter() - started
+        stats = feed.stats()
+        feed.stop()
+    result.update({
+        "idle_p50_ms": idle["p50_ms"],
+        "idle_p95_ms": idle["p95_ms"],
+        "tracked_items": len(terms),
+        "updates_per_second": round((stats["received"] - received) / elapsed, 1),
+        "snapshots": stats["batches"],
+        "average_apply_ms": stats["average_apply_ms"]
+    })
+    return result
+
+
+def bench_typeahead(products_db: Dict, queries: List[str], repeat: int = DEFAULT_REPEAT) -> Dict:
+    """Typeahead.suggest on every keystroke of each query's last word, plus the index build time"""
+    typeahead = Typeahead()
+    started = time.perf_counter()
+    typeahead.rebuild(catalog_terms(products_db))
+    build_seconds = time.perf_counter() - started
+    keystrokes = []
+    for query in queries:
+        last_word = query.rfind(" ") + 1
+        keystrokes.extend(query[:end] for end in range(last_word + 1, len(query) + 1))
+    result = measure(typeahead.suggest, keystrokes, repeat)
+    result["build_ms"] = round(build_seconds * 1000, 1)
+    return result
+
+
+def bench_lexicon_extraction(products_db: Dict, queries: List[str], repeat: int = DEFAULT_REPEAT) -> Dict:
+    """The spaCy-free backend, which depends on catalog size through its vocabulary"""
+    started = time.perf_counter()
+    extractor = LexiconExtractor(products_db)
+    build_seconds = time.perf_counter() - started
+    result = measure(extractor.extract, queries, repeat)
+    result["build_ms"] = round(build_seconds * 1000, 1)
+    result["vocabulary"] = len(extractor.vocabulary)
+    return result
+
+
+def bench_extraction(queries: List[str], repeat: int = DEFAULT_REPEAT) -> Dict:
+    try:
+        load_nlp()
+        extractor = "spacy"
+    except (OSError, ImportError):
+        extractor = "rules"
+    result = measure(extract_items, queries, repeat)
+    result["extractor"] = extractor
+    return result
+
+
+def default_pool_workers() -> List[int]:
+    """1, 2, 4, ... up to the number of cores"""
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def bench_nlp_pool(queries: List[str], worker_counts: List[int]) -> Dict:
+    """spaCy throughput in-process and with NLPWorkerPool, fed service-sized batches"""
+    try:
+        load_nlp()
+    except (OSError, ImportError) as e:
+        return {"skipped": f"spaCy model unavailable: {e}"}
+    batches = [queries[start:start + MAX_BATCH] for start in range(0, len(queries), MAX_BATCH)]
+
+    def throughput(extract: Callable) -> float:
+        extract(batches[0])
+        started = time.perf_counter()
+        for batch in batches:
+            extract(batch)
+        return round(len(queries) / (time.perf_counter() - started), 1)
+
+    results = {"cores": os.cpu_count(), "in_process_texts_per_second": throughput(extract_items_batch)}
+    for workers in worker_counts:
+        pool = NLPWorkerPool(workers).start()
+        try:
+            results[f"workers_{workers}_texts_per_second"] = throughput(pool.extract)
+        finally:
+            pool.close()
+    single = results.get("workers_1_texts_per_second")
+    if single:
+        for workers in worker_counts:
+            results[f"workers_{workers}_speedup"] = round(results[f"workers_{workers}_texts_per_second"] / single, 2)
+    return results
+
+
+def start_virtual_display() -> Optional[subprocess.Popen]:
+    """Start Xvfb and point DISPLAY at it when there is no display (Linux only)"""
+    if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+        return None
+    xvfb = shutil.which("Xvfb")
+    if xvfb is None:
+        return None
+    number = 90 + os.getpid() % 100
+    server = subprocess.Popen([xvfb, f":{number}", "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while not os.path.exists(f"/tmp/.X11-unix/X{number}") and time.time() < deadline:
+        time.sleep(0.05)
+    os.environ["DISPLAY"] = f":{number}"
+    return server
+
+
+def bench_rendering(products_db: Dict, products_path: str, queries: List[str], messages: int) -> Dict:
+    """add_message in both transcript modes, including the layout pass Tk does per message"""
+    try:
+        import tkinter as tk
+        from chatbot_gui import SupermarketChatbotGUI
+        root = tk.Tk()
+    except Exception as e:  # no display, or Tk not installed
+        return {"skipped": str(e)}
+
+    results = {}
+    try:
+        items = next((items for items in map(extract_items, queries) if items), ["milk"])
+        reply = format_results(find_shelves(items, products_db, CatalogIndex(products_db)))
+        for mode in ("bubbles", "text"):
+            window = tk.Toplevel(root)
+            app = SupermarketChatbotGUI(window, transcript_mode=mode, reload_interval=0, products_path=products_path)
+
+            def add(position: int, app=app):
+                app.add_message("user" if position % 2 == 0 else "assistant",
+                                queries[position % len(queries)] if position % 2 == 0 else reply)
+                window.update_idletasks()
+
+            results[mode] = measure(add, list(range(messages)))
+            window.destroy()
+    finally:
+        root.destroy()
+    return results
+
+
+def max_rss_kb() -> Optional[int]:
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+
+def run(sizes: List[int], stages: List[str], query_count: int, messages: int,
+        repeat: int = DEFAULT_REPEAT, pool_workers: Optional[List[int]] = None,
+        stock_rate: int = DEFAULT_STOCK_RATE) -> Dict:
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "queries": query_count,
+        "repeat": repeat,
+        "sizes": {}
+    }
+    first_queries = None
+    for size in sizes:
+        products_db = synthetic_catalog(size)
+        queries = query_corpus(products_db, query_count)
+        first_queries = first_queries or (products_db, queries)
+        stage_results = {}
+        if "index_build" in stages:
+            stage_results["index_build"] = bench_index_build(products_db)
+        stage_results.update(bench_matching(products_db, queries, stages, repeat))
+        if "lexicon_extraction" in stages:
+            stage_results["lexicon_extraction"] = bench_lexicon_extraction(products_db, queries, repeat)
+        if "stock_feed" in stages:
+            stage_results["stock_feed"] = bench_stock_feed(products_db, queries, repeat, stock_rate)
+        if "typeahead" in stages:
+            stage_results["typeahead"] = bench_typeahead(products_db, queries, repeat)
+        report["sizes"][str(size)] = stage_results
+        print(f"  {size} items: " + ", ".join(f"{name} p50 {result['p50_ms']} ms"
+                                              for name, result in stage_results.items()), file=sys.stderr)
+
+    # Extraction and rendering do not depend on catalog size, so they run once
+    products_db, queries = first_queries
+    if "extract_items" in stages:
+        report["extract_items"] = bench_extraction(queries, repeat)
+    if "nlp_pool" in stages:
+        report["nlp_pool"] = bench_nlp_pool(queries, pool_workers or default_pool_workers())
+    if "add_message" in stages:
+        display = start_virtual_display()
+        fd, products_path = tempfile.mkstemp(suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(products_db, f)
+            report["add_message"] = bench_rendering(products_db, products_path, queries, messages)
+        finally:
+            os.unlink(products_path)
+            if display is not None:
+                display.terminate()
+                display.wait()
+    report["max_rss_kb"] = max_rss_kb()
+    return report
+
+
+def flatten(report: Dict) -> Dict[str, Dict]:
+    """Every measured stage keyed by name ("10000/find_shelves", "extract_items", "add_message/text")"""
+    stages = {}
+    for size, results in report.get("sizes", {}).items():
+        for name, result in results.items():
+            stages[f"{size}/{name}"] = result
+    if "p50_ms" in report.get("extract_items", {}):
+        stages["extract_items"] = report["extract_items"]
+    for mode, result in report.get("add_message", {}).items():
+        if isinstance(result, dict):
+            stages[f"add_message/{mode}"] = result
+    return stages
+
+
+def find_regressions(report: Dict, baseline: Dict, threshold: float) -> List[str]:
+    regressions = []
+    current = flatten(report)
+    for name, before in flatten(baseline).items():
+        after = current.get(name)
+        if after is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if (after[metric] > before[metric] * (1 + threshold)
+                    and after[metric] - before[metric] > NOISE_FLOOR_MS):
+                regressions.append(f"{name} {metric}: {before[metric]} -> {after[metric]} ms "
+                                   f"(+{(after[metric] / before[metric] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark extraction, matching and chat rendering")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated synthetic catalog sizes (default: 1000,10000,100000)")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"comma-separated subset of {', '.join(STAGES)}")
+    parser.add_argument("--queries", type=int, default=DEFAULT_QUERIES, help="messages in the query corpus")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="passes over the corpus per stage")
+    parser.add_argument("--messages", type=int, default=300, help="chat messages rendered per transcript mode")
+    parser.add_argument("--pool-workers", help="comma-separated NLP pool sizes (default: 1, 2, 4, ... up to the core count)")
+    parser.add_argument("--stock-rate", type=int, default=DEFAULT_STOCK_RATE,
+                        help="stock updates per second during the stock_feed stage")
+    parser.add_argument("-o", "--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown against the baseline (default: 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    pool_workers = [int(count) for count in args.pool_workers.split(",") if count.strip()] if args.pool_workers else None
+
+    report = run(sizes, stages, args.queries, args.messages, args.repeat, pool_workers, args.stock_rate)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = find_regressions(report, json.load(f), args.threshold)
+        if regressions:
+            print("❌ Performance regressions:", file=sys.stderr)
+            for line in regressions:
+                print(f"   • {line}", file=sys.stderr)
+            return 1
+        print(f"✅ No stage slower than {args.threshold:.0%} against {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
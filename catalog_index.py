@@ -0,0 +1,299 @@
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from fuzzy_matcher import MAX_EDIT_DISTANCE, SymSpellIndex
+from phrase_matcher import PhraseAutomaton, tokenize
+from rule_extractor import lemmatize
+
+NOT_FOUND = {
+    "shelf": "Not found in store",
+    "category": "unknown"
+}
+
+# Length of the n-grams used by the partial-match index
+NGRAM_SIZE = 3
+
+
+def fold_plural(term: str) -> str:
+    """Singular form of a term, by its last word ("cherries" -> "cherry", "energy drinks" -> "energy drink")"""
+    head, space, last = term.rpartition(" ")
+    return head + space + lemmatize(last)
+
+
+def plural_form(term: str) -> str:
+    """Regular plural of a term, by its last word ("soft drink" -> "soft drinks", "berry" -> "berries")"""
+    head, space, last = term.rpartition(" ")
+    if last.endswith(("s", "x", "z", "ch", "sh")):
+        last += "es"
+    elif len(last) > 1 and last.endswith("y") and last[-2] not in "aeiou":
+        last = last[:-1] + "ies"
+    else:
+        last += "s"
+    return head + space + last
+
+
+def plural_variants(term: str) -> List[str]:
+    """The term plus every singular it could be the plural of ("tomatoes" -> "tomatoe", "tomato").
+
+    Not a second lemmatizer: the catalog is indexed under all of these so a
+    term is found whichever singular an extractor produced (spaCy's or
+    lemmatize's).
+    """
+    variants = [term]
+    if len(term) > 1 and term.endswith('s') and not term.endswith('ss'):
+        variants.append(term[:-1])
+        if len(term) > 3 and term.endswith('es'):
+            variants.append(term[:-2])
+        if len(term) > 4 and term.endswith('ies'):
+            variants.append(term[:-3] + 'y')
+    folded = fold_plural(term)
+    if folded not in variants:
+        variants.append(folded)
+    return variants
+
+
+class CatalogIndex:
+    """Lookup structures built once from the products database.
+
+    Every catalog term gets a position in catalog order (category order,
+    then item order) and the lowest-positioned match wins. Lookups try the
+    exact term, then plural forms and whole-word matches ("drink" finds
+    "energy drinks"), then a typo-tolerant match within
+    ``max_edit_distance`` edits ("bananna" finds "bananas").
+    ``max_edit_distance=0`` turns the typo matching off. ``lookup_many``
+    finally tries the items still unplaced against term embeddings and the
+    catalog's synonym table ("soft drink" finds "soda"); ``semantic=False``
+    turns that off.
+    """
+
+    def __init__(self, products_db: Dict, max_edit_distance: int = MAX_EDIT_DISTANCE, semantic: bool = True):
+        self.max_edit_distance = max_edit_distance
+        self.semantic = semantic
+        self.terms: List[str] = []
+        self.locations: List[Dict] = []
+        self.exact: Dict[str, int] = {}
+        self.folded: Dict[str, int] = {}
+        self.ngrams: Dict[str, List[int]] = {}
+        self.short_grams: Dict[str, List[int]] = {}
+        # Customer word -> catalog item, from each category's optional "synonyms"
+        self.synonyms: Dict[str, str] = {}
+        self._fuzzy: Optional[SymSpellIndex] = None
+        self._phrases: Optional[PhraseAutomaton] = None
+        self._semantic = None
+        self._fuzzy_lock = threading.Lock()
+
+        for category, data in products_db.items():
+            location = {
+                "shelf": data["shelf"],
+                "category": category
+            }
+            for db_item in data["items"]:
+                position = len(self.terms)
+                self.terms.append(db_item)
+                self.locations.append(location)
+                self.exact.setdefault(db_item, position)
+                for variant in plural_variants(db_item):
+                    self.folded.setdefault(variant, position)
+                self._add_grams(db_item, position)
+            self.synonyms.update(data.get("synonyms") or {})
+
+    def _add_grams(self, term: str, position: int):
+        # Short queries cannot use trigrams, so 1- and 2-grams get their own map
+        seen: Set[str] = set()
+        for size in range(1, NGRAM_SIZE):
+            for start in range(len(term) - size + 1):
+                seen.add(term[start:start + size])
+        for gram in seen:
+            self.short_grams.setdefault(gram, []).append(position)
+
+        seen = {term[start:start + NGRAM_SIZE] for start in range(len(term) - NGRAM_SIZE + 1)}
+        for gram in seen:
+            self.ngrams.setdefault(gram, []).append(position)
+
+    def fuzzy_index(self) -> Optional[SymSpellIndex]:
+        """The typo-tolerant index over every term's singular form, built on first use"""
+        if self.max_edit_distance <= 0:
+            return None
+        if self._fuzzy is None:
+            with self._fuzzy_lock:
+                if self._fuzzy is None:
+                    singulars = [fold_plural(self.terms[position]) for position in range(len(self.terms))]
+                    self._fuzzy = SymSpellIndex(singulars, self.max_edit_distance)
+        return self._fuzzy
+
+    def semantic_index(self):
+        """The term embedding matrix (semantic_matcher.SemanticIndex), built on first use; None without NumPy"""
+        if not self.semantic or not len(self.terms):
+            return None
+        if self._semantic is None:
+            # Imported here because semantic_matcher itself uses fold_plural from this module
+            import semantic_matcher
+            if semantic_matcher.np is None:
+                return None
+            with self._fuzzy_lock:
+                if self._semantic is None:
+                    categories = [self.locations[position]["category"] for position in range(len(self.terms))]
+                    terms = [self.terms[position] for position in range(len(self.terms))]
+                    self._semantic = semantic_matcher.SemanticIndex(terms, categories, self.synonyms)
+        return self._semantic
+
+    def phrase_automaton(self) -> PhraseAutomaton:
+        """Word-level automaton over every term, multi-word synonym and their plural variants, built on first use (by Catalog, before it goes live)"""
+        if self._phrases is None:
+            with self._fuzzy_lock:
+                if self._phrases is None:
+                    self._phrases = PhraseAutomaton(self._phrase_variants())
+        return self._phrases
+
+    def _phrase_variants(self):
+        phrases = [(self.terms[position], position) for position in range(len(self.terms))]
+        # Multi-word synonyms ("soft drink") name their item before the extractor splits them
+        # into words; single-word ones are left to lookup_many's synonym fallback
+        for synonym, item in self.synonyms.items():
+            position = self.exact.get(item)
+            if len(synonym.split()) > 1 and position is not None:
+                phrases.append((synonym, position))
+                # Synonyms are written in the singular, and customers ask for "soft drinks" too
+                if fold_plural(synonym) == synonym:
+                    phrases.append((plural_form(synonym), position))
+        # "energy drinks" is also found as "energy drink": only the last word is inflected
+        for phrase, position in phrases:
+            words = phrase.split()
+            if words:
+                for variant in plural_variants(words[-1]):
+                    yield " ".join(words[:-1] + [variant]), position
+
+    def find_phrases(self, text: str) -> Tuple[List[str], Set[str]]:
+        """Catalog terms named in ``text``, in message order, and the message words they cover"""
+        words = tokenize(text)
+        terms: List[str] = []
+        covered: Set[str] = set()
+        for start, end, position in self.phrase_automaton().find(words):
+            term = self.terms[position]
+            if term not in terms:
+                terms.append(term)
+            covered.update(words[start:end])
+        return terms, covered
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _containing_candidates(self, item: str):
+        """Ascending positions of terms that may contain ``item`` (callers verify)"""
+        if len(item) < NGRAM_SIZE:
+            return self.short_grams.get(item) or ()
+
+        shortest = None
+        for start in range(len(item) - NGRAM_SIZE + 1):
+            positions = self.ngrams.get(item[start:start + NGRAM_SIZE])
+            if not positions:
+                return ()
+            if shortest is None or len(positions) < len(shortest):
+                shortest = positions
+        return shortest
+
+    def _first_folded(self, item: str) -> Optional[int]:
+        """Lowest position of a term sharing a singular form with ``item``"""
+        best = None
+        for variant in plural_variants(item):
+            position = self.folded.get(variant)
+            if position is not None and (best is None or position < best):
+                best = position
+        return best
+
+    def _first_with_word(self, item: str) -> Optional[int]:
+        """Lowest position of a multi-word term with ``item`` as one of its words"""
+        singulars = set(plural_variants(item))
+        # Posting lists are sorted, so the first verified candidate is the lowest
+        for position in self._containing_candidates(item):
+            words = self.terms[position].split()
+            if len(words) > 1 and any(singulars.intersection(plural_variants(word)) for word in words):
+                return position
+        return None
+
+    def _first_word_span(self, item: str) -> Optional[int]:
+        """Lowest position of a term matching a run of the words in ``item``"""
+        best = None
+        words = item.split()
+        if len(words) < 2:
+            return None
+        for start in range(len(words)):
+            for end in range(start + 1, len(words) + 1):
+                position = self._first_folded(" ".join(words[start:end]))
+                if position is not None and (best is None or position < best):
+                    best = position
+        return best
+
+    def suggest(self, item: str, limit: int = 5) -> List[Tuple[str, int, Dict]]:
+        """Ranked typo-tolerant candidates for ``item`` as (term, edits, location), closest first"""
+        fuzzy = self.fuzzy_index()
+        if fuzzy is None:
+            return []
+        return [(self.terms[position], distance, dict(self.locations[position]))
+                for distance, position in fuzzy.lookup(fold_plural(item.lower().strip()), limit=limit)]
+
+    def lookup(self, item: str) -> Dict:
+        """Resolve one term to its shelf and category"""
+        item = item.lower().strip()
+        if not item:
+            return dict(NOT_FOUND)
+
+        position = self.exact.get(item)
+        if position is not None:
+            return dict(self.locations[position])
+
+        position = self._first_folded(item)
+        if position is not None:
+            return dict(self.locations[position])
+
+        # Whole words only; raw substrings gave hits like "tea" in "steak"
+        candidates = [self._first_with_word(item), self._first_word_span(item)]
+        candidates = [position for position in candidates if position is not None]
+        if candidates:
+            return dict(self.locations[min(candidates)])
+
+        fuzzy = self.fuzzy_index()
+        best = fuzzy.best(fold_plural(item)) if fuzzy is not None else None
+        if best is not None:
+            _, position = best
+            location = dict(self.locations[position])
+            # Tells the reply which catalog term a misspelt item was read as
+            location["matched"] = self.terms[position]
+            return location
+        return dict(NOT_FOUND)
+
+    def lookup_many(self, items: List[str]) -> Dict[str, Dict]:
+        results = {item: self.lookup(item) for item in items}
+        unresolved = [item for item, location in results.items()
+                      if location["category"] == NOT_FOUND["category"] and item.strip()]
+        semantic = self.semantic_index() if unresolved else None
+        if semantic is not None:
+            # All of a query's leftovers are scored in one matrix product
+            for item, match in zip(unresolved, semantic.match([item.lower() for item in unresolved])):
+                if match is None:
+                    continue
+                position, score, categories = match
+                location = dict(self.locations[position])
+                location["matched"] = self.terms[position]
+                location["similarity"] = score
+                location["categories"] = categories
+                results[item] = location
+        return results
+
+
+# Indexes are cached per products_db object; catalogs are treated as read-only once loaded
+_index_cache: Tuple[Optional[Dict], Optional[CatalogIndex]] = (None, None)
+
+
+def get_catalog_index(products_db: Dict) -> CatalogIndex:
+    """Return the index for ``products_db``, building it on first use"""
+    global _index_cache
+    # Compiled catalogs (compiled_catalog.CompiledProducts) carry a ready-made index
+    prebuilt = getattr(products_db, "index", None)
+    if isinstance(prebuilt, CatalogIndex):
+        return prebuilt
+    cached_db, cached_index = _index_cache
+    if cached_db is not products_db or cached_index is None:
+        cached_index = CatalogIndex(products_db)
+        _index_cache = (products_db, cached_index)
+    return cached_index
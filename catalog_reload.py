@@ -0,0 +1,197 @@
+import hashlib
+import itertools
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from catalog_index import CatalogIndex
+from compiled_catalog import MAGIC, CompiledCatalog, CompiledProducts
+from route_planner import RoutePlanner
+
+# How often the watcher checks products.json for changes
+RELOAD_INTERVAL_SECONDS = 2.0
+
+_versions = itertools.count(1)
+
+
+def validate_products(products_db) -> Dict:
+    """Check the products.json schema, raising ValueError with a readable reason"""
+    if not isinstance(products_db, dict):
+        raise ValueError("the catalog must be a JSON object of categories")
+    for category, data in products_db.items():
+        if not isinstance(data, dict):
+            raise ValueError(f"category '{category}' must be an object")
+        if not isinstance(data.get("shelf"), str):
+            raise ValueError(f"category '{category}' needs a 'shelf' string")
+        items = data.get("items")
+        if not isinstance(items, list) or not all(isinstance(item, str) for item in items):
+            raise ValueError(f"category '{category}' needs an 'items' list of strings")
+        position = data.get("position")
+        if position is not None and not (isinstance(position, list) and len(position) == 2 and all(
+                isinstance(value, (int, float)) and not isinstance(value, bool) for value in position)):
+            raise ValueError(f"category '{category}' has a 'position' that is not [x, y]")
+        synonyms = data.get("synonyms")
+        if synonyms is not None and not (isinstance(synonyms, dict) and all(
+                isinstance(word, str) and isinstance(item, str) for word, item in synonyms.items())):
+            raise ValueError(f"category '{category}' has 'synonyms' that are not an object of strings")
+    return products_db
+
+
+def checksum_of(raw: bytes) -> str:
+    return hashlib.sha1(raw).hexdigest()[:12]
+
+
+class Catalog:
+    """One immutable catalog version: the parsed products and their lookup index.
+
+    Readers take a reference to the current Catalog once per query and use
+    only that, so a reload swapping in a new one can never be seen half-built.
+    """
+
+    __slots__ = ("products_db", "index", "version", "checksum", "source", "loaded_at", "load_seconds",
+                 "_route_planner")
+
+    def __init__(self, products_db: Dict, checksum: str = "", source: Optional[str] = None):
+        started = time.perf_counter()
+        self.products_db = products_db
+        # A compiled catalog already carries its index in the mapped file
+        if isinstance(products_db, CompiledProducts):
+            self.index = products_db.catalog.index
+        else:
+            self.index = CatalogIndex(products_db)
+        # Every message is scanned for catalog phrases, so the automaton is built here, with the
+        # snapshot, rather than by the first query; the fuzzy index waits for the first miss
+        self.index.phrase_automaton()
+        self.version = next(_versions)
+        self.checksum = checksum
+        self.source = source
+        self.loaded_at = time.time()
+        self.load_seconds = time.perf_counter() - started
+        self._route_planner = None
+
+    @classmethod
+    def from_bytes(cls, raw: bytes, source: Optional[str] = None) -> "Catalog":
+        started = time.perf_counter()
+        catalog = cls(validate_products(json.loads(raw.decode('utf-8'))), checksum_of(raw), source)
+        catalog.load_seconds = time.perf_counter() - started
+        return catalog
+
+    @classmethod
+    def from_compiled(cls, path: str) -> "Catalog":
+        started = time.perf_counter()
+        compiled = CompiledCatalog(path)
+        catalog = cls(compiled.products, hashlib.sha1(compiled.mmap).hexdigest()[:12], path)
+        catalog.load_seconds = time.perf_counter() - started
+        return catalog
+
+    @classmethod
+    def from_file(cls, path: str) -> "Catalog":
+        """Load either products.json or a compiled catalog (see compiled_catalog.py)"""
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) == MAGIC:
+                return cls.from_compiled(path)
+            f.seek(0)
+            return cls.from_bytes(f.read(), path)
+
+    def route_planner(self) -> RoutePlanner:
+        """Shelf distances for this catalog version, computed on first use"""
+        if self._route_planner is None:
+            self._route_planner = RoutePlanner(self.products_db)
+        return self._route_planner
+
+    def info(self) -> Dict:
+        return {
+            "version": self.version,
+            "checksum": self.checksum,
+            "source": self.source,
+            "terms": len(self.index),
+            "categories": len(self.products_db),
+            "loaded_at": self.loaded_at,
+            "load_ms": round(self.load_seconds * 1000, 2)
+        }
+
+
+class CatalogWatcher:
+    """Polls products.json and swaps a freshly built Catalog into the engine when it changes.
+
+    Parsing, validation and index building all happen on the watcher thread;
+    a broken file is reported and the current catalog stays in service.
+    """
+
+    def __init__(self, engine, path: str = 'products.json', interval: float = RELOAD_INTERVAL_SECONDS,
+                 on_reload: Optional[Callable[[Catalog], None]] = None,
+                 on_error: Optional[Callable[[Exception], None]] = None):
+        self.engine = engine
+        self.path = path
+        self.interval = interval
+        self.on_reload = on_reload
+        self.on_error = on_error
+        self.reloads = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        # The first check always reads the file; an unchanged checksum means no swap
+        self._stamp = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def check(self) -> bool:
+        """Reload if the file changed since the last check; returns True when a new catalog was swapped in"""
+        stamp = self._file_stamp()
+        if stamp is None or stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        started = time.perf_counter()
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+            current = self.engine.catalog
+            if current is not None and current.checksum == checksum_of(raw):
+                return False
+            if raw.startswith(MAGIC):
+                catalog = Catalog.from_compiled(self.path)
+            else:
+                catalog = Catalog.from_bytes(raw, self.path)
+        except (OSError, ValueError) as e:
+            self.failures += 1
+            self.last_error = str(e)
+            if self.on_error:
+                self.on_error(e)
+            return False
+
+        catalog.load_seconds = time.perf_counter() - started
+        self.engine.swap_catalog(catalog)
+        self.reloads += 1
+        self.last_error = None
+        if self.on_reload:
+            self.on_reload(catalog)
+        return True
+
+    def stats(self) -> Dict:
+        return {
+            "path": self.path,
+            "interval_seconds": self.interval,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error
+        }
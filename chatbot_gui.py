@@ -1,82 +1,74 @@
+# Taken before every other import on purpose, so the startup timings include the imports
+import time
+PROCESS_START = time.perf_counter()
+
 import tkinter as tk
 from tkinter import scrolledtext, messagebox, ttk
-import spacy
-import json
+import http.client
+import queue
 import random
+import sqlite3
+import threading
+import uuid
+from collections import deque
 from datetime import datetime
-from typing import List, Dict
-import os
+from typing import Dict
+
+import assistant_engine
+# The engine functions are re-exported so existing `from chatbot_gui import ...` callers keep working
+from assistant_engine import (  # noqa: F401
+    CATEGORY_ICONS, MODEL_MISSING_MESSAGE, AssistantEngine, extract_items, extract_items_batch, find_item_in_database,
+    find_shelves, format_results, is_greeting, is_thank_you, iter_extract_items, load_nlp, read_products
+)
+from assistant_service import DEFAULT_PORT, ServiceClient
+from catalog_reload import RELOAD_INTERVAL_SECONDS, CatalogWatcher
+from intent_router import CLEAR_LIST, PRINT_LIST, REMOVE_ITEMS, SHOW_LIST
+from list_export import EXPORT_FORMATS, FORMATS, ListExporter, item_label, list_snapshot
+from query_cache import MAX_CACHED_QUERIES
+from session_store import DEFAULT_KIOSK, SESSION_DB, SessionStore
+from shopping_list import ShoppingList
+from stock_feed import StockFeed
+from stage_metrics import EXPORT_INTERVAL_SECONDS, MetricsExporter, StageMetrics
+from transcript import MAX_HISTORY, TextTranscript
+from typeahead import Typeahead, catalog_terms
+
+# How often the Tk thread checks for finished replies from the query worker
+REPLY_POLL_MS = 20
+
+# How often the open diagnostics window refreshes
+DIAGNOSTICS_REFRESH_MS = 1000
+
+# How often the Tk thread checks for finished list exports
+EXPORT_POLL_MS = 100
 
-# Load spaCy model
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    messagebox.showerror("Error", "spaCy model 'en_core_web_sm' not found. Please install it:\npython -m spacy download en_core_web_sm")
-    exit()
+# Typing pause before suggestions are refreshed
+TYPEAHEAD_DEBOUNCE_MS = 60
+
+# Keys that move through or pick a suggestion instead of changing the text
+SUGGESTION_KEYS = {"Up", "Down", "Return", "Tab", "Escape"}
 
 # Load product database
-def load_products():
+def load_products(path: str = 'products.json'):
     try:
-        with open('products.json', 'r') as f:
-            return json.load(f)
+        return read_products(path)
     except FileNotFoundError:
-        messagebox.showerror("Error", "products.json file not found!")
+        messagebox.showerror("Error", f"{path} file not found!")
         return {}
 
-# Extract nouns from user input using NLP
-def extract_items(text: str) -> List[str]:
-    doc = nlp(text.lower())
-    items = []
-    for token in doc:
-        if token.pos_ in ["NOUN", "PROPN"] and not token.is_stop and not token.is_space:
-            items.append(token.lemma_)  # Use lemma for better matching
-    return list(set(items))
-
-# Improved item matching function
-def find_item_in_database(item: str, products_db: Dict) -> Dict:
-    """Find item in database with better matching logic"""
-    item = item.lower().strip()
-    
-    # Direct exact match
-    for category, data in products_db.items():
-        if item in data["items"]:
-            return {
-                "shelf": data["shelf"],
-                "category": category
-            }
-    
-    # Partial matching and common variations
-    for category, data in products_db.items():
-        for db_item in data["items"]:
-            # Check if item is contained in database item or vice versa
-            if item in db_item or db_item in item:
-                return {
-                    "shelf": data["shelf"],
-                    "category": category
-                }
-            
-            # Handle common plural/singular variations
-            if item + 's' == db_item or item == db_item + 's':
-                return {
-                    "shelf": data["shelf"],
-                    "category": category
-                }
-    
-    return {
-        "shelf": "Not found in store",
-        "category": "unknown"
-    }
-
-# Find shelf locations with improved matching
-def find_shelves(items: List[str], products_db: Dict) -> Dict[str, Dict]:
-    result = {}
-    for item in items:
-        result[item] = find_item_in_database(item, products_db)
-    return result
-
 class SupermarketChatbotGUI:
-    def __init__(self, root):
+    def __init__(self, root, transcript_mode="text", max_history=MAX_HISTORY,
+                 cache_size=MAX_CACHED_QUERIES, server_url=None,
+                 reload_interval=RELOAD_INTERVAL_SECONDS, products_path='products.json',
+                 instrument=True, metrics_path=None, metrics_interval=EXPORT_INTERVAL_SECONDS,
+                 export_formats=EXPORT_FORMATS, session_db=SESSION_DB, stock_path=None, stock_port=None,
+                 extractor="spacy", kiosk_name=DEFAULT_KIOSK):
         self.root = root
+        # "text" (the default) uses one tagged Text widget; "bubbles" draws a widget per message,
+        # and every message then costs a layout pass over the whole chat
+        self.transcript_mode = transcript_mode
+        self.max_history = max_history
+        self.transcript = None
+        self.bubbles = deque()
         self.root.title("🛒 Smart Supermarket Assistant")
         self.root.geometry("900x750")
         self.root.minsize(700, 600)
@@ -84,15 +76,87 @@ class SupermarketChatbotGUI:
         # Enhanced styling
         self.root.configure(bg="#f0f0f0")
         
-        self.products_db = load_products()
-        self.shopping_list = {}  # Store current shopping list
-        self.conversation = []   # Store conversation history
+        # With server_url the window is a thin client of assistant_service;
+        # otherwise the catalog and spaCy model are loaded here by warm_up()
+        self.server_url = server_url
+        # Per-stage timings for the diagnostics window (Ctrl+Shift+D) and the metrics file
+        self.metrics = StageMetrics(enabled=instrument)
+        self.diagnostics_window = None
+        self.diagnostics_text = None
+        self.diagnostics_refresh = None
+        if server_url:
+            self.engine = ServiceClient(server_url, kiosk_id=uuid.uuid4().hex[:8])
+            # The service's walking order, fetched by the query worker along with each reply
+            self.walking_order = []
+        else:
+            self.engine = AssistantEngine(cache_size=cache_size, metrics=self.metrics)
+        self.metrics_exporter = None
+        if metrics_path:
+            self.metrics_exporter = MetricsExporter(self.metrics, metrics_path, metrics_interval,
+                                                    extra=self.metrics_gauges).start()
+        self.shopping_list = ShoppingList()  # Store current shopping list
+        # Exports are written by a background thread in each of these formats
+        self.export_formats = list(export_formats)
+        self.list_exporter = ListExporter()
+        self.export_pending = 0
+        self.export_polling = False
+        # The last max_history messages; the full history is in the session store
+        self.conversation = deque(maxlen=max_history)
+        # Messages and list changes are saved so a restart picks the session up again (None disables)
+        self.store = None
+        self.store_session = None
+        self.store_error = None
+        if session_db:
+            try:
+                self.store = SessionStore(session_db, kiosk=kiosk_name)
+            except sqlite3.Error as e:
+                self.store_error = str(e)
+        
+        self.startup_times = {}  # Seconds since process start for each startup milestone
+        # "lexicon" skips spaCy altogether, for kiosks without the memory for it
+        assistant_engine.select_extractor(extractor)
+        self.model_ready = threading.Event()
+        self.warm_up_errors = []
+        
+        # products.json (or a compiled .catalog) is re-read in the background when it changes (0 disables)
+        self.products_path = products_path
+        self.reload_interval = reload_interval
+        self.catalog_watcher = None
+        self.shown_catalog_version = None
+        self.shown_reload_failures = 0
+        
+        # Suggestions while typing; the prefix index is built off the Tk thread with each catalog
+        self.typeahead = Typeahead()
+        self.suggestions = []
+        self.suggestion_refresh = None
+        
+        # Live stock levels from a feed file and/or local UDP port (see stock_feed.py)
+        self.stock_path = stock_path
+        self.stock_port = stock_port
+        self.stock_feed = None
         
         # Create GUI elements
         self.create_widgets()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
-        # Initial greeting
-        self.initial_greeting()
+        # Pick up the last session after a crash or restart, otherwise greet
+        if not self.restore_session():
+            self.initial_greeting()
+        
+        # Show the window first, then load everything else off the Tk thread
+        self.root.after_idle(self.record_first_window)
+        if server_url:
+            self.status_label.config(text=f"🌐 Connected to assistant service at {server_url}", fg="#1976D2")
+        else:
+            threading.Thread(target=self.warm_up, daemon=True).start()
+            self.root.after(100, self.check_warm_up)
+        
+        # Messages are answered by a single worker thread so replies keep their order
+        self.session_id = 0
+        self.request_queue = queue.Queue()
+        self.reply_queue = queue.Queue()
+        threading.Thread(target=self.query_worker, daemon=True).start()
+        self.root.after(REPLY_POLL_MS, self.poll_replies)
 
     def create_widgets(self):
         # Main container with gradient background
@@ -153,6 +217,10 @@ class SupermarketChatbotGUI:
                                    font=("Arial", 10), bg="#ffffff", fg="#666666")
         self.stats_label.pack()
         
+        self.status_label = tk.Label(stats_frame, text="⏳ Warming up... loading the product catalog", 
+                                    font=("Arial", 9), bg="#ffffff", fg="#F57C00")
+        self.status_label.pack()
+        
         # Enhanced Chat container with shadow effect
         chat_outer = tk.Frame(main_container, bg="#dddddd", relief="solid", bd=1)
         chat_outer.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
@@ -164,23 +232,10 @@ class SupermarketChatbotGUI:
         self.chat_frame = tk.Frame(chat_container)
         self.chat_frame.pack(fill=tk.BOTH, expand=True)
         
-        # Canvas and scrollbar for chat
-        self.chat_canvas = tk.Canvas(self.chat_frame, bg="#F5F5F5", highlightthickness=0)
-        self.scrollbar = ttk.Scrollbar(self.chat_frame, orient="vertical", command=self.chat_canvas.yview)
-        self.scrollable_frame = tk.Frame(self.chat_canvas, bg="#F5F5F5")
-        
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: self.chat_canvas.configure(
-                scrollregion=self.chat_canvas.bbox("all")
-            )
-        )
-        
-        self.chat_canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.chat_canvas.configure(yscrollcommand=self.scrollbar.set)
-        
-        self.chat_canvas.pack(side="left", fill="both", expand=True)
-        self.scrollbar.pack(side="right", fill="y")
+        if self.transcript_mode == "text":
+            self.transcript = TextTranscript(self.chat_frame, self.max_history)
+        else:
+            self.create_bubble_canvas()
         
         # Enhanced Input section
         input_container = tk.Frame(main_container, bg="#ffffff", relief="solid", bd=1)
@@ -201,9 +256,23 @@ class SupermarketChatbotGUI:
         self.user_input = tk.Entry(input_field_frame, font=("Arial", 12), relief="solid", bd=1,
                                   bg="#f9f9f9", fg="#333333", insertbackground="#333333")
         self.user_input.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10), ipady=8)
-        self.user_input.bind("<Return>", self.process_input)
+        self.user_input.bind("<Return>", self.on_return)
         self.user_input.bind("<FocusIn>", self.on_entry_focus_in)
         self.user_input.bind("<FocusOut>", self.on_entry_focus_out)
+        self.user_input.bind("<KeyRelease>", self.on_key_release)
+        self.user_input.bind("<Down>", lambda event: self.move_suggestion(1))
+        self.user_input.bind("<Up>", lambda event: self.move_suggestion(-1))
+        self.user_input.bind("<Tab>", self.accept_suggestion)
+        self.user_input.bind("<Escape>", lambda event: self.hide_suggestions())
+        
+        # Typeahead drop-up, placed over the bottom of the chat when there is something to suggest
+        self.suggestion_box = tk.Listbox(self.root, font=("Arial", 11), height=0, relief="solid", bd=1,
+                                         bg="#ffffff", fg="#333333", selectbackground="#2E7D32",
+                                         activestyle="none", exportselection=False)
+        self.suggestion_box.bind("<Button-1>", self.click_suggestion)
+        # Hidden diagnostics window for staff
+        self.root.bind("<Control-Shift-D>", self.toggle_diagnostics)
+        self.root.bind("<Control-Shift-d>", self.toggle_diagnostics)
         
         # Enhanced Send button
         send_btn = tk.Button(input_field_frame, text="Send 📤", command=self.process_input, 
@@ -211,12 +280,31 @@ class SupermarketChatbotGUI:
                             relief="flat", padx=25, pady=8, cursor="hand2")
         send_btn.pack(side=tk.RIGHT)
         
+        # Focus on input field
+        self.user_input.focus_set()
+
+    def create_bubble_canvas(self):
+        # Canvas and scrollbar for chat
+        self.chat_canvas = tk.Canvas(self.chat_frame, bg="#F5F5F5", highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(self.chat_frame, orient="vertical", command=self.chat_canvas.yview)
+        self.scrollable_frame = tk.Frame(self.chat_canvas, bg="#F5F5F5")
+        
+        self.scrollable_frame.bind(
+            "<Configure>",
+            lambda e: self.chat_canvas.configure(
+                scrollregion=self.chat_canvas.bbox("all")
+            )
+        )
+        
+        self.chat_canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
+        self.chat_canvas.configure(yscrollcommand=self.scrollbar.set)
+        
+        self.chat_canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        
         # Bind mousewheel to scroll
         self.chat_canvas.bind("<MouseWheel>", self._on_mousewheel)
         self.scrollable_frame.bind("<MouseWheel>", self._on_mousewheel)
-        
-        # Focus on input field
-        self.user_input.focus_set()
 
     def on_entry_focus_in(self, event):
         if self.user_input.get() == "Type your message here...":
@@ -224,18 +312,164 @@ class SupermarketChatbotGUI:
             self.user_input.config(fg="#333333")
 
     def on_entry_focus_out(self, event):
+        self.hide_suggestions()
         if not self.user_input.get():
             self.user_input.insert(0, "Type your message here...")
             self.user_input.config(fg="#999999")
 
+    def on_key_release(self, event):
+        """Refresh suggestions once typing pauses for TYPEAHEAD_DEBOUNCE_MS"""
+        if event.keysym in SUGGESTION_KEYS:
+            return
+        if self.suggestion_refresh is not None:
+            self.root.after_cancel(self.suggestion_refresh)
+        self.suggestion_refresh = self.root.after(TYPEAHEAD_DEBOUNCE_MS, self.update_suggestions)
+
+    def update_suggestions(self):
+        self.suggestion_refresh = None
+        text = self.user_input.get()
+        # A prefix range lookup, well under a millisecond even for 100k terms
+        self.suggestions = [] if text == "Type your message here..." else self.typeahead.suggest(text)
+        if not self.suggestions:
+            self.hide_suggestions()
+            return
+        self.suggestion_box.delete(0, tk.END)
+        for _, term in self.suggestions:
+            self.suggestion_box.insert(tk.END, f"  {term}")
+        self.suggestion_box.config(height=len(self.suggestions))
+        self.suggestion_box.place(in_=self.user_input, relx=0, rely=0, relwidth=1, anchor="sw")
+        self.suggestion_box.lift()
+
+    def hide_suggestions(self):
+        self.suggestions = []
+        self.suggestion_box.selection_clear(0, tk.END)
+        self.suggestion_box.place_forget()
+
+    def move_suggestion(self, step):
+        if not self.suggestions:
+            return None
+        selected = self.suggestion_box.curselection()
+        number = (selected[0] + step if selected else (0 if step > 0 else len(self.suggestions) - 1))
+        number %= len(self.suggestions)
+        self.suggestion_box.selection_clear(0, tk.END)
+        self.suggestion_box.selection_set(number)
+        return "break"
+
+    def accept_suggestion(self, event=None):
+        """Complete the word being typed with the highlighted (or first) suggestion"""
+        if not self.suggestions:
+            return None
+        selected = self.suggestion_box.curselection()
+        start, term = self.suggestions[selected[0] if selected else 0]
+        text = self.user_input.get()
+        self.user_input.delete(0, tk.END)
+        self.user_input.insert(0, text[:start] + term + " ")
+        self.user_input.focus_set()
+        self.hide_suggestions()
+        return "break"
+
+    def click_suggestion(self, event):
+        # Handled on press, before the Listbox's own binding can take the focus (and so hide the list)
+        if self.suggestions:
+            self.suggestion_box.selection_clear(0, tk.END)
+            self.suggestion_box.selection_set(self.suggestion_box.nearest(event.y))
+        return self.accept_suggestion() or "break"
+
+    def on_return(self, event=None):
+        # Return picks a suggestion chosen with the arrow keys, otherwise it sends the message
+        if self.suggestions and self.suggestion_box.curselection():
+            return self.accept_suggestion()
+        self.hide_suggestions()
+        self.process_input()
+        return "break"
+
     def _on_mousewheel(self, event):
         self.chat_canvas.yview_scroll(int(-1*(event.delta/120)), "units")
 
+    def record_startup_time(self, milestone):
+        if milestone not in self.startup_times:
+            self.startup_times[milestone] = time.perf_counter() - PROCESS_START
+
+    def record_first_window(self):
+        self.record_startup_time("time_to_first_window")
+
+    def warm_up(self):
+        """Load the product catalog and the spaCy model (runs off the Tk thread)"""
+        try:
+            self.engine.load_catalog(self.products_path)
+        except FileNotFoundError:
+            self.warm_up_errors.append(f"{self.products_path} file not found!")
+            self.engine.set_catalog({})
+        except ValueError as e:
+            self.warm_up_errors.append(f"{self.products_path} is not a valid catalog:\n{str(e)}")
+            self.engine.set_catalog({})
+        
+        # Saved sessions say which items customers ask for most
+        if self.store is not None:
+            try:
+                for item, count in self.store.item_popularity().items():
+                    self.typeahead.record(item, count)
+            except sqlite3.Error:
+                pass
+        self.typeahead.rebuild(catalog_terms(self.engine.products_db))
+        
+        # Pick up planogram changes without restarting the kiosk
+        if self.reload_interval > 0:
+            self.catalog_watcher = CatalogWatcher(
+                self.engine, self.products_path, self.reload_interval,
+                on_reload=lambda catalog: self.typeahead.rebuild(catalog_terms(catalog.products_db))).start()
+        
+        if self.stock_path or self.stock_port is not None:
+            try:
+                self.stock_feed = StockFeed(self.engine, self.stock_path, self.stock_port).start()
+            except OSError as e:
+                self.warm_up_errors.append(f"Stock feed could not start:\n{str(e)}")
+        
+        try:
+            load_nlp()
+        except (OSError, ImportError):
+            self.warm_up_errors.append(MODEL_MISSING_MESSAGE)
+        self.model_ready.set()
+
+    def check_warm_up(self):
+        """Poll the background warm-up from the Tk thread and update the status line"""
+        while self.warm_up_errors:
+            messagebox.showerror("Error", self.warm_up_errors.pop(0))
+        
+        if self.model_ready.is_set():
+            if assistant_engine.nlp_loaded():
+                self.status_label.config(text="✅ Assistant ready", fg="#2E7D32")
+            else:
+                self.status_label.config(text="⚠️ Quick-answer mode (spaCy model unavailable)", fg="#D32F2F")
+            self.record_startup_time("model_ready")
+            self.root.after(1000, self.check_catalog_version)
+            return
+        
+        if self.engine.catalog_ready.is_set():
+            self.status_label.config(text="⏳ Warming up the AI model... quick answers available")
+        self.root.after(100, self.check_warm_up)
+
+    def check_catalog_version(self):
+        """Report catalog hot reloads (and rejected updates) on the status line"""
+        catalog = self.engine.catalog
+        if catalog is not None and catalog.version != self.shown_catalog_version:
+            if self.shown_catalog_version is not None:
+                self.status_label.config(text=f"🔄 Catalog updated to version {catalog.version} "
+                                              f"({len(catalog.index)} items, {catalog.load_seconds * 1000:.0f} ms)",
+                                         fg="#1976D2")
+            self.shown_catalog_version = catalog.version
+        
+        watcher = self.catalog_watcher
+        if watcher is not None and watcher.failures != self.shown_reload_failures:
+            self.shown_reload_failures = watcher.failures
+            self.status_label.config(text=f"⚠️ {self.products_path} update rejected: {watcher.last_error}", fg="#D32F2F")
+        
+        self.root.after(1000, self.check_catalog_version)
+
     def update_stats(self):
         """Update the statistics display"""
         total_items = len(self.shopping_list)
-        categories = len(set(info["category"] for info in self.shopping_list.values() 
-                           if info["category"] != "unknown"))
+        categories = self.shopping_list.category_count
         self.stats_label.config(text=f"Items in list: {total_items} | Categories: {categories}")
 
     def initial_greeting(self):
@@ -246,12 +480,68 @@ class SupermarketChatbotGUI:
         ])
         self.add_message("assistant", greeting)
 
-    def add_message(self, sender, message):
+    def start_store_session(self):
+        """Open a new saved session; if the database refuses, sessions stop being saved"""
+        try:
+            self.store_session = self.store.start_session()
+        except sqlite3.Error as e:
+            self.store.close()
+            self.store, self.store_error = None, str(e)
+            self.status_label.config(text=f"⚠️ Sessions are not being saved: {self.store_error}", fg="#D32F2F")
+
+    def restore_session(self):
+        """Show the last unfinished session again; returns False if there was nothing to restore"""
+        if self.store is None:
+            if self.store_error:
+                self.status_label.config(text=f"⚠️ Sessions are not being saved: {self.store_error}", fg="#D32F2F")
+            return False
+        started = time.perf_counter()
+        saved = self.store.last_open_session(self.max_history)
+        if saved is None:
+            self.start_store_session()
+            return False
+        if not saved.shopping_list and not any(sender == "user" for sender, _, _ in saved.messages):
+            # Only a greeting: close it, or every restart would add another greeting to it
+            self.store.end_session(saved.id)
+            self.start_store_session()
+            return False
+        self.store_session = saved.id
+        
+        for sender, text, created in saved.messages:
+            self.add_message(sender, text, datetime.fromisoformat(created).strftime("%H:%M"), persist=False)
+        self.shopping_list = saved.shopping_list
+        self.update_stats()
+        self.add_message("assistant", "👋 Welcome back! I've restored your conversation and shopping list.",
+                         persist=False)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.status_label.config(text=f"♻️ Restored your last session in {elapsed_ms:.0f} ms", fg="#1976D2")
+        return True
+
+    def on_close(self):
+        # Commit anything still queued; the session stays open so the next start restores it
+        if self.store is not None:
+            self.store.close()
+        if self.stock_feed is not None:
+            self.stock_feed.stop()
+        self.root.destroy()
+
+    def add_message(self, sender, message, timestamp=None, persist=True):
+        self.conversation.append((sender, message))
+        if persist and self.store is not None:
+            self.store.record_message(self.store_session, sender, message)
+        timestamp = timestamp or datetime.now().strftime("%H:%M")
+        if self.transcript is not None:
+            self.transcript.add_message(sender, message, timestamp)
+            return
+        
         # Create message bubble with enhanced styling
         bubble_container = tk.Frame(self.scrollable_frame, bg="#F5F5F5")
         bubble_container.pack(fill=tk.X, padx=15, pady=8)
         
-        timestamp = datetime.now().strftime("%H:%M")
+        # Keep at most max_history bubbles alive
+        self.bubbles.append(bubble_container)
+        while len(self.bubbles) > self.max_history:
+            self.bubbles.popleft().destroy()
 
         if sender == "user":
     # User message row (use grid for full width control)
@@ -321,122 +611,201 @@ class SupermarketChatbotGUI:
         self.add_message("user", user_text)
         self.user_input.delete(0, tk.END)
         
-        # Handle thank you messages
-        if self.is_thank_you(user_text):
-            thank_you_responses = [
-                "You're very welcome! 😊 I'm always happy to help you find what you need. Have a wonderful shopping experience! 🛒✨",
-                "My pleasure! 🌟 Thank you for using our smart shopping assistant. Hope you found everything you needed! Come back anytime! 👋",
-                "You're most welcome! 🤗 It was great helping you today. Enjoy your shopping and have a fantastic day! 🎉",
-                "Glad I could help! 😄 Thanks for choosing our AI assistant. Wishing you a pleasant shopping trip! 🛍️"
-            ]
-            response = random.choice(thank_you_responses)
-            self.add_message("assistant", response)
-            return
+        # NLP and matching run on the worker thread; poll_replies shows the answer
+        self.request_queue.put((self.session_id, user_text, time.perf_counter(), sorted(self.shopping_list.groups)))
+
+    def query_worker(self):
+        """Answer queued messages one at a time, in order, off the Tk thread"""
+        while True:
+            session_id, user_text, started, categories = self.request_queue.get()
+            self.metrics.record("queue", started)
+            try:
+                service_started = time.perf_counter()
+                reply = self.build_reply(user_text, session_id)
+                if self.server_url:
+                    self.metrics.record("service", service_started)
+            except Exception as e:
+                reply = {
+                    "messages": [f"❌ Sorry, something went wrong while looking that up.\n\nError: {str(e)}"],
+                    "results": None,
+                    "followup": None
+                }
+            if self.server_url and reply["results"]:
+                # Planning the route is a service call too, so it is made here and not on the Tk thread
+                found = {info["category"] for info in reply["results"].values() if info["category"] != "unknown"}
+                try:
+                    reply["route"] = self.engine.plan_route(sorted(set(categories) | found))
+                except (http.client.HTTPException, OSError, RuntimeError):
+                    pass
+            self.reply_queue.put((session_id, reply, started))
+
+    def poll_replies(self):
+        """Show finished replies on the Tk thread"""
+        while True:
+            try:
+                session_id, reply, started = self.reply_queue.get_nowait()
+            except queue.Empty:
+                break
+            # Replies to messages sent before "New Session" are dropped
+            if session_id == self.session_id:
+                self.show_reply(reply, started)
+        self.root.after(REPLY_POLL_MS, self.poll_replies)
+
+    def build_reply(self, user_text, session_id=0):
+        """Work out the assistant's reply to one message without touching any widgets"""
+        if self.server_url:
+            return self.engine.build_reply(user_text, session=session_id)
+        return self.engine.build_reply(user_text)
+
+    def show_reply(self, reply, started=None):
+        """Apply a reply from the worker: update the shopping list and add the messages"""
+        render_started = time.perf_counter()
+        if reply.get("route") is not None:
+            self.walking_order = reply["route"]
+        if reply["results"] is not None:
+            # Update shopping list
+            self.shopping_list.update(reply["results"], reply.get("quantities"))
+            for item, info in reply["results"].items():
+                if info["category"] != "unknown":
+                    self.typeahead.record(info.get("matched") or item)
+            if self.store is not None:
+                for item in reply["results"]:
+                    self.store.record_item(self.store_session, self.shopping_list.get(item))
+            self.update_stats()
+        
+        for message in reply["messages"]:
+            self.add_message("assistant", message)
+        self.metrics.record("render", render_started)
+        if started is not None:
+            self.metrics.record("total", started)
+        
+        if reply["results"] is not None:
+            self.record_startup_time("time_to_first_answer")
         
-        # Handle greetings
-        if self.is_greeting(user_text):
-            response = random.choice([
-                "Hello there! 😊 How can I help you with your shopping today? Just tell me what you're looking for! 🛒",
-                "Hi! Nice to meet you! 👋 What items can I help you locate in our store today?",
-                "Greetings! 🌟 I'm ready to help you find anything in our store! What do you need?"
-            ])
-            self.add_message("assistant", response)
+        # Small delay effect for better user experience
+        if reply["followup"]:
+            self.root.after(1000, self.show_followup, self.session_id, reply["followup"])
+
+        # List commands typed in the chat work like the toolbar buttons
+        action = reply.get("action")
+        if action == SHOW_LIST:
+            self.show_shopping_list()
+        elif action == PRINT_LIST:
+            self.print_shopping_list()
+        elif action == CLEAR_LIST:
+            self.clear_chat()
+        elif action == REMOVE_ITEMS:
+            self.remove_items(reply["remove"])
+
+    def show_followup(self, session_id, text):
+        # Dropped if "New session" was pressed during the delay
+        if session_id == self.session_id:
+            self.add_message("assistant", text)
+
+    def remove_items(self, items):
+        """Take the named items off the shopping list and say what happened"""
+        removed, missing = [], []
+        for item in items:
+            name = self.shopping_list.find(item)
+            if name is not None and self.shopping_list.remove(name):
+                removed.append(name)
+                if self.store is not None:
+                    self.store.record_removal(self.store_session, name)
+            else:
+                missing.append(item)
+        lines = []
+        if removed:
+            lines.append("🗑️ Removed from your list: " + ", ".join(name.capitalize() for name in removed))
+        if missing:
+            lines.append("🤔 Not on your list: " + ", ".join(item.capitalize() for item in missing))
+        self.add_message("assistant", "\n".join(lines))
+        self.update_stats()
+
+    def metrics_gauges(self):
+        """Counters exported next to the stage histograms"""
+        # Copied first: the metrics exporter calls this from its own thread
+        gauges = {f"startup_{milestone}_seconds": round(seconds, 3)
+                  for milestone, seconds in dict(self.startup_times).items()}
+        if self.server_url:
+            return gauges
+        intents = self.engine.router.stats()
+        cache = self.engine.query_cache.stats()
+        gauges["messages_total"] = intents["messages"]
+        gauges["messages_skipped_nlp_total"] = intents["skipped_nlp"]
+        gauges["query_cache_hit_rate"] = cache["hit_rate"]
+        if self.stock_feed is not None:
+            stock = self.stock_feed.stats()
+            gauges["stock_updates_total"] = stock["received"]
+            gauges["stock_updates_rejected_total"] = stock["rejected"]
+            gauges["stock_snapshot_version"] = stock["snapshot"]["version"]
+        return gauges
+
+    def toggle_diagnostics(self, event=None):
+        if self.diagnostics_window is not None:
+            self.close_diagnostics()
             return
-        
-        # Extract items using NLP
-        items = extract_items(user_text)
-        if not items:
-            helpful_responses = [
-                "I couldn't identify any specific items from your message. 🤔\n\nCould you please mention what you're looking for? For example:\n• 'I need apples and milk'\n• 'Where can I find bread?'\n• 'Looking for cleaning supplies'",
-                "I'm not sure what items you're looking for. 😅\n\nTry being more specific about the products you need. I can help you find anything from fruits to cleaning supplies!",
-                "Hmm, I didn't catch any product names there. 🧐\n\nJust tell me what items you want to buy, and I'll show you exactly where to find them!"
-            ]
-            self.add_message("assistant", random.choice(helpful_responses))
+        self.diagnostics_window = tk.Toplevel(self.root)
+        self.diagnostics_window.title("🩺 Diagnostics")
+        self.diagnostics_window.geometry("560x320")
+        self.diagnostics_window.protocol("WM_DELETE_WINDOW", self.close_diagnostics)
+        self.diagnostics_text = tk.Text(self.diagnostics_window, font=("Courier New", 10),
+                                        bg="#fafafa", fg="#333333", relief="flat", padx=10, pady=10)
+        self.diagnostics_text.pack(fill=tk.BOTH, expand=True)
+        self.refresh_diagnostics()
+
+    def close_diagnostics(self):
+        if self.diagnostics_refresh is not None:
+            self.root.after_cancel(self.diagnostics_refresh)
+            self.diagnostics_refresh = None
+        if self.diagnostics_window is not None:
+            self.diagnostics_window.destroy()
+        self.diagnostics_window = None
+        self.diagnostics_text = None
+
+    def refresh_diagnostics(self):
+        if self.diagnostics_window is None:
             return
-        
-        # Acknowledge the request
-        acknowledgment = random.choice([
-            "Perfect! Let me help you find those items right away! 🔍",
-            "Great choice! I'll locate those items for you instantly! ⚡",
-            "Excellent! Let me check our store layout for you! 📍",
-            "Sure thing! Finding the best locations for your items! 🎯"
-        ])
-        self.add_message("assistant", acknowledgment)
-        
-        # Find shelves
-        results = find_shelves(items, self.products_db)
-        
-        # Update shopping list
-        self.shopping_list.update(results)
-        self.update_stats()
-        
-        # Display results
-        self.display_results(results)
-        
-        # Ask for more items after showing results
-        followup_questions = [
-            "Anything else you'd like to add to your shopping list? 🛍️",
-            "Is there anything else you're looking for today? 😊",
-            "Would you like me to help you find any other items? 🤔",
-            "Any other products you need help locating? 📦",
-            "What else can I help you find in our store? 🛒"
-        ]
-        
-        # Small delay effect for better user experience
-        self.root.after(1000, lambda: self.add_message("assistant", random.choice(followup_questions)))
+        lines = [f"{'Stage':<12}{'Count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}",
+                 "─" * 60]
+        for stage, summary in self.metrics.summary().items():
+            lines.append(f"{stage:<12}{summary['count']:>8}{summary['p50_ms']:>10.2f}{summary['p95_ms']:>10.2f}"
+                         f"{summary['p99_ms']:>10.2f}{summary['max_ms']:>10.2f}")
+        if not self.metrics.enabled:
+            lines.append("\nInstrumentation is off (--no-instrumentation)")
+        for name, value in self.metrics_gauges().items():
+            lines.append(f"{name}: {value}")
+        if self.metrics_exporter is not None:
+            lines.append(f"\nMetrics file: {self.metrics_exporter.path} ({self.metrics_exporter.exports} exports)")
+        self.diagnostics_text.config(state=tk.NORMAL)
+        self.diagnostics_text.delete("1.0", tk.END)
+        self.diagnostics_text.insert(tk.END, "\n".join(lines))
+        self.diagnostics_text.config(state=tk.DISABLED)
+        self.diagnostics_refresh = self.root.after(DIAGNOSTICS_REFRESH_MS, self.refresh_diagnostics)
 
     def is_greeting(self, text):
-        greetings_list = ["hi", "hello", "hey", "greetings", "good morning", "good afternoon", "good evening", "howdy"]
-        text_lower = text.lower()
-        return any(greeting in text_lower for greeting in greetings_list)
+        return is_greeting(text)
 
     def is_thank_you(self, text):
-        thank_you_phrases = ["thank you", "thanks", "thank u", "thx", "appreciate", "grateful", "bye", "goodbye"]
-        text_lower = text.lower()
-        return any(phrase in text_lower for phrase in thank_you_phrases)
+        return is_thank_you(text)
 
     def display_results(self, results: Dict[str, Dict]):
-        # Create results message with enhanced formatting
-        result_lines = ["🔍 **Shelf Locations Found:**"]
-        result_lines.append("═" * 40)
-        
-        categories_found = {}
-        not_found = []
-        
-        for item, info in results.items():
-            if info["category"] != "unknown":
-                if info["category"] not in categories_found:
-                    categories_found[info["category"]] = []
-                categories_found[info["category"]].append((item, info["shelf"]))
-            else:
-                not_found.append(item)
-        
-        # Display items by category with better icons
-        category_icons = {
-            "fruits": "🍎", "dairy": "🥛", "bakery": "🍞", "stationary": "📝", 
-            "cleaning": "🧽", "beverages": "☕", "snacks": "🍿", 
-            "frozen": "🧊", "vegetables": "🥬", "spices": "🧂"
-        }
-        
-        for category, items in categories_found.items():
-            category_name = category.replace('_', ' ').title()
-            icon = category_icons.get(category, "📁")
-            result_lines.append(f"\n{icon} **{category_name} Section:**")
-            for item, shelf in items:
-                result_lines.append(f"   ✓ {item.capitalize()} → {shelf}")
-        
-        # Display not found items
-        if not_found:
-            result_lines.append(f"\n❌ **Items Not Available:**")
-            for item in not_found:
-                result_lines.append(f"   • {item.capitalize()} → Sorry, not in our current inventory")
-        
-        # Add helpful tip
-        if categories_found:
-            result_lines.append(f"\n💡 **Shopping Tip:** Visit sections in order for efficient shopping!")
-        
-        # Add results message
-        self.add_message("assistant", "\n".join(result_lines))
+        self.add_message("assistant", self.format_results(results))
+
+    def format_results(self, results: Dict[str, Dict]) -> str:
+        return format_results(results)
+
+    def route_order(self) -> list:
+        """The shopping list's categories in walking order, alphabetical if no route can be planned"""
+        categories = sorted(self.shopping_list.groups)
+        if self.server_url:
+            # Never ask the service from here: that would block the window
+            position = {category: number for number, category in enumerate(self.walking_order)}
+            return sorted(categories, key=lambda category: (position.get(category, len(position)), category))
+        try:
+            # Sections without a shelf position keep the alphabetical order
+            return self.engine.plan_route(categories)
+        except (OSError, RuntimeError):
+            return categories
 
     def show_shopping_list(self):
         if not self.shopping_list:
@@ -469,47 +838,29 @@ class SupermarketChatbotGUI:
                                              padx=15, pady=15)
         list_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        # Format shopping list with better organization
-        categories = {}
-        not_found = []
-        
-        for item, info in self.shopping_list.items():
-            if info["category"] != "unknown":
-                if info["category"] not in categories:
-                    categories[info["category"]] = []
-                categories[info["category"]].append((item, info["shelf"]))
-            else:
-                not_found.append(item)
-        
         # Create organized list content
         list_content = []
         list_content.append("🛒 SMART SHOPPING LIST")
         list_content.append("=" * 50)
         list_content.append(f"Generated: {datetime.now().strftime('%Y-%m-%d at %H:%M')}")
-        list_content.append(f"Total Items: {len(self.shopping_list)}")
+        list_content.append(f"Total Items: {len(self.shopping_list)} ({self.shopping_list.total_quantity} to pick up)")
         list_content.append("=" * 50)
         list_content.append("")
         
-        category_icons = {
-            "fruits": "🍎", "dairy": "🥛", "bakery": "🍞", "eggs": "🥚", 
-            "cleaning": "🧽", "beverages": "☕", "snacks": "🍿", 
-            "frozen": "🧊", "canned": "🥫", "spices": "🧂"
-        }
-        
-        for category, items in sorted(categories.items()):
+        for category, entries in self.shopping_list.grouped(self.route_order()):
             category_name = category.replace('_', ' ').title()
-            icon = category_icons.get(category, "📁")
+            icon = CATEGORY_ICONS.get(category, "📁")
             list_content.append(f"{icon} {category_name.upper()} SECTION:")
             list_content.append("-" * 30)
-            for item, shelf in sorted(items):
-                list_content.append(f"  ✓ {item.capitalize():<20} → {shelf}")
+            for entry in entries:
+                list_content.append(f"  ✓ {item_label(entry.item, entry.quantity):<20} → {entry.shelf}")
             list_content.append("")
         
-        if not_found:
+        if self.shopping_list.not_found:
             list_content.append("❌ ITEMS NOT AVAILABLE:")
             list_content.append("-" * 30)
-            for item in not_found:
-                list_content.append(f"  • {item.capitalize()}")
+            for item in self.shopping_list.not_found:
+                list_content.append(f"  • {item_label(item, self.shopping_list.get(item).quantity)}")
             list_content.append("")
         
         list_content.append("💡 Happy Shopping! 🛍️")
@@ -522,63 +873,31 @@ class SupermarketChatbotGUI:
             messagebox.showinfo("Export Shopping List", "🛒 Your shopping list is empty!\n\nAdd some items before exporting!")
             return
         
-        try:
-            # Create downloads directory if it doesn't exist
-            if not os.path.exists("shopping_lists"):
-                os.makedirs("shopping_lists")
-            
-            filename = f"shopping_lists/SmartList_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-            
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write("🛒 SMART SUPERMARKET SHOPPING LIST\n")
-                f.write("═" * 60 + "\n")
-                f.write(f"Generated: {datetime.now().strftime('%Y-%m-%d at %H:%M:%S')}\n")
-                f.write(f"Total Items: {len(self.shopping_list)}\n")
-                f.write("═" * 60 + "\n\n")
-                
-                categories = {}
-                not_found = []
-                
-                for item, info in self.shopping_list.items():
-                    if info["category"] != "unknown":
-                        if info["category"] not in categories:
-                            categories[info["category"]] = []
-                        categories[info["category"]].append((item, info["shelf"]))
-                    else:
-                        not_found.append(item)
-                
-                category_icons = {
-                    "fruits": "🍎", "dairy": "🥛", "bakery": "🍞", "eggs": "🥚", 
-                    "cleaning": "🧽", "beverages": "☕", "snacks": "🍿", 
-                    "frozen": "🧊", "canned": "🥫", "spices": "🧂"
-                }
-                
-                for category, items in sorted(categories.items()):
-                    category_name = category.replace('_', ' ').title()
-                    icon = category_icons.get(category, "📁")
-                    f.write(f"{icon} {category_name.upper()} SECTION:\n")
-                    f.write("-" * 40 + "\n")
-                    for item, shelf in sorted(items):
-                        f.write(f"  ✓ {item.capitalize():<25} → {shelf}\n")
-                    f.write("\n")
-                
-                if not_found:
-                    f.write("❌ ITEMS NOT AVAILABLE:\n")
-                    f.write("-" * 40 + "\n")
-                    for item in not_found:
-                        f.write(f"  • {item.capitalize()}\n")
-                    f.write("\n")
-                
-                f.write("═" * 60 + "\n")
-                f.write("💡 Tip: Follow the shelf order for efficient shopping!\n")
-                f.write("🛍️ Happy Shopping!\n")
-            
-            success_message = f"🎉 Success!\n\nYour shopping list has been exported to:\n{filename}\n\nThe file is ready to print or share!"
-            messagebox.showinfo("Export Complete", success_message)
-            
-        except Exception as e:
-            error_message = f"❌ Export Failed\n\nSorry, I couldn't save your shopping list.\nError: {str(e)}\n\nPlease try again or contact support."
-            messagebox.showerror("Export Error", error_message)
+        # The snapshot is taken here; formatting and writing happen on the exporter thread
+        self.list_exporter.submit(list_snapshot(self.shopping_list, self.route_order()), self.export_formats)
+        self.export_pending += 1
+        self.status_label.config(text="💾 Exporting your shopping list...", fg="#1976D2")
+        if not self.export_polling:
+            self.export_polling = True
+            self.root.after(EXPORT_POLL_MS, self.check_exports)
+
+    def check_exports(self):
+        """Report finished exports on the Tk thread"""
+        for paths, error in self.list_exporter.poll():
+            self.export_pending -= 1
+            if error is None:
+                files = "\n".join(paths)
+                success_message = f"🎉 Success!\n\nYour shopping list has been exported to:\n{files}\n\nThe file is ready to print or share!"
+                self.status_label.config(text=f"💾 Shopping list saved to {paths[0]}", fg="#388E3C")
+                messagebox.showinfo("Export Complete", success_message)
+            else:
+                error_message = f"❌ Export Failed\n\nSorry, I couldn't save your shopping list.\nError: {error}\n\nPlease try again or contact support."
+                self.status_label.config(text="⚠️ Shopping list export failed", fg="#D32F2F")
+                messagebox.showerror("Export Error", error_message)
+        if self.export_pending > 0:
+            self.root.after(EXPORT_POLL_MS, self.check_exports)
+        else:
+            self.export_polling = False
 
     def clear_chat(self):
         # Show confirmation dialog
@@ -589,15 +908,25 @@ class SupermarketChatbotGUI:
             return
         
         # Clear chat display
-        for widget in self.scrollable_frame.winfo_children():
-            widget.destroy()
+        if self.transcript is not None:
+            self.transcript.clear()
+        else:
+            for widget in self.scrollable_frame.winfo_children():
+                widget.destroy()
+            self.bubbles.clear()
         
-        # Clear shopping list
+        # Clear shopping list and drop replies still in flight
+        self.session_id += 1
         self.shopping_list.clear()
+        self.conversation.clear()
+        if self.store is not None:
+            self.store.end_session(self.store_session)
+            self.start_store_session()
         self.update_stats()
         
         # Reset scroll
-        self.chat_canvas.configure(scrollregion=self.chat_canvas.bbox("all"))
+        if self.transcript is None:
+            self.chat_canvas.configure(scrollregion=self.chat_canvas.bbox("all"))
         
         # Show initial greeting
         self.initial_greeting()
@@ -606,6 +935,52 @@ class SupermarketChatbotGUI:
         self.user_input.focus_set()
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Smart Supermarket Assistant")
+    parser.add_argument("--transcript", choices=["bubbles", "text"], default="text",
+                        help="chat rendering: one lightweight Text widget (default) or a widget per message")
+    parser.add_argument("--max-history", type=int, default=MAX_HISTORY,
+                        help="messages kept in the chat window before the oldest are dropped")
+    parser.add_argument("--cache-size", type=int, default=MAX_CACHED_QUERIES,
+                        help="distinct questions remembered by the query cache (0 disables it)")
+    parser.add_argument("--server", metavar="URL",
+                        help=f"run as a thin client of assistant_service.py (e.g. http://127.0.0.1:{DEFAULT_PORT})")
+    parser.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL_SECONDS,
+                        help="seconds between checks of products.json for changes (0 disables hot reload)")
+    parser.add_argument("--products", default="products.json",
+                        help="product database: products.json or a compiled .catalog file")
+    parser.add_argument("--no-instrumentation", action="store_true",
+                        help="do not time the per-message stages")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="periodically write stage timings here in Prometheus text format")
+    parser.add_argument("--metrics-interval", type=float, default=EXPORT_INTERVAL_SECONDS,
+                        help="seconds between metrics file updates")
+    parser.add_argument("--export-formats", nargs="+", choices=sorted(FORMATS), default=EXPORT_FORMATS,
+                        help="formats written by the export button (default: txt json)")
+    parser.add_argument("--session-db", default=SESSION_DB,
+                        help="SQLite file the sessions are saved in (default: sessions.db)")
+    parser.add_argument("--no-persistence", action="store_true",
+                        help="do not save sessions or restore the last one")
+    parser.add_argument("--kiosk-name", default=DEFAULT_KIOSK,
+                        help="whose sessions to restore when kiosks share --session-db (default: host name)")
+    parser.add_argument("--stock-file", metavar="PATH",
+                        help="follow live stock levels appended to this JSON-lines file")
+    parser.add_argument("--stock-port", type=int, metavar="PORT",
+                        help="receive live stock levels as UDP datagrams on this local port")
+    parser.add_argument("--extractor", choices=assistant_engine.EXTRACTORS, default="spacy",
+                        help="item extraction backend (lexicon: no spaCy, for low-memory kiosks)")
+    args = parser.parse_args()
+    if args.max_history < 1:
+        parser.error("--max-history must be at least 1")
+    
     root = tk.Tk()
-    app = SupermarketChatbotGUI(root)
+    app = SupermarketChatbotGUI(root, transcript_mode=args.transcript, max_history=args.max_history,
+                                cache_size=args.cache_size, server_url=args.server,
+                                reload_interval=args.reload_interval, products_path=args.products,
+                                instrument=not args.no_instrumentation, metrics_path=args.metrics_file,
+                                metrics_interval=args.metrics_interval, export_formats=args.export_formats,
+                                session_db=None if args.no_persistence else args.session_db,
+                                stock_path=args.stock_file, stock_port=args.stock_port,
+                                extractor=args.extractor, kiosk_name=args.kiosk_name)
     root.mainloop()
\ No newline at end of file
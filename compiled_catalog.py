@@ -0,0 +1,372 @@
+"""Compact, memory-mapped catalog format.
+
+Compiles products.json into one binary file holding an interned string
+table, the category table and the lookup structures CatalogIndex would
+otherwise build at startup (sorted exact and plural-variant term arrays,
+n-gram posting lists). Opening it is an mmap plus a header read, and
+processes on the same machine share the file's pages:
+
+    python compiled_catalog.py products.json -o products.catalog
+    python chatbot_gui.py --products products.catalog
+
+All integers are little-endian uint32. Layout after the header:
+
+    string offsets   (strings + 1)        into the UTF-8 string blob
+    categories       (categories x 4)     name id, shelf id, first position, item count
+    shelf positions  (categories x 2)     x, y as float32; NaN when the category has no position
+    position terms   (positions)          term string id, in catalog order
+    position cats    (positions)          category number per position
+    exact terms      (exact x 2)          term id, first position; sorted by term
+    folded terms     (folded x 2)         plural variant id, first position; sorted by term
+    grams            (grams x 3)          gram id, postings start, postings count; sorted by gram
+    postings         (postings)           catalog positions, ascending per gram
+    synonyms         (synonyms x 3)       category number, customer word id, catalog item id
+    string blob
+
+The typo-tolerant index and the phrase automaton are not stored; they
+are built from the mapped terms the first time a lookup needs them.
+"""
+import argparse
+import array
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Dict, List
+
+from catalog_index import NGRAM_SIZE, CatalogIndex, plural_variants
+from fuzzy_matcher import MAX_EDIT_DISTANCE
+
+MAGIC = b"SMCAT\x00\x04\x00"
+HEADER = struct.Struct("<8s9I")
+COMPILED_SUFFIX = ".catalog"
+
+# Resolved terms remembered by each opened compiled catalog
+LOOKUP_MEMO_SIZE = 4096
+
+
+def is_compiled_catalog(path: str) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _grams(term: str):
+    grams = set()
+    for size in range(1, NGRAM_SIZE + 1):
+        for start in range(len(term) - size + 1):
+            grams.add(term[start:start + size])
+    return grams
+
+
+def compile_catalog(products_db: Dict, out_path: str) -> Dict:
+    """Write ``products_db`` to ``out_path`` in the compiled format (atomically)"""
+    strings: Dict[str, int] = {}
+
+    def intern(text: str) -> int:
+        string_id = strings.get(text)
+        if string_id is None:
+            string_id = strings[text] = len(strings)
+        return string_id
+
+    categories: List[int] = []
+    positions: List[float] = []
+    position_terms: List[int] = []
+    position_categories: List[int] = []
+    exact: Dict[str, int] = {}
+    folded: Dict[str, int] = {}
+    postings: Dict[str, List[int]] = {}
+    synonym_table: List[int] = []
+
+    for number, (category, data) in enumerate(products_db.items()):
+        categories += [intern(category), intern(data["shelf"]), len(position_terms), len(data["items"])]
+        positions += data.get("position") or [math.nan, math.nan]
+        for db_item in data["items"]:
+            position = len(position_terms)
+            position_terms.append(intern(db_item))
+            position_categories.append(number)
+            exact.setdefault(db_item, position)
+            for variant in plural_variants(db_item):
+                folded.setdefault(variant, position)
+            for gram in _grams(db_item):
+                postings.setdefault(gram, []).append(position)
+        for word, item in (data.get("synonyms") or {}).items():
+            synonym_table += [number, intern(word), intern(item)]
+
+    def sorted_pairs(mapping: Dict[str, int]) -> List[int]:
+        flat = []
+        for text in sorted(mapping, key=lambda key: key.encode('utf-8')):
+            flat += [intern(text), mapping[text]]
+        return flat
+
+    exact_table = sorted_pairs(exact)
+    folded_table = sorted_pairs(folded)
+    gram_table: List[int] = []
+    posting_table: List[int] = []
+    for gram in sorted(postings, key=lambda key: key.encode('utf-8')):
+        gram_table += [intern(gram), len(posting_table), len(postings[gram])]
+        posting_table += postings[gram]
+
+    blob = bytearray()
+    offsets = []
+    for text in strings:  # dicts keep insertion order, which is string id order
+        offsets.append(len(blob))
+        blob += text.encode('utf-8')
+    offsets.append(len(blob))
+
+    header = HEADER.pack(MAGIC, len(strings), len(products_db), len(position_terms),
+                         len(exact), len(folded), len(postings), len(posting_table),
+                         len(synonym_table) // 3, len(blob))
+    sections = [offsets, categories, position_terms, position_categories,
+                exact_table, folded_table, gram_table, posting_table, synonym_table]
+
+    # Write next to the target and rename, so readers mapping the old file are never disturbed
+    directory = os.path.dirname(os.path.abspath(out_path))
+    fd, temp_path = tempfile.mkstemp(prefix=".catalog-", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            for number, section in enumerate(sections):
+                f.write(struct.pack(f"<{len(section)}I", *section))
+                if number == 1:
+                    f.write(struct.pack(f"<{len(positions)}f", *positions))
+            f.write(bytes(blob))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, out_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+    return {"strings": len(strings), "categories": len(products_db), "terms": len(position_terms),
+            "grams": len(postings), "bytes": os.path.getsize(out_path)}
+
+
+class _SortedStringMap:
+    """Binary search over a (string id, value) table sorted by string bytes"""
+
+    def __init__(self, catalog: "CompiledCatalog", table, width: int, value):
+        self.catalog = catalog
+        self.table = table
+        self.width = width
+        self.value = value
+        self.count = len(table) // width
+
+    def key_at(self, row: int) -> bytes:
+        return self.catalog.string_bytes(self.table[row * self.width])
+
+    def lower_bound(self, target: bytes, low: int = 0) -> int:
+        """First row whose key is >= ``target``, searching from ``low``"""
+        # Hot loop: the string table is read inline rather than through key_at()
+        table, width = self.table, self.width
+        offsets, blob = self.catalog.string_offsets, self.catalog.blob
+        high = self.count
+        while low < high:
+            middle = (low + high) // 2
+            string_id = table[middle * width]
+            if blob[offsets[string_id]:offsets[string_id + 1]].tobytes() < target:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def get(self, key: str, default=None):
+        target = key.encode('utf-8')
+        row = self.lower_bound(target)
+        if row < self.count and self.key_at(row) == target:
+            return self.value(row * self.width)
+        return default
+
+
+class _PositionTerms:
+    def __init__(self, catalog: "CompiledCatalog"):
+        self.catalog = catalog
+
+    def __len__(self):
+        return len(self.catalog.position_terms)
+
+    def __getitem__(self, position: int) -> str:
+        return self.catalog.string(self.catalog.position_terms[position])
+
+
+class _PositionLocations:
+    def __init__(self, catalog: "CompiledCatalog"):
+        self.catalog = catalog
+
+    def __len__(self):
+        return len(self.catalog.position_categories)
+
+    def __getitem__(self, position: int) -> Dict:
+        number = self.catalog.position_categories[position]
+        return {
+            "shelf": self.catalog.string(self.catalog.categories[number * 4 + 1]),
+            "category": self.catalog.string(self.catalog.categories[number * 4])
+        }
+
+
+class MappedCatalogIndex(CatalogIndex):
+    """CatalogIndex whose lookup tables live in the mapped file instead of Python dicts.
+
+    Binary searches over the file are slower per term than dict lookups, so
+    resolved terms are memoized in a small LRU; kiosk queries reuse a small
+    vocabulary.
+    """
+
+    def __init__(self, catalog: "CompiledCatalog", max_edit_distance: int = MAX_EDIT_DISTANCE):
+        # The base class sets up everything but the tables (empty here), which are replaced below
+        super().__init__({}, max_edit_distance)
+        self.compiled = catalog
+        self._memo_lookup = lru_cache(maxsize=LOOKUP_MEMO_SIZE)(super().lookup)
+        self.terms = _PositionTerms(catalog)
+        self.locations = _PositionLocations(catalog)
+        self.exact = _SortedStringMap(catalog, catalog.exact, 2, lambda row: catalog.exact[row + 1])
+        self.folded = _SortedStringMap(catalog, catalog.folded, 2, lambda row: catalog.folded[row + 1])
+        grams = _SortedStringMap(catalog, catalog.grams, 3, catalog.gram_postings)
+        # One gram table serves both the short-query and the trigram paths
+        self.ngrams = grams
+        self.short_grams = grams
+        for synonyms in catalog.synonyms.values():
+            self.synonyms.update(synonyms)
+
+    def lookup(self, item: str) -> Dict:
+        return dict(self._memo_lookup(item))
+
+
+class CompiledProducts(Mapping):
+    """Read-only products_db view over a compiled catalog; categories are decoded on access"""
+
+    def __init__(self, catalog: "CompiledCatalog"):
+        self.catalog = catalog
+        self.numbers = {catalog.string(catalog.categories[number * 4]): number
+                        for number in range(catalog.category_count)}
+
+    @property
+    def index(self) -> MappedCatalogIndex:
+        return self.catalog.index
+
+    def __getitem__(self, category: str) -> Dict:
+        catalog = self.catalog
+        row = self.numbers[category] * 4
+        first, count = catalog.categories[row + 2], catalog.categories[row + 3]
+        data = {
+            "shelf": catalog.string(catalog.categories[row + 1]),
+            "items": [catalog.string(catalog.position_terms[position])
+                      for position in range(first, first + count)]
+        }
+        x, y = catalog.shelf_positions[row // 2], catalog.shelf_positions[row // 2 + 1]
+        if not math.isnan(x):
+            data["position"] = [x, y]
+        if row // 4 in catalog.synonyms:
+            data["synonyms"] = dict(catalog.synonyms[row // 4])
+        return data
+
+    def __iter__(self):
+        return iter(self.numbers)
+
+    def __len__(self):
+        return len(self.numbers)
+
+
+class CompiledCatalog:
+    """A compiled catalog file opened with mmap"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, string_count, self.category_count, position_count, exact_count,
+         folded_count, gram_count, posting_count, synonym_count, blob_size) = HEADER.unpack_from(self.mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compiled catalog")
+
+        view = memoryview(self.mmap)
+        offset = HEADER.size
+
+        def section(count: int, kind: str = 'I'):
+            nonlocal offset
+            size = count * 4
+            if offset + size > len(self.mmap):
+                raise ValueError(f"{path} is truncated")
+            values = view[offset:offset + size].cast(kind)
+            if sys.byteorder != "little":
+                # The file is little-endian; big-endian machines read a swapped copy instead of the mapping
+                values = array.array(kind)
+                values.frombytes(view[offset:offset + size])
+                values.byteswap()
+            offset += size
+            return values
+
+        self.string_offsets = section(string_count + 1)
+        self.categories = section(self.category_count * 4)
+        self.shelf_positions = section(self.category_count * 2, 'f')
+        self.position_terms = section(position_count)
+        self.position_categories = section(position_count)
+        self.exact = section(exact_count * 2)
+        self.folded = section(folded_count * 2)
+        self.grams = section(gram_count * 3)
+        self.postings = section(posting_count)
+        synonym_table = section(synonym_count * 3)
+        if offset + blob_size > len(self.mmap):
+            raise ValueError(f"{path} is truncated")
+        self.blob = view[offset:offset + blob_size]
+        # Synonym tables are a few words per category, so they are decoded once
+        self.synonyms: Dict[int, Dict[str, str]] = {}
+        for row in range(0, len(synonym_table), 3):
+            words = self.synonyms.setdefault(synonym_table[row], {})
+            words[self.string(synonym_table[row + 1])] = self.string(synonym_table[row + 2])
+
+        self.index = MappedCatalogIndex(self)
+        self.products = CompiledProducts(self)
+
+    def string_bytes(self, string_id: int) -> bytes:
+        return self.blob[self.string_offsets[string_id]:self.string_offsets[string_id + 1]].tobytes()
+
+    def string(self, string_id: int) -> str:
+        return self.string_bytes(string_id).decode('utf-8')
+
+    def gram_postings(self, row: int):
+        start, count = self.grams[row + 1], self.grams[row + 2]
+        return self.postings[start:start + count]
+
+    def __len__(self):
+        return len(self.position_terms)
+
+
+def open_compiled_catalog(path: str) -> CompiledProducts:
+    """Open a compiled catalog and return its products_db view (carrying the mapped index)"""
+    return CompiledCatalog(path).products
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile products.json into the memory-mapped catalog format")
+    parser.add_argument("products", nargs="?", default="products.json", help="source catalog (default: products.json)")
+    parser.add_argument("-o", "--output", help="compiled file (default: <source>.catalog)")
+    args = parser.parse_args(argv)
+
+    from catalog_reload import validate_products
+
+    output = args.output or os.path.splitext(args.products)[0] + COMPILED_SUFFIX
+    try:
+        with open(args.products, 'r', encoding='utf-8') as f:
+            products_db = validate_products(json.load(f))
+    except FileNotFoundError:
+        parser.error(f"{args.products} file not found")
+    except ValueError as e:
+        parser.error(f"{args.products} is not a valid catalog: {e}")
+
+    summary = compile_catalog(products_db, output)
+    print(f"Compiled {summary['terms']} terms in {summary['categories']} categories "
+          f"({summary['strings']} strings, {summary['grams']} grams) into {output}: {summary['bytes']} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""Compare the two item extraction backends: the spaCy pipeline and the spaCy-free lexicon.
+
+    python extractor_report.py -o extractor_report.json
+    python extractor_report.py --queries queries.txt --products products.json
+
+Each backend runs in a fresh process (``--probe NAME``) so its memory and
+startup cost are measured on their own: resident memory before and after
+loading the backend, the load time, and the time to the first answer. The
+same process extracts items from the whole query corpus; the report then
+scores the lexicon's items, and the shelves they lead to, against spaCy's.
+Without the spaCy model installed only the lexicon figures are reported.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import assistant_engine
+from assistant_engine import AssistantEngine, extract_items_batch, read_products
+from replay_load_test import current_rss_kb
+from service_load_test import sample_queries
+
+DEFAULT_QUERIES = 2000
+
+# Disagreements listed in the report
+EXAMPLES = 20
+
+
+def read_queries(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def probe(name: str, products_path: str, queries_path: str) -> Dict:
+    """Load one backend in this (fresh) process and extract items from every query"""
+    queries = read_queries(queries_path)
+    engine = AssistantEngine(read_products(products_path), cache_size=0)
+    assistant_engine.select_extractor(name)
+    rss_before = current_rss_kb()
+    started = time.perf_counter()
+    try:
+        assistant_engine.load_nlp()
+    except (OSError, ImportError) as e:
+        return {"extractor": name, "available": False, "error": str(e)}
+    load_seconds = time.perf_counter() - started
+    rss_loaded = current_rss_kb()
+
+    started = time.perf_counter()
+    engine.resolve(queries[0])
+    first_answer_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    items = extract_items_batch(queries)
+    extract_seconds = time.perf_counter() - started
+    resolved = engine.resolve_many(queries)
+    rss_after = current_rss_kb()
+    return {
+        "extractor": name,
+        "available": True,
+        "startup": {
+            "load_seconds": round(load_seconds, 4),
+            "first_answer_seconds": round(first_answer_seconds, 4)
+        },
+        "memory": {
+            "rss_before_load_kb": rss_before,
+            "rss_after_load_kb": rss_loaded,
+            "backend_kb": rss_loaded - rss_before if rss_before is not None and rss_loaded is not None else None,
+            "rss_after_corpus_kb": rss_after
+        },
+        "queries_per_second": round(len(queries) / extract_seconds, 1) if extract_seconds else None,
+        "items": [sorted(found) for found in items],
+        "shelves": [sorted({info["category"] for info in results.values() if info["category"] != "unknown"})
+                    for _, results in resolved]
+    }
+
+
+def run_probe(name: str, products_path: str, queries_path: str) -> Dict:
+    """``probe`` in a child process; the process's whole lifetime is its startup-to-exit time"""
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--probe", name,
+                                "--products", products_path, "--queries", queries_path],
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {"extractor": name, "available": False, "error": (completed.stderr.strip().splitlines() or ["probe failed"])[-1]}
+    result = json.loads(completed.stdout)
+    if result["available"]:
+        result["startup"]["process_seconds"] = round(time.perf_counter() - started, 4)
+    return result
+
+
+def agreement(reference: List[List[str]], candidate: List[List[str]]) -> Dict:
+    """Precision, recall and F1 of ``candidate`` against ``reference``, plus the share of exact matches"""
+    matched = extra = missed = exact = 0
+    for expected, found in zip(reference, candidate):
+        expected, found = set(expected), set(found)
+        matched += len(expected & found)
+        extra += len(found - expected)
+        missed += len(expected - found)
+        exact += expected == found
+    precision = matched / (matched + extra) if matched + extra else 1.0
+    recall = matched / (matched + missed) if matched + missed else 1.0
+    return {
+        "precision": round(precision, 4),
+        "recall": round(recall, 4),
+        "f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+        "exact_match_rate": round(exact / len(reference), 4) if reference else 1.0
+    }
+
+
+def parity(queries: List[str], spacy: Dict, lexicon: Dict) -> Dict:
+    examples = [
+        {"query": query, "spacy": expected, "lexicon": found}
+        for query, expected, found in zip(queries, spacy["items"], lexicon["items"]) if expected != found
+    ]
+    return {
+        "items": agreement(spacy["items"], lexicon["items"]),
+        "shelves": agreement(spacy["shelves"], lexicon["shelves"]),
+        "disagreements": len(examples),
+        "examples": examples[:EXAMPLES]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the spaCy and lexicon extraction backends")
+    parser.add_argument("--products", default="products.json", help="product database (default: products.json)")
+    parser.add_argument("--queries", help="file with one query per line (default: generated from the catalog)")
+    parser.add_argument("--count", type=int, default=DEFAULT_QUERIES, help="generated queries")
+    parser.add_argument("--probe", choices=assistant_engine.EXTRACTORS, help=argparse.SUPPRESS)
+    parser.add_argument("-o", "--output", help="write the JSON report here as well")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.products):
+        parser.error(f"{args.products} file not found")
+    if args.probe:
+        print(json.dumps(probe(args.probe, args.products, args.queries)))
+        return 0
+
+    if args.queries:
+        if not os.path.exists(args.queries):
+            parser.error(f"{args.queries} file not found")
+        queries_path = args.queries
+        queries = read_queries(queries_path)
+    else:
+        queries = sample_queries(read_products(args.products), args.count)
+        fd, queries_path = tempfile.mkstemp(suffix=".txt")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(queries) + "\n")
+    if not queries:
+        parser.error("no queries to compare on")
+    try:
+        backends = {name: run_probe(name, args.products, queries_path) for name in assistant_engine.EXTRACTORS}
+    finally:
+        if not args.queries:
+            os.unlink(queries_path)
+
+    report = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "queries": len(queries), "backends": {}}
+    for name, result in backends.items():
+        report["backends"][name] = {key: value for key, value in result.items() if key not in ("items", "shelves")}
+    if backends["spacy"]["available"] and backends["lexicon"]["available"]:
+        report["parity"] = parity(queries, backends["spacy"], backends["lexicon"])
+    else:
+        report["parity"] = {"skipped": "both backends are needed; install en_core_web_sm for spaCy"}
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+# Default number of typos tolerated per term
+MAX_EDIT_DISTANCE = 2
+
+# Only the first PREFIX_LENGTH characters of each term are expanded into deletes,
+# which caps index size and lookup work regardless of term length (SymSpell's prefix trick)
+PREFIX_LENGTH = 7
+
+# One typo is tolerated per this many characters, so short words stay strict
+# ("steak" may not become "tea", "jam" may not become "ham")
+CHARS_PER_EDIT = 4
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    """All strings reachable from ``word`` by deleting up to ``max_distance`` characters"""
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {candidate[:position] + candidate[position + 1:]
+                    for candidate in frontier if len(candidate) > 1
+                    for position in range(len(candidate))} - results
+        results |= frontier
+    return results
+
+
+def edit_distance(first: str, second: str, max_distance: int) -> Optional[int]:
+    """Optimal string alignment distance (adjacent swaps count as one edit), or None above ``max_distance``"""
+    if abs(len(first) - len(second)) > max_distance:
+        return None
+    if first == second:
+        return 0
+    previous_previous = None
+    previous = list(range(len(second) + 1))
+    for row in range(1, len(first) + 1):
+        current = [row] + [0] * len(second)
+        row_minimum = row
+        for column in range(1, len(second) + 1):
+            cost = 0 if first[row - 1] == second[column - 1] else 1
+            value = min(previous[column] + 1, current[column - 1] + 1, previous[column - 1] + cost)
+            if (previous_previous is not None and row > 1 and column > 1
+                    and first[row - 1] == second[column - 2] and first[row - 2] == second[column - 1]):
+                value = min(value, previous_previous[column - 2] + 1)
+            current[column] = value
+            row_minimum = min(row_minimum, value)
+        if row_minimum > max_distance:
+            return None
+        previous_previous, previous = previous, current
+    distance = previous[-1]
+    return distance if distance <= max_distance else None
+
+
+class SymSpellIndex:
+    """Deletion-neighbourhood index for approximate term lookup.
+
+    Every catalog term's prefix is expanded into its deletes up to
+    ``max_distance``; a query is expanded the same way and only terms sharing
+    a delete are verified with a real edit distance. Lookup work depends on
+    the prefix length and distance, not on the number of terms.
+    """
+
+    def __init__(self, terms: Sequence[str], max_distance: int = MAX_EDIT_DISTANCE,
+                 prefix_length: int = PREFIX_LENGTH):
+        self.terms = terms
+        self.max_distance = max_distance
+        self.prefix_length = max(prefix_length, max_distance + 1)
+        self.deletes: Dict[str, List[int]] = {}
+        seen: Set[str] = set()
+        for position, term in enumerate(terms):
+            # Duplicate terms keep their first (lowest) position only
+            if term in seen:
+                continue
+            seen.add(term)
+            for key in _deletes(term[:self.prefix_length], max_distance):
+                self.deletes.setdefault(key, []).append(position)
+
+    def allowed_distance(self, word: str, max_distance: Optional[int] = None) -> int:
+        limit = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        return min(limit, len(word) // CHARS_PER_EDIT)
+
+    def lookup(self, word: str, max_distance: Optional[int] = None, limit: int = 5) -> List[Tuple[int, int]]:
+        """Ranked ``(distance, position)`` candidates within the allowed distance, closest first"""
+        limit_distance = self.allowed_distance(word, max_distance)
+        if limit_distance <= 0 or not word:
+            return []
+
+        checked: Set[int] = set()
+        candidates: List[Tuple[int, int]] = []
+        for key in _deletes(word[:self.prefix_length], limit_distance):
+            for position in self.deletes.get(key, ()):
+                if position in checked:
+                    continue
+                checked.add(position)
+                distance = edit_distance(word, self.terms[position], limit_distance)
+                if distance is not None:
+                    candidates.append((distance, position))
+        candidates.sort()
+        return candidates[:limit]
+
+    def best(self, word: str, max_distance: Optional[int] = None) -> Optional[Tuple[int, int]]:
+        candidates = self.lookup(word, max_distance, limit=1)
+        return candidates[0] if candidates else None
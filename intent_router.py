@@ -0,0 +1,114 @@
+import re
+import threading
+from typing import Dict
+
+GREETING = "greeting"
+THANKS = "thanks"
+HELP = "help"
+SHOW_LIST = "show_list"
+PRINT_LIST = "print_list"
+CLEAR_LIST = "clear_list"
+REMOVE_ITEMS = "remove_items"
+PRODUCT = "product"
+
+INTENTS = [GREETING, THANKS, HELP, SHOW_LIST, PRINT_LIST, CLEAR_LIST, REMOVE_ITEMS, PRODUCT]
+
+GREETING_PHRASES = ["hi", "hello", "hey", "hiya", "greetings", "good morning", "good afternoon",
+                    "good evening", "good day", "howdy", "yo"]
+THANKS_PHRASES = ["thank you", "thanks", "thank u", "thankyou", "thx", "ty", "cheers", "appreciate it",
+                  "i appreciate it", "appreciated", "grateful", "bye", "goodbye", "bye bye", "see you",
+                  "see ya", "that's all", "thats all"]
+# Words that may pad a greeting or thanks without turning it into a question
+FILLER_WORDS = ["there", "again", "so", "much", "very", "a", "lot", "you", "all", "for", "your",
+                "the", "help", "helping", "assistant", "bot", "buddy", "friend", "ok", "okay", "great",
+                "now", "and", "then", "oh", "well", "!"]
+
+LIST = r"(?:my |the )?(?:shopping )?list"
+HELP_PATTERN = (r"help(?: me)?|help please|please help|menu|what can you do|what do you do"
+                r"|how (?:does this|do i use this|do you) work|how do i use (?:this|you)")
+SHOW_LIST_PATTERN = rf"(?:show|view|open|see|display)(?: me)? {LIST}|what(?:'s| is) (?:on|in) {LIST}|{LIST}"
+PRINT_LIST_PATTERN = rf"(?:print|save|export|download)(?: out)? {LIST}"
+CLEAR_LIST_PATTERN = rf"(?:clear|reset|empty|delete)(?: {LIST}| (?:the )?chat| everything)|start over|new session"
+REMOVE_VERBS = r"(?:please )?(?:remove|delete|cross off|take off|take out)"
+# Verbs with everyday meanings ("forget it", "drop me a hint") only remove when the list is named
+LOOSE_REMOVE_VERBS = r"(?:please )?(?:drop|scratch|cancel|forget)"
+FROM_LIST = rf"(?:from|off|out of) {LIST}"
+# "take the bread off my list" splits the verb around the items
+SPLIT_REMOVE_PATTERN = rf"(?:please )?(?:take|cross|scratch) (.+?) (?:off|out of) {LIST}"
+REMOVE_ITEMS_PATTERN = rf"{REMOVE_VERBS} .+|{LOOSE_REMOVE_VERBS} .+? {FROM_LIST}|{SPLIT_REMOVE_PATTERN}"
+
+
+def _alternation(phrases) -> str:
+    # Longest first, so "good morning" is tried before "good"
+    return "|".join(re.escape(phrase) for phrase in sorted(phrases, key=len, reverse=True))
+
+
+SOCIAL_PATTERN = rf"(?:(?:{_alternation(GREETING_PHRASES + THANKS_PHRASES + FILLER_WORDS)})(?: |$))+"
+
+# One pass over the normalized message decides the intent; anything else is a product query
+ROUTER_PATTERN = re.compile(
+    rf"(?P<{HELP}>{HELP_PATTERN})|(?P<{SHOW_LIST}>{SHOW_LIST_PATTERN})|(?P<{PRINT_LIST}>{PRINT_LIST_PATTERN})"
+    rf"|(?P<{CLEAR_LIST}>{CLEAR_LIST_PATTERN})|(?P<{REMOVE_ITEMS}>{REMOVE_ITEMS_PATTERN})|(?P<social>{SOCIAL_PATTERN})"
+)
+# What a remove command names, without the verb or a trailing "from my list"
+REMOVAL_TARGET = re.compile(rf"{SPLIT_REMOVE_PATTERN}|{REMOVE_VERBS} (.+?)(?: {FROM_LIST})?"
+                            rf"|{LOOSE_REMOVE_VERBS} (.+?) {FROM_LIST}")
+THANKS_WORDS = re.compile(rf"\b(?:{_alternation(THANKS_PHRASES)})\b")
+GREETING_WORDS = re.compile(rf"\b(?:{_alternation(GREETING_PHRASES)})\b")
+PUNCTUATION = re.compile(r"[^a-z0-9'!]+")
+
+
+def normalize_message(text: str) -> str:
+    """Lowercase, turn punctuation into single spaces and split off '!'"""
+    return PUNCTUATION.sub(" ", text.lower().replace("!", " ! ")).strip()
+
+
+def removal_target(text: str) -> str:
+    """The part of a remove command naming the items ("remove milk from my list" -> "milk")"""
+    normalized = normalize_message(text)
+    match = REMOVAL_TARGET.fullmatch(normalized)
+    if match is None:
+        return normalized
+    return match.group(1) or match.group(2) or match.group(3)
+
+
+class IntentRouter:
+    """Classifies messages with one compiled regex and counts how many skip NLP"""
+
+    def __init__(self):
+        self.counts = dict.fromkeys(INTENTS, 0)
+        self._lock = threading.Lock()
+
+    def classify(self, text: str) -> str:
+        normalized = normalize_message(text)
+        match = ROUTER_PATTERN.fullmatch(normalized)
+        if match is None:
+            return PRODUCT
+        intent = match.lastgroup
+        if intent != "social":
+            return intent
+        # Thanks wins over a greeting ("hi, thanks!"); padding alone ("ok") is not an intent
+        if THANKS_WORDS.search(normalized):
+            return THANKS
+        if GREETING_WORDS.search(normalized):
+            return GREETING
+        return PRODUCT
+
+    def route(self, text: str) -> str:
+        """Classify ``text`` and count it"""
+        intent = self.classify(text)
+        with self._lock:
+            self.counts[intent] += 1
+        return intent
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self.counts)
+        messages = sum(counts.values())
+        skipped = messages - counts[PRODUCT]
+        return {
+            "messages": messages,
+            "intents": counts,
+            "skipped_nlp": skipped,
+            "skip_rate": round(skipped / messages, 3) if messages else 0.0
+        }
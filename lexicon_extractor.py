@@ -0,0 +1,112 @@
+"""spaCy-free item extraction for low-memory kiosks.
+
+``extract_items`` needs nouns, as lemmas, without stop words. Without a
+tagger the nouns are told apart by elimination: stop words, numbers and a
+short list of the verbs, adjectives and adverbs customers type around
+product names are dropped; everything else is kept. Words that are a whole
+catalog item on their own ("orange", "sweets") are always kept, whatever
+else they could be. Nothing here imports spaCy:
+
+    python chatbot_gui.py --extractor lexicon
+
+``extractor_report.py`` compares the results, memory and startup time of
+this backend with the spaCy pipeline.
+"""
+import re
+from typing import FrozenSet, Iterable, List
+
+from rule_extractor import STOP_WORDS as FILLER_WORDS
+from rule_extractor import lemmatize
+
+# English stop words (close to spaCy's list, which is what the spaCy backend drops)
+STOP_WORDS = FILLER_WORDS | frozenset("""
+above across after afterwards again against almost alone along already although always among amongst
+amount another anyhow anyone anyway anywhere around back became because become becomes becoming before
+beforehand behind being below beside besides between beyond both bottom ca call cannot did doing done
+down due during each eight either eleven else elsewhere empty enough even ever every everyone everything
+everywhere except few fifteen fifty first five former formerly forty four front full further go had has
+he hence her here hereafter hereby herein hereupon hers herself him himself his how however hundred if
+indeed into itself keep last latter latterly least less made make many may meanwhile might mine moreover
+most mostly move must myself name namely neither never nevertheless next nine no nobody none noone nor
+not nothing now nowhere off often once one only onto other others otherwise our ours ourselves out over
+own part per perhaps put quite rather re really regarding same say see seem seemed seeming seems serious
+several she should show side since six sixty so somehow someone sometime sometimes somewhere still such
+take ten than their themselves thence thereafter thereby therefore therein thereupon they third though
+three through throughout thru thus together top toward towards twelve twenty two under unless until up
+upon used using various very via well whatever when whence whenever whereafter whereas whereby wherein
+whereupon wherever whether while whither who whoever whole whom whose why will within without yet yours
+yourself yourselves
+""".split())
+
+# Words customers put around product names that a tagger would not call nouns
+NON_NOUNS = frozenset("""
+add bake baking best big bought buying cheap cheaper cheapest cold cook cooking cool could delicious
+do dont else enjoy fancy fine fresh going good great have having healthy hello hey
+hi hot know large larger little looking love lovely make making much nice new okay ok old perfect
+pick please remove say see sell sold show small smaller tasty tell thank thanks think today tomorrow
+tonight try trying use want wanted wanting where yes yesterday
+sliced chopped dried smoked baked roasted salted mixed grated cooked fried boiled
+quickly really maybe just also again later soon right
+""".split())
+
+# Nouns that end like a verb form ("pudding", "stuffing") and must not lose their "ing"
+ING_NOUNS = frozenset("""
+pudding stuffing dressing seasoning icing frosting filling topping clothing bedding ring string
+king wing thing morning evening wedding building painting ceiling spring
+""".split())
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def catalog_vocabulary(products_db) -> FrozenSet[str]:
+    """Single-word catalog items, as surface forms and lemmas"""
+    words = set()
+    for data in products_db.values():
+        for item in data["items"]:
+            item = item.strip().lower()
+            if item and " " not in item:
+                words.add(item)
+                words.add(lemmatize(item))
+    return frozenset(words)
+
+
+class LexiconExtractor:
+    """The ``extract_items`` backend that needs only the catalog, a lemmatizer and a stop-word set"""
+
+    def __init__(self, products_db=None):
+        self.vocabulary: FrozenSet[str] = frozenset()
+        if products_db is not None:
+            self.set_catalog(products_db)
+
+    def set_catalog(self, products_db):
+        # Swapped in one assignment, like the catalog itself
+        self.vocabulary = catalog_vocabulary(products_db)
+
+    def is_item(self, word: str, lemma: str) -> bool:
+        if word in self.vocabulary or lemma in self.vocabulary:
+            return True
+        if word in STOP_WORDS or len(word) < 2 or word.isdigit():
+            return False
+        if word in NON_NOUNS or lemma in NON_NOUNS:
+            return False
+        if len(word) > 4 and word.endswith("ly"):
+            return False
+        if len(word) > 5 and word.endswith("ing") and word not in ING_NOUNS:
+            return False
+        return True
+
+    def extract(self, text: str) -> List[str]:
+        items = set()
+        for word in WORD_PATTERN.findall(text.lower()):
+            if "'" in word:
+                word, _, ending = word.partition("'")
+                # "don't", "can't" are verbs; "what's", "mom's" keep the word before the apostrophe
+                if ending == "t":
+                    continue
+            lemma = lemmatize(word)
+            if self.is_item(word, lemma):
+                items.add(lemma)
+        return list(items)
+
+    def extract_many(self, texts: Iterable[str]) -> List[List[str]]:
+        return [self.extract(text) for text in texts]
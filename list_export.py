@@ -0,0 +1,271 @@
+"""Shopping list export.
+
+Lists are written as text, CSV, JSON or a printable HTML page. The GUI
+takes a snapshot of the list on the Tk thread and a ListExporter thread
+streams it to disk; every file is written to a temporary name and renamed
+into place, so a crash never leaves a truncated list in shopping_lists/.
+
+Bulk mode exports every saved session (or saved JSON lists) in one run:
+
+    python list_export.py --sessions sessions.db --formats txt html
+    python list_export.py --bulk shopping_lists --formats csv
+"""
+import argparse
+import csv
+import html
+import io
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from assistant_engine import CATEGORY_ICONS
+from session_store import SessionStore
+from shopping_list import ShoppingList
+
+EXPORT_DIR = "shopping_lists"
+
+NOT_FOUND_SHELF = "Not found in store"
+
+# What the GUI's export button writes; the JSON copy is what bulk mode reads back
+EXPORT_FORMATS = ["txt", "json"]
+
+
+# "3 × Apples" for several of an item, just "Apples" for one
+def item_label(item: str, quantity: int = 1) -> str:
+    if quantity > 1:
+        return f"{quantity} × {item.capitalize()}"
+    return item.capitalize()
+
+# Plain-data copy of a list, safe to hand to another thread; this is also the JSON export format
+def list_snapshot(shopping_list: ShoppingList, order: Optional[List[str]] = None,
+                  generated: Optional[datetime] = None) -> Dict:
+    sections = []
+    for category, entries in shopping_list.grouped(order):
+        sections.append({
+            "category": category,
+            "items": [{"item": entry.item, "quantity": entry.quantity, "shelf": entry.shelf} for entry in entries]
+        })
+    not_found = []
+    for item in shopping_list.not_found:
+        entry = shopping_list.get(item)
+        not_found.append({"item": item, "quantity": entry.quantity})
+    return {
+        "generated": (generated or datetime.now()).isoformat(timespec="seconds"),
+        "total_items": len(shopping_list),
+        "total_quantity": shopping_list.total_quantity,
+        "sections": sections,
+        "not_found": not_found
+    }
+
+def _section_title(category: str) -> str:
+    return f"{CATEGORY_ICONS.get(category, '📁')} {category.replace('_', ' ').title().upper()} SECTION"
+
+def _generated(snapshot: Dict) -> str:
+    return datetime.fromisoformat(snapshot["generated"]).strftime('%Y-%m-%d at %H:%M:%S')
+
+def text_chunks(snapshot: Dict) -> Iterator[str]:
+    yield "🛒 SMART SUPERMARKET SHOPPING LIST\n"
+    yield "═" * 60 + "\n"
+    yield f"Generated: {_generated(snapshot)}\n"
+    yield f"Total Items: {snapshot['total_items']} ({snapshot['total_quantity']} to pick up)\n"
+    yield "═" * 60 + "\n\n"
+    for section in snapshot["sections"]:
+        yield f"{_section_title(section['category'])}:\n"
+        yield "-" * 40 + "\n"
+        for entry in section["items"]:
+            yield f"  ✓ {item_label(entry['item'], entry['quantity']):<25} → {entry['shelf']}\n"
+        yield "\n"
+    if snapshot["not_found"]:
+        yield "❌ ITEMS NOT AVAILABLE:\n"
+        yield "-" * 40 + "\n"
+        for entry in snapshot["not_found"]:
+            yield f"  • {item_label(entry['item'], entry['quantity'])}\n"
+        yield "\n"
+    yield "═" * 60 + "\n"
+    yield "💡 Tip: Follow the shelf order for efficient shopping!\n"
+    yield "🛍️ Happy Shopping!\n"
+
+def csv_chunks(snapshot: Dict) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def row(*values) -> str:
+        writer.writerow(values)
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return line
+
+    yield row("category", "item", "quantity", "shelf")
+    for section in snapshot["sections"]:
+        for entry in section["items"]:
+            yield row(section["category"], entry["item"], entry["quantity"], entry["shelf"])
+    for entry in snapshot["not_found"]:
+        yield row("unknown", entry["item"], entry["quantity"], NOT_FOUND_SHELF)
+
+def json_chunks(snapshot: Dict) -> Iterator[str]:
+    yield from json.JSONEncoder(indent=2, ensure_ascii=False).iterencode(snapshot)
+    yield "\n"
+
+HTML_STYLE = """body { font-family: Arial, sans-serif; color: #333; margin: 2em; }
+h1 { color: #1976D2; margin-bottom: 0; }
+h2 { border-bottom: 2px solid #1976D2; font-size: 1.1em; margin-top: 1.5em; }
+table { border-collapse: collapse; width: 100%; }
+td { border-bottom: 1px solid #ddd; padding: 4px 8px; }
+td.box { width: 1.5em; }
+.meta, .tip { color: #666; }
+@media print { body { margin: 0; } h2 { break-after: avoid; } tr { break-inside: avoid; } }"""
+
+def html_chunks(snapshot: Dict) -> Iterator[str]:
+    escape = html.escape
+    yield "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"utf-8\">\n"
+    yield "<title>Smart Supermarket Shopping List</title>\n"
+    yield f"<style>\n{HTML_STYLE}\n</style>\n</head>\n<body>\n"
+    yield "<h1>🛒 Smart Supermarket Shopping List</h1>\n"
+    yield (f"<p class=\"meta\">Generated {escape(_generated(snapshot))} · {snapshot['total_items']} items "
+           f"({snapshot['total_quantity']} to pick up)</p>\n")
+    for section in snapshot["sections"]:
+        yield f"<h2>{escape(_section_title(section['category']))}</h2>\n<table>\n"
+        for entry in section["items"]:
+            yield (f"<tr><td class=\"box\">☐</td><td>{escape(item_label(entry['item'], entry['quantity']))}</td>"
+                   f"<td>{escape(entry['shelf'])}</td></tr>\n")
+        yield "</table>\n"
+    if snapshot["not_found"]:
+        yield "<h2>❌ Items Not Available</h2>\n<ul>\n"
+        for entry in snapshot["not_found"]:
+            yield f"<li>{escape(item_label(entry['item'], entry['quantity']))}</li>\n"
+        yield "</ul>\n"
+    yield "<p class=\"tip\">💡 Tip: Follow the shelf order for efficient shopping!</p>\n</body>\n</html>\n"
+
+# Format -> (chunk writer, newline translation); CSV rows carry their own line endings
+FORMATS: Dict[str, Tuple[Callable[[Dict], Iterator[str]], Optional[str]]] = {
+    "txt": (text_chunks, None),
+    "csv": (csv_chunks, ""),
+    "json": (json_chunks, None),
+    "html": (html_chunks, None)
+}
+
+
+def write_atomic(path: str, chunks: Iterable[str], newline: Optional[str] = None):
+    """Stream ``chunks`` to a temporary file next to ``path`` and rename it into place"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(prefix=".export-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline=newline) as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+def export_snapshot(snapshot: Dict, formats: Iterable[str], directory: str = EXPORT_DIR,
+                    name: Optional[str] = None) -> List[str]:
+    """Write one list in each of ``formats``; returns the paths written"""
+    if name is None:
+        name = "SmartList_" + datetime.fromisoformat(snapshot["generated"]).strftime('%Y%m%d_%H%M%S')
+    paths = []
+    for fmt in formats:
+        writer, newline = FORMATS[fmt]
+        path = os.path.join(directory, f"{name}.{fmt}")
+        write_atomic(path, writer(snapshot), newline)
+        paths.append(path)
+    return paths
+
+# Saved JSON lists in ``directory`` as (name, snapshot) pairs, oldest name first
+def read_saved_lists(directory: str = EXPORT_DIR) -> Iterator[Tuple[str, Dict]]:
+    for filename in sorted(os.listdir(directory)):
+        name, ext = os.path.splitext(filename)
+        if ext != ".json" or filename.startswith("."):
+            continue
+        with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        if isinstance(snapshot, dict) and "sections" in snapshot:
+            yield name, snapshot
+
+# Every persisted session with items on its list, as (name, snapshot) pairs
+def read_sessions(path: str) -> Iterator[Tuple[str, Dict]]:
+    store = SessionStore(path)
+    try:
+        for saved in store.saved_sessions():
+            yield f"Session_{saved.id}", list_snapshot(saved.shopping_list, generated=datetime.fromisoformat(saved.started))
+    finally:
+        store.close()
+
+def export_all(lists: Iterable[Tuple[str, Dict]], formats: Iterable[str], directory: str = EXPORT_DIR) -> List[str]:
+    """Bulk mode: export every (name, snapshot) pair"""
+    formats = list(formats)
+    paths = []
+    for name, snapshot in lists:
+        paths.extend(export_snapshot(snapshot, formats, directory, name))
+    return paths
+
+
+class ListExporter:
+    """Writes exports on a background thread so the Tk thread never touches the disk.
+
+    ``submit`` queues a snapshot; finished jobs come back from ``poll`` as
+    (paths, error) pairs, in the order they were submitted.
+    """
+
+    def __init__(self, directory: str = EXPORT_DIR):
+        self.directory = directory
+        self.jobs = queue.Queue()
+        self.finished = queue.Queue()
+        threading.Thread(target=self._run, name="list-exporter", daemon=True).start()
+
+    def submit(self, snapshot: Dict, formats: Iterable[str]):
+        self.jobs.put((snapshot, list(formats)))
+
+    def poll(self) -> List[Tuple[List[str], Optional[str]]]:
+        done = []
+        while True:
+            try:
+                done.append(self.finished.get_nowait())
+            except queue.Empty:
+                return done
+
+    def _run(self):
+        while True:
+            snapshot, formats = self.jobs.get()
+            try:
+                self.finished.put((export_snapshot(snapshot, formats, self.directory), None))
+            except Exception as e:
+                self.finished.put(([], str(e)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export saved shopping lists")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--sessions", metavar="DB", help="export every session saved in this session database")
+    source.add_argument("--bulk", metavar="DIR", default=EXPORT_DIR,
+                        help="directory of saved .json lists to export (default: shopping_lists)")
+    parser.add_argument("--formats", nargs="+", choices=sorted(FORMATS), default=["txt", "csv", "html"],
+                        help="formats to write (default: txt csv html)")
+    parser.add_argument("-o", "--output", metavar="DIR", help="where to write the files (default: the --bulk directory, shopping_lists)")
+    args = parser.parse_args(argv)
+
+    if args.sessions:
+        if not os.path.exists(args.sessions):
+            parser.error(f"{args.sessions} file not found")
+        lists = read_sessions(args.sessions)
+    elif os.path.isdir(args.bulk):
+        lists = read_saved_lists(args.bulk)
+    else:
+        parser.error(f"{args.bulk} is not a directory")
+    paths = export_all(lists, args.formats, args.output or args.bulk)
+    print(f"Wrote {len(paths)} files", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
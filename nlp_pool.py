@@ -0,0 +1,322 @@
+"""Multi-process spaCy extraction.
+
+One Python process runs one ``nlp(...)`` call at a time, so on a
+multi-core store server the NLP stage is spread over worker processes:
+
+    pool = NLPWorkerPool(workers=4).start()     # after load_nlp()
+    items_per_text = pool.extract(texts)
+
+The model is loaded once in the parent. Workers are forked from it, before
+the parent starts any other thread, and share its memory copy-on-write (on
+platforms without fork they load the model themselves). Texts are sent in
+micro-batches, each to the worker with the fewest outstanding, through that
+worker's own queue, and each worker answers through its own pipe. A
+collector thread tracks per-worker health and restarts workers that die
+with a fresh queue and pipe, handing it every batch the dead worker had
+been given. Replacements are always spawned, never forked:
+by then the parent runs other threads, and a fork could copy a lock one of
+them holds into the child. A spawned worker loads the model itself.
+"""
+import gc
+import math
+import multiprocessing
+import multiprocessing.connection
+import os
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as ResultTimeout
+from typing import Dict, List, Optional, Tuple
+
+import assistant_engine
+
+# Most texts sent to a worker at once; smaller batches spread a request over more workers
+MICRO_BATCH = 16
+
+# How often the collector checks that every worker is still alive
+HEALTH_CHECK_SECONDS = 1.0
+
+# Longest extract() waits for its batches
+EXTRACT_TIMEOUT_SECONDS = 30.0
+
+# Task that replaces a lexicon worker's catalog vocabulary instead of extracting
+VOCABULARY = "vocabulary"
+
+
+def _extract(texts: List[str]) -> List[List[str]]:
+    if assistant_engine.nlp_loaded():
+        return assistant_engine.extract_items_batch(texts, batch_size=len(texts))
+    return [assistant_engine.extract_items(text) for text in texts]
+
+def _worker(number: int, tasks, results, extractor: str = "spacy", vocabulary=None):
+    # With fork the parent's loaded model is already here; otherwise load the parent's backend (or fall back to rules)
+    if not assistant_engine.nlp_loaded():
+        assistant_engine.select_extractor(extractor)
+        try:
+            model = assistant_engine.load_nlp()
+        except (OSError, ImportError):
+            model = None
+        if vocabulary is not None and model is not None:
+            model.vocabulary = vocabulary
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        if task[0] == VOCABULARY:
+            model = assistant_engine.nlp
+            if model is not None:
+                model.vocabulary = task[1]
+            continue
+        batch_id, texts = task
+        results.send(("start", number, batch_id, None, 0.0))
+        started = time.perf_counter()
+        try:
+            results.send(("done", number, batch_id, _extract(texts), time.perf_counter() - started))
+        except Exception as e:
+            results.send(("error", number, batch_id, f"{type(e).__name__}: {e}", time.perf_counter() - started))
+
+
+class WorkerHealth:
+    """What the collector knows about one worker process"""
+
+    __slots__ = ("pid", "batches", "texts", "busy_seconds", "errors", "restarts", "current", "last_seen")
+
+    def __init__(self):
+        self.pid: Optional[int] = None
+        self.batches = 0
+        self.texts = 0
+        self.busy_seconds = 0.0
+        self.errors = 0
+        self.restarts = 0
+        self.current: Optional[int] = None
+        self.last_seen = time.time()
+
+
+class NLPWorkerPool:
+    """Worker processes that run ``extract_items`` over micro-batches of texts"""
+
+    def __init__(self, workers: Optional[int] = None, micro_batch: int = MICRO_BATCH):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.micro_batch = max(1, micro_batch)
+        self.start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        self.context = multiprocessing.get_context(self.start_method)
+        # Workers that die are replaced from a multithreaded parent, where forking is unsafe
+        self.restart_context = multiprocessing.get_context("spawn")
+        # One task queue and one result pipe per worker: a worker killed inside get() or put()
+        # can leave a shared queue's lock held, and the parent always knows which worker holds
+        # which batch
+        self.task_queues: List = [None] * self.workers
+        self.result_pipes: List = [None] * self.workers
+        self.processes: List = [None] * self.workers
+        self.health = [WorkerHealth() for _ in range(self.workers)]
+        # batch id -> (texts, future) until a worker reports it done
+        self.pending: Dict[int, Tuple[List[str], Future]] = {}
+        # batch id -> number of the worker it was given to
+        self.assigned: Dict[int, int] = {}
+        self.next_batch = 0
+        self.submitted_texts = 0
+        self.closed = False
+        self._lock = threading.Lock()
+        self._collector = None
+
+    def start(self):
+        if self.start_method == "fork":
+            # Objects that exist now (the model included) are left out of garbage collection,
+            # so the children do not write to, and thereby copy, the pages they live on
+            gc.freeze()
+        for number in range(self.workers):
+            self._spawn(number)
+        self._collector = threading.Thread(target=self._collect, name="nlp-pool-collector", daemon=True)
+        self._collector.start()
+        return self
+
+    def _spawn(self, number: int, context=None):
+        context = context or self.context
+        # A spawned lexicon worker has no catalog of its own, so it is sent the parent's vocabulary
+        vocabulary = getattr(assistant_engine.nlp, "vocabulary", None)
+        self.task_queues[number] = context.Queue()
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=_worker, args=(number, self.task_queues[number], sender,
+                                                        assistant_engine.extractor, vocabulary),
+                                  name=f"nlp-worker-{number}", daemon=True)
+        process.start()
+        # Only the worker holds the sending end, so its pipe reports EOF once it dies
+        sender.close()
+        self.result_pipes[number] = receiver
+        self.processes[number] = process
+        self.health[number].pid = process.pid
+        self.health[number].current = None
+        self.health[number].last_seen = time.time()
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue one micro-batch; the future resolves to one item list per text"""
+        future = Future()
+        with self._lock:
+            if self.closed:
+                raise RuntimeError("the NLP worker pool is closed")
+            batch_id = self.next_batch
+            self.next_batch += 1
+            self.pending[batch_id] = (texts, future)
+            self.submitted_texts += len(texts)
+            outstanding = [0] * self.workers
+            for number in self.assigned.values():
+                outstanding[number] += 1
+            number = min(range(self.workers), key=outstanding.__getitem__)
+            self.assigned[batch_id] = number
+            tasks = self.task_queues[number]
+        tasks.put((batch_id, texts))
+        return future
+
+    def refresh_vocabulary(self):
+        """Send the parent's lexicon vocabulary to every worker after a catalog reload.
+
+        Queued before any later batch, so those are answered with the new catalog's words.
+        """
+        vocabulary = getattr(assistant_engine.nlp, "vocabulary", None)
+        if vocabulary is None:
+            return
+        with self._lock:
+            queues = [tasks for tasks in self.task_queues if tasks is not None]
+        for tasks in queues:
+            tasks.put((VOCABULARY, vocabulary))
+
+    def extract(self, texts: List[str], timeout: float = EXTRACT_TIMEOUT_SECONDS) -> List[List[str]]:
+        """Items for every text, in order, with the texts spread over the workers.
+
+        Raises RuntimeError when they are not all back within ``timeout`` seconds.
+        """
+        if not texts:
+            return []
+        size = min(self.micro_batch, math.ceil(len(texts) / self.workers))
+        futures = [self.submit(texts[start:start + size]) for start in range(0, len(texts), size)]
+        deadline = time.monotonic() + timeout
+        extracted = []
+        try:
+            for future in futures:
+                extracted.extend(future.result(max(0.0, deadline - time.monotonic())))
+        except ResultTimeout:
+            # Forgotten batches are dropped when their answers arrive instead of piling up
+            with self._lock:
+                for batch_id, (_, future) in list(self.pending.items()):
+                    if future in futures:
+                        del self.pending[batch_id]
+                        self.assigned.pop(batch_id, None)
+            raise RuntimeError(f"NLP workers did not answer within {timeout:g} s") from None
+        return extracted
+
+    def _collect(self):
+        last_check = time.monotonic()
+        while not self.closed:
+            pipes = [pipe for pipe in self.result_pipes if pipe is not None]
+            for pipe in multiprocessing.connection.wait(pipes, timeout=HEALTH_CHECK_SECONDS):
+                if not self._receive(pipe):
+                    # The worker is gone; stop watching its pipe until it is replaced
+                    self.result_pipes[self.result_pipes.index(pipe)] = None
+                    pipe.close()
+                    last_check = 0.0
+            if time.monotonic() - last_check >= HEALTH_CHECK_SECONDS:
+                last_check = time.monotonic()
+                self._check_workers()
+
+    def _receive(self, pipe) -> bool:
+        try:
+            message = pipe.recv()
+        except (EOFError, OSError):
+            return False
+        self._handle(message)
+        return True
+
+    def _handle(self, message):
+        kind, number, batch_id, payload, seconds = message
+        health = self.health[number]
+        health.last_seen = time.time()
+        if kind == "start":
+            health.current = batch_id
+            return
+        health.current = None
+        health.busy_seconds += seconds
+        with self._lock:
+            texts, future = self.pending.pop(batch_id, (None, None))
+            self.assigned.pop(batch_id, None)
+        if future is None:
+            return
+        if kind == "done":
+            health.batches += 1
+            health.texts += len(texts)
+            future.set_result(payload)
+        else:
+            health.errors += 1
+            future.set_exception(RuntimeError(f"NLP worker {number} failed: {payload}"))
+
+    def _check_workers(self):
+        for number, process in enumerate(self.processes):
+            if process is None or process.is_alive() or self.closed:
+                continue
+            # Read everything the worker sent before it died, then give its replacement
+            # every batch it still held, started or not
+            pipe = self.result_pipes[number]
+            if pipe is not None:
+                while pipe.poll() and self._receive(pipe):
+                    pass
+                pipe.close()
+            self.health[number].restarts += 1
+            with self._lock:
+                self._spawn(number, self.restart_context)
+                lost = [(batch_id, self.pending[batch_id][0]) for batch_id, worker in self.assigned.items()
+                        if worker == number and batch_id in self.pending]
+            for batch in lost:
+                self.task_queues[number].put(batch)
+
+    def close(self, timeout: float = 5.0):
+        with self._lock:
+            self.closed = True
+        for tasks in self.task_queues:
+            if tasks is not None:
+                tasks.put(None)
+        for process in self.processes:
+            if process is not None:
+                process.join(timeout)
+                if process.is_alive():
+                    process.terminate()
+        if self._collector is not None:
+            self._collector.join(HEALTH_CHECK_SECONDS * 2)
+        for pipe in self.result_pipes:
+            if pipe is not None:
+                pipe.close()
+        with self._lock:
+            pending, self.pending = self.pending, {}
+            self.assigned = {}
+        for _, future in pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError("the NLP worker pool was closed"))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            waiting = len(self.pending)
+            submitted = self.submitted_texts
+        busy = sum(1 for health in self.health if health.current is not None)
+        return {
+            "workers": self.workers,
+            "start_method": self.start_method,
+            "restart_method": self.restart_context.get_start_method(),
+            "micro_batch": self.micro_batch,
+            # Micro-batches sent but not yet picked up by a worker
+            "queue_depth": max(0, waiting - busy),
+            "in_flight": busy,
+            "submitted_texts": submitted,
+            "per_worker": [
+                {
+                    "worker": number,
+                    "pid": health.pid,
+                    "alive": process is not None and process.is_alive(),
+                    "busy": health.current is not None,
+                    "batches": health.batches,
+                    "texts": health.texts,
+                    "busy_seconds": round(health.busy_seconds, 3),
+                    "errors": health.errors,
+                    "restarts": health.restarts,
+                    "seconds_since_seen": round(time.time() - health.last_seen, 1)
+                }
+                for number, (health, process) in enumerate(zip(self.health, self.processes))
+            ]
+        }
@@ -0,0 +1,91 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Catalog phrases and customer messages are split into words the same way
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class PhraseAutomaton:
+    """Aho-Corasick automaton over words.
+
+    Built once from ``(phrase, value)`` pairs; ``find`` then walks a message
+    word by word, so one pass over the message finds every phrase in it no
+    matter how many phrases the automaton holds. When phrases overlap
+    ("ice cream" and "cream") the longest wins.
+    """
+
+    def __init__(self, phrases: Iterable[Tuple[str, int]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        # Phrase ending at a state as (length in words, value); the first value added wins
+        self.accept: List[Optional[Tuple[int, int]]] = [None]
+        # Nearest state along the fail chain that accepts a phrase (a shorter suffix match)
+        self.next_accept: List[int] = [0]
+
+        for phrase, value in phrases:
+            words = tokenize(phrase)
+            if not words:
+                continue
+            state = 0
+            for word in words:
+                following = self.goto[state].get(word)
+                if following is None:
+                    following = len(self.goto)
+                    self.goto[state][word] = following
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.accept.append(None)
+                    self.next_accept.append(0)
+                state = following
+            if self.accept[state] is None:
+                self.accept[state] = (len(words), value)
+
+        self._link()
+
+    def _link(self):
+        # Breadth-first, so every fail target is finished before it is used
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, following in self.goto[state].items():
+                queue.append(following)
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                fail = self.fail[following] = self.goto[fallback].get(word, 0)
+                self.next_accept[following] = fail if self.accept[fail] is not None else self.next_accept[fail]
+
+    def __len__(self):
+        return sum(1 for accept in self.accept if accept is not None)
+
+    def matches(self, words: List[str]) -> List[Tuple[int, int, int]]:
+        """Every phrase occurrence in ``words`` as ``(start, end, value)``"""
+        found = []
+        goto, fail, accept, next_accept = self.goto, self.fail, self.accept, self.next_accept
+        state = 0
+        for end, word in enumerate(words, 1):
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+            hit = state if accept[state] is not None else next_accept[state]
+            while hit:
+                length, value = accept[hit]
+                found.append((end - length, end, value))
+                hit = next_accept[hit]
+        return found
+
+    def find(self, words: List[str]) -> List[Tuple[int, int, int]]:
+        """Non-overlapping phrases in ``words``, longest first, returned in message order"""
+        taken = [False] * len(words)
+        chosen = []
+        for start, end, value in sorted(self.matches(words), key=lambda match: (match[0] - match[1], match[0])):
+            if not any(taken[start:end]):
+                taken[start:end] = [True] * (end - start)
+                chosen.append((start, end, value))
+        chosen.sort()
+        return chosen
@@ -0,0 +1,84 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Default number of distinct utterances remembered
+MAX_CACHED_QUERIES = 1024
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """Collapse case, whitespace and trailing punctuation so repeats share an entry"""
+    return _WHITESPACE.sub(" ", text.lower()).strip().rstrip("?!. ")
+
+
+class QueryCache:
+    """LRU cache of normalized utterance -> (extracted items, shelf results).
+
+    Entries are tied to the catalog they were resolved against; handing in a
+    different catalog index empties the cache, so a catalog change can never
+    serve stale shelves.
+    """
+
+    def __init__(self, max_entries: int = MAX_CACHED_QUERIES):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[List[str], Dict[str, Dict]]]" = OrderedDict()
+        self.catalog = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def _check_catalog(self, catalog):
+        if catalog is not self.catalog:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.catalog = catalog
+
+    def get(self, text: str, catalog) -> Optional[Tuple[List[str], Dict[str, Dict]]]:
+        key = normalize_query(text)
+        with self._lock:
+            self._check_catalog(catalog)
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        items, results = entry
+        # Callers keep the results in their shopping list, so hand out copies
+        return list(items), {item: dict(info) for item, info in results.items()}
+
+    def put(self, text: str, catalog, items: List[str], results: Dict[str, Dict]):
+        if self.max_entries <= 0:
+            return
+        key = normalize_query(text)
+        entry = (list(items), {item: dict(info) for item, info in results.items()})
+        with self._lock:
+            self._check_catalog(catalog)
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
@@ -0,0 +1,344 @@
+"""Replay load test for the assistant engine.
+
+Replays recorded or synthetic conversations through AssistantEngine.build_reply
+(the path the GUI's query worker takes for process_input: intent routing,
+extract_items, find_shelves and result formatting) without opening a window,
+and reports latency percentiles, throughput and memory over time:
+
+    python replay_load_test.py --duration 60 --concurrency 8 --rate 200
+    python replay_load_test.py --log sessions.db --messages 50000 -o replay.json
+    python replay_load_test.py --log conversations.jsonl --rate 0
+
+Logs can be a session database (sessions.db), JSON lines with "session" and
+"text" fields, or plain text with one message per line and a blank line
+between conversations. Messages of one conversation are always answered in
+order by the same worker. With --rate the load is open-loop and latency
+includes time spent waiting for a worker; --rate 0 sends as fast as the
+workers answer.
+"""
+import argparse
+import gc
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from assistant_engine import EXTRACTORS, AssistantEngine, load_nlp, read_products, select_extractor
+from nlp_pool import NLPWorkerPool
+from query_cache import MAX_CACHED_QUERIES
+from service_load_test import percentile, sample_queries
+from session_store import read_conversations
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MESSAGES = 20000
+REPORT_INTERVAL_SECONDS = 5.0
+
+# Windows at the start that are left out of the memory trend (caches and indexes are still filling up)
+WARMUP_WINDOWS = 1
+
+Conversation = Tuple[str, List[str]]
+
+
+def current_rss_kb() -> Optional[int]:
+    """Resident memory now (Linux), or the peak where only that is available"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage // 1024 if sys.platform == "darwin" else usage
+
+
+def synthetic_conversations(products_db: Dict, count: int = 500, seed: int = 13) -> List[Conversation]:
+    """Customer visits: a greeting, a few product questions, list commands and a goodbye"""
+    rng = random.Random(seed)
+    questions = sample_queries(products_db, count * 4, seed)
+    terms = [item for data in products_db.values() for item in data["items"]] or ["milk"]
+    conversations = []
+    for number in range(count):
+        texts = []
+        if rng.random() < 0.6:
+            texts.append(rng.choice(["hi", "hello", "good morning", "hey there"]))
+        texts.extend(rng.choice(questions) for _ in range(rng.randint(1, 5)))
+        if rng.random() < 0.2:
+            texts.append(f"I need {rng.randint(2, 6)} {rng.choice(terms)}")
+        if rng.random() < 0.15:
+            texts.append(f"remove {rng.choice(terms)}")
+        if rng.random() < 0.3:
+            texts.append(rng.choice(["show my list", "what's on my list", "print my list"]))
+        if rng.random() < 0.5:
+            texts.append(rng.choice(["thanks!", "thank you", "bye"]))
+        conversations.append((f"synthetic-{number}", texts))
+    return conversations
+
+
+def read_log(path: str) -> List[Conversation]:
+    """Conversations from a session database, a JSON lines log or a plain text log"""
+    if path.endswith(".db"):
+        return [(f"session-{session_id}", texts) for session_id, texts in read_conversations(path) if texts]
+    conversations: Dict[str, List[str]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    conversations.setdefault(str(record.get("session", "default")), []).append(record["text"])
+        else:
+            number = 0
+            for line in f:
+                if line.strip():
+                    conversations.setdefault(f"conversation-{number}", []).append(line.strip())
+                elif f"conversation-{number}" in conversations:
+                    number += 1
+    return [(session, texts) for session, texts in conversations.items() if texts]
+
+
+def message_stream(conversations: List[Conversation], total: int) -> Iterator[Tuple[str, str]]:
+    """(session, text) pairs with the conversations interleaved, repeated until ``total`` messages"""
+    sent = 0
+    lap = 0
+    while sent < total:
+        positions = [0] * len(conversations)
+        active = list(range(len(conversations)))
+        while active and sent < total:
+            still_active = []
+            for number in active:
+                session, texts = conversations[number]
+                yield f"{session}#{lap}", texts[positions[number]]
+                sent += 1
+                positions[number] += 1
+                if positions[number] < len(texts):
+                    still_active.append(number)
+                if sent >= total:
+                    return
+            active = still_active
+        lap += 1
+
+
+class ReplayRun:
+    """Worker threads answering replayed messages, plus a sampler that records a window every interval"""
+
+    def __init__(self, engine: AssistantEngine, concurrency: int = DEFAULT_CONCURRENCY, rate: float = 0.0,
+                 interval: float = REPORT_INTERVAL_SECONDS, trace_memory: bool = False):
+        self.engine = engine
+        self.concurrency = max(1, concurrency)
+        self.rate = rate
+        self.interval = interval
+        self.trace_memory = trace_memory
+        # Closed-loop runs hand a worker its next message only once it has taken the previous one
+        self.queues = [queue.Queue(maxsize=0 if rate > 0 else 1) for _ in range(self.concurrency)]
+        self.latencies: List[float] = []
+        self.window_latencies: List[float] = []
+        self.completed = 0
+        self.errors = 0
+        self.windows: List[Dict] = []
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def worker(self, number: int):
+        engine = self.engine
+        inbox = self.queues[number]
+        while True:
+            task = inbox.get()
+            if task is None:
+                return
+            text, scheduled = task
+            started = scheduled if scheduled is not None else time.perf_counter()
+            try:
+                engine.build_reply(text)
+                failed = False
+            except Exception:
+                failed = True
+            latency = time.perf_counter() - started
+            with self._lock:
+                if failed:
+                    self.errors += 1
+                else:
+                    self.latencies.append(latency)
+                    self.window_latencies.append(latency)
+                self.completed += 1
+
+    def sample(self, started: float, previous_completed: int) -> int:
+        with self._lock:
+            window, self.window_latencies = self.window_latencies, []
+            completed = self.completed
+        elapsed = time.perf_counter() - started
+        previous = self.windows[-1]["elapsed_seconds"] if self.windows else 0.0
+        record = {
+            "elapsed_seconds": round(elapsed, 2),
+            "completed": completed,
+            "throughput_per_second": round((completed - previous_completed) / max(elapsed - previous, 1e-9), 1),
+            "latency_ms": latency_summary(window),
+            "rss_kb": current_rss_kb(),
+            "gc_objects": len(gc.get_objects())
+        }
+        if self.trace_memory:
+            record["traced_kb"] = tracemalloc.get_traced_memory()[0] // 1024
+        self.windows.append(record)
+        print(f"  {record['elapsed_seconds']:>7.1f}s {completed:>8} msgs  {record['throughput_per_second']:>8.1f}/s  "
+              f"p95 {record['latency_ms']['p95']:>7.2f} ms  rss {record['rss_kb']} KB", file=sys.stderr)
+        return completed
+
+    def sampler(self, started: float):
+        completed = 0
+        while not self._done.wait(self.interval):
+            completed = self.sample(started, completed)
+
+    def run(self, stream: Iterator[Tuple[str, str]], duration: Optional[float] = None) -> Dict:
+        if self.trace_memory:
+            tracemalloc.start()
+        workers = [threading.Thread(target=self.worker, args=(number,), daemon=True)
+                   for number in range(self.concurrency)]
+        for thread in workers:
+            thread.start()
+        started = time.perf_counter()
+        sampler = threading.Thread(target=self.sampler, args=(started,), daemon=True)
+        sampler.start()
+
+        sent = 0
+        for session, text in stream:
+            scheduled = None
+            if self.rate > 0:
+                scheduled = started + sent / self.rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            if duration is not None and time.perf_counter() - started >= duration:
+                break
+            # Session affinity keeps each conversation's messages in order
+            self.queues[hash(session) % self.concurrency].put((text, scheduled))
+            sent += 1
+        for inbox in self.queues:
+            inbox.put(None)
+        for thread in workers:
+            thread.join()
+        self._done.set()
+        sampler.join()
+        elapsed = time.perf_counter() - started
+        # The tail since the last window, unless it is too short to say anything
+        if not self.windows or elapsed - self.windows[-1]["elapsed_seconds"] > self.interval / 10:
+            self.sample(started, self.windows[-1]["completed"] if self.windows else 0)
+        if self.trace_memory:
+            tracemalloc.stop()
+        return self.report(sent, elapsed)
+
+    def report(self, sent: int, elapsed: float) -> Dict:
+        return {
+            "messages": sent,
+            "completed": self.completed,
+            "errors": self.errors,
+            "concurrency": self.concurrency,
+            "rate": self.rate or None,
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_per_second": round(self.completed / elapsed, 1) if elapsed else 0.0,
+            "latency_ms": latency_summary(self.latencies),
+            "memory": memory_trend(self.windows),
+            "cache": self.engine.query_cache.stats(),
+            "stages": self.engine.metrics.summary(),
+            "windows": self.windows
+        }
+
+
+def latency_summary(latencies: List[float]) -> Dict:
+    summary = {name: round(percentile(latencies, fraction) * 1000, 2)
+               for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))}
+    summary["max"] = round(max(latencies) * 1000, 2) if latencies else 0.0
+    return summary
+
+
+def memory_trend(windows: List[Dict]) -> Dict:
+    """RSS growth after warm-up, and its slope per 1000 messages (least squares) to spot leaks"""
+    points = [(window["completed"], window["rss_kb"]) for window in windows[WARMUP_WINDOWS:]
+              if window["rss_kb"] is not None]
+    if len(points) < 2:
+        return {"rss_start_kb": points[0][1] if points else None, "rss_growth_kb": None,
+                "kb_per_1000_messages": None}
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / spread if spread else 0.0
+    return {
+        "rss_start_kb": points[0][1],
+        "rss_end_kb": points[-1][1],
+        "rss_growth_kb": points[-1][1] - points[0][1],
+        "kb_per_1000_messages": round(slope * 1000, 2)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay conversations through the assistant engine")
+    parser.add_argument("--log", help="sessions.db, a .jsonl log or a text log (default: synthetic conversations)")
+    parser.add_argument("--products", default="products.json", help="product database (default: products.json)")
+    parser.add_argument("--conversations", type=int, default=500, help="synthetic conversations to generate")
+    parser.add_argument("--messages", type=int, default=DEFAULT_MESSAGES,
+                        help="messages to send; the log is repeated as needed")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds instead")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="worker threads")
+    parser.add_argument("--rate", type=float, default=0.0, help="messages per second (default: 0, as fast as possible)")
+    parser.add_argument("--interval", type=float, default=REPORT_INTERVAL_SECONDS, help="seconds per report window")
+    parser.add_argument("--cache-size", type=int, default=MAX_CACHED_QUERIES, help="query cache entries (0 disables it)")
+    parser.add_argument("--nlp-workers", type=int, default=0, help="run spaCy in this many worker processes")
+    parser.add_argument("--rules-only", action="store_true", help="do not load the spaCy model")
+    parser.add_argument("--extractor", choices=EXTRACTORS, default="spacy",
+                        help="item extraction backend to replay with (lexicon: no spaCy)")
+    parser.add_argument("--trace-memory", action="store_true", help="also report tracemalloc's Python heap size")
+    parser.add_argument("-o", "--output", help="write the JSON report here as well")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.products):
+        parser.error(f"{args.products} file not found")
+    products_db = read_products(args.products)
+    if args.log:
+        if not os.path.exists(args.log):
+            parser.error(f"{args.log} file not found")
+        conversations = read_log(args.log)
+        if not conversations:
+            parser.error(f"{args.log} has no messages")
+    else:
+        conversations = synthetic_conversations(products_db, args.conversations)
+
+    extractor = "rules"
+    if not args.rules_only:
+        select_extractor(args.extractor)
+        try:
+            load_nlp()
+            extractor = args.extractor
+        except (OSError, ImportError):
+            print("spaCy model unavailable, replaying with the rule-based extractor", file=sys.stderr)
+
+    engine = AssistantEngine(products_db, cache_size=args.cache_size)
+    if args.nlp_workers > 0 and extractor != "rules":
+        engine.nlp_pool = NLPWorkerPool(args.nlp_workers).start()
+    total = args.messages if args.duration is None else sys.maxsize
+    try:
+        report = ReplayRun(engine, args.concurrency, args.rate, args.interval, args.trace_memory).run(
+            message_stream(conversations, total), args.duration)
+    finally:
+        if engine.nlp_pool is not None:
+            engine.nlp_pool.close()
+    report["extractor"] = extractor
+    report["conversations"] = len(conversations)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
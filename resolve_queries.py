@@ -0,0 +1,87 @@
+"""Headless query resolver.
+
+Reads one customer query per line from a file (or stdin) and writes the
+extracted items and their shelf locations as JSON lines, without opening
+the Tk window. Queries go through AssistantEngine.resolve_many, so the
+output is what the kiosk would answer:
+
+    python resolve_queries.py queries.txt -o resolved.jsonl
+    cat queries.txt | python resolve_queries.py --batch-size 1000 --workers 4
+"""
+import argparse
+import json
+import os
+import sys
+
+from itertools import islice
+
+from assistant_engine import EXTRACTORS, MODEL_MISSING_MESSAGE, AssistantEngine, load_nlp, read_products, select_extractor
+from nlp_pool import NLPWorkerPool
+
+
+def read_queries(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield line
+
+
+def resolve(queries, engine, out, batch_size=256):
+    queries = iter(queries)
+    count = 0
+    while True:
+        batch = list(islice(queries, batch_size))
+        if not batch:
+            return count
+        for query, (items, results) in zip(batch, engine.resolve_many(batch)):
+            record = {
+                "query": query,
+                "items": sorted(items),
+                "shelves": {item: results[item] for item in sorted(results)}
+            }
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        count += len(batch)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resolve supermarket queries to shelves as JSON lines")
+    parser.add_argument("queries", nargs="?", help="file with one query per line (default: stdin)")
+    parser.add_argument("-o", "--output", help="output .jsonl file (default: stdout)")
+    parser.add_argument("--products", default="products.json", help="product database (default: products.json)")
+    parser.add_argument("--batch-size", type=int, default=256, help="utterances per nlp.pipe batch")
+    parser.add_argument("--workers", type=int, default=1, help="NLP worker processes (1: extract in this process)")
+    parser.add_argument("--extractor", choices=EXTRACTORS, default="spacy",
+                        help="item extraction backend (lexicon: no spaCy, for low-memory machines)")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.products):
+        parser.error(f"{args.products} file not found")
+    select_extractor(args.extractor)
+    engine = AssistantEngine(read_products(args.products))
+    try:
+        load_nlp()
+    except (OSError, ImportError):
+        print(MODEL_MISSING_MESSAGE, file=sys.stderr)
+        print("Resolving with the rule-based extractor only.", file=sys.stderr)
+    else:
+        if args.workers > 1:
+            engine.nlp_pool = NLPWorkerPool(args.workers).start()
+
+    source = open(args.queries, 'r', encoding='utf-8') if args.queries else sys.stdin
+    target = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    try:
+        count = resolve(read_queries(source), engine, target, args.batch_size)
+    finally:
+        if engine.nlp_pool is not None:
+            engine.nlp_pool.close()
+        if args.queries:
+            source.close()
+        if args.output:
+            target.close()
+
+    print(f"Resolved {count} queries", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
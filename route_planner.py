@@ -0,0 +1,105 @@
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Shoppers start at the entrance and finish at the checkouts next to it
+ENTRANCE = (0.0, 0.0)
+
+# 2-opt only tries reconnecting each stop to its nearest few stops
+NEIGHBOURS = 8
+
+# Route improvement stops after this long; the nearest-neighbour route is already usable
+TIME_BUDGET_SECONDS = 0.008
+
+
+def walking_distance(first: Sequence[float], second: Sequence[float]) -> float:
+    """Distance along the aisles, which run at right angles"""
+    return abs(first[0] - second[0]) + abs(first[1] - second[1])
+
+
+class RoutePlanner:
+    """Orders store sections into a short walk from the entrance and back.
+
+    Sections are placed by the optional ``"position": [x, y]`` of each
+    category in products.json (metres on the floor plan). Distances between
+    every pair of sections are computed once per catalog; sections without a
+    position go at the end in the order given.
+    """
+
+    def __init__(self, products_db: Dict):
+        self.names: List[Optional[str]] = [None]
+        self.numbers: Dict[str, int] = {}
+        points: List[Tuple[float, float]] = [ENTRANCE]
+        for category, data in products_db.items():
+            position = data.get("position")
+            if position is not None:
+                self.numbers[category] = len(points)
+                self.names.append(category)
+                points.append((float(position[0]), float(position[1])))
+        self.distances = [[walking_distance(first, second) for second in points] for first in points]
+        # Every section's others, closest first, for the 2-opt neighbour lists
+        self.nearest = [sorted(range(len(points)), key=row.__getitem__)[1:] for row in self.distances]
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def route_length(self, categories: List[str]) -> float:
+        stops = [0] + [self.numbers[category] for category in categories if category in self.numbers] + [0]
+        return sum(self.distances[first][second] for first, second in zip(stops, stops[1:]))
+
+    def order(self, categories: Iterable[str], time_budget: float = TIME_BUDGET_SECONDS) -> List[str]:
+        """``categories`` in walking order (nearest neighbour, then 2-opt)"""
+        deadline = time.perf_counter() + time_budget
+        categories = list(dict.fromkeys(categories))
+        stops = [self.numbers[category] for category in categories if category in self.numbers]
+        unplaced = [category for category in categories if category not in self.numbers]
+        if len(stops) > 2:
+            tour = self._nearest_neighbour(stops)
+            self._two_opt(tour, deadline)
+            stops = tour[1:]
+        elif stops:
+            stops = self._nearest_neighbour(stops)[1:]
+        return [self.names[stop] for stop in stops] + unplaced
+
+    def _nearest_neighbour(self, stops: List[int]) -> List[int]:
+        tour = [0]
+        remaining = set(stops)
+        while remaining:
+            row = self.distances[tour[-1]]
+            following = min(remaining, key=row.__getitem__)
+            remaining.remove(following)
+            tour.append(following)
+        return tour
+
+    def _two_opt(self, tour: List[int], deadline: float):
+        # The tour is closed (it returns to the entrance at tour[0]) and tour[0] never moves
+        distances = self.distances
+        selected = set(tour)
+        neighbours = {}
+        for stop in tour:
+            found = []
+            for other in self.nearest[stop]:
+                if other in selected:
+                    found.append(other)
+                    if len(found) == NEIGHBOURS:
+                        break
+            neighbours[stop] = found
+
+        count = len(tour)
+        position = {stop: number for number, stop in enumerate(tour)}
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for first in range(count - 1):
+                a, b = tour[first], tour[first + 1]
+                for c in neighbours[a]:
+                    second = position[c]
+                    if second <= first + 1:
+                        continue
+                    d = tour[(second + 1) % count]
+                    # Replace edges a-b and c-d with a-c and b-d by reversing b..c
+                    if distances[a][c] + distances[b][d] < distances[a][b] + distances[c][d] - 1e-9:
+                        tour[first + 1:second + 1] = tour[second:first:-1]
+                        for number in range(first + 1, second + 1):
+                            position[tour[number]] = number
+                        improved = True
+                        a, b = tour[first], tour[first + 1]
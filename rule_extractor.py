@@ -0,0 +1,54 @@
+import re
+from typing import List
+
+# Small English stop-word list covering the filler words customers type around product names
+STOP_WORDS = frozenset("""
+a about all also am an and any anything are as at be been but buy by can could do does
+find for from get give got have help i i'd i'll i'm im in is it its just like looking
+me more much my need needs of on or please some something that the them then there these
+this those to too us want wanna was we were what where which with would you your
+""".split())
+
+WORD_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+# Plurals the suffix rules get wrong
+IRREGULAR_LEMMAS = {
+    "loaves": "loaf", "leaves": "leaf", "knives": "knife", "halves": "half", "shelves": "shelf",
+    "wives": "wife", "lives": "life", "calves": "calf", "scarves": "scarf", "mice": "mouse",
+    "teeth": "tooth", "feet": "foot", "geese": "goose", "children": "child", "men": "man",
+    "women": "woman", "people": "person", "dice": "die"
+}
+
+# "...ies" words whose singular ends in "ie", not "y" ("cookies" -> "cookie")
+IE_SINGULARS = frozenset("""
+brownie calorie cookie goalie hoodie movie pie rookie selfie smoothie tie veggie zombie
+""".split())
+
+# "...oes" words whose singular keeps the "e" ("shoes" -> "shoe")
+OE_SINGULARS = frozenset("shoe toe hoe canoe".split())
+
+
+# The one lemmatizer for plurals: the extractors, catalog_index.fold_plural and everything keyed by it use this
+def lemmatize(word: str) -> str:
+    """Singular form of a lowercase word (regular English plurals plus the common irregular ones)"""
+    if word in IRREGULAR_LEMMAS:
+        return IRREGULAR_LEMMAS[word]
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-1] if word[:-1] in IE_SINGULARS else word[:-3] + "y"
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-1] if word[:-1] in OE_SINGULARS else word[:-2]
+    if len(word) > 4 and word.endswith(("ches", "shes", "sses", "xes", "zzes")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+# Fast spaCy-free extraction used while the NLP model is still loading
+def rule_extract_items(text: str) -> List[str]:
+    items = []
+    for word in WORD_PATTERN.findall(text.lower()):
+        if word in STOP_WORDS or len(word) < 2:
+            continue
+        items.append(lemmatize(word))
+    return list(set(items))
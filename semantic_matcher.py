@@ -0,0 +1,144 @@
+"""Embedding-based fallback for items no other catalog lookup could place.
+
+Every catalog term is embedded once per catalog into a unit-length NumPy
+matrix (hashed word and character n-gram features, so no model download is
+needed). The unresolved items of one query are embedded together and
+scored against the whole matrix in a single matrix product. The best
+categories are then picked from the per-category maximum scores.
+
+Matching is lexical, not semantic: the n-gram features only find spelling
+neighbours ("yoghurt", "yogurt") and know nothing about meaning. Everyday
+names for catalog items ("pop" for soda) come only from a plain synonym
+table that each catalog supplies: an optional ``"synonyms"`` object in a
+category of products.json, mapping a customer's word to one of that
+category's items. A catalog without one gets spelling similarity only.
+Multi-word synonyms ("soft drink") are matched earlier, as phrases in the
+message (CatalogIndex.find_phrases), so the extractor never splits them.
+"""
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # the fallback is off without NumPy
+    np = None
+
+from catalog_index import fold_plural
+from phrase_matcher import tokenize
+
+# Width of the hashed feature space (100k terms take 100000 * 128 * 4 bytes = 51 MB)
+DIMENSIONS = 128
+
+# Cosine similarity a match needs before it is offered to the customer
+SCORE_THRESHOLD = 0.6
+
+# Categories reported per item, best first
+TOP_CATEGORIES = 3
+
+# Character n-gram sizes, taken from the word with boundary markers ("<soda>")
+NGRAM_SIZES = (3, 4)
+
+# Whole words count for more than any single n-gram
+WORD_WEIGHT = 2.0
+
+def _fold_words(text: str) -> List[str]:
+    return [fold_plural(word) for word in tokenize(text)]
+
+def related_words(synonyms: Dict[str, str], terms: Sequence[str]) -> Dict[str, List[str]]:
+    """Folded synonym -> folded item words, keeping only entries whose item is still in the catalog"""
+    stocked = {" ".join(_fold_words(term)) for term in terms}
+    related = {}
+    for phrase, item in synonyms.items():
+        words = _fold_words(item)
+        # Keyed by singular words, as items arrive lemmatized ("crisps" -> "crisp")
+        if " ".join(words) in stocked:
+            related[" ".join(_fold_words(phrase))] = words
+    return related
+
+
+def _features(text: str, related_table: Dict[str, List[str]]) -> Dict[int, float]:
+    """Signed hashed features of a term or query item"""
+    words = _fold_words(text)
+    related = related_table.get(" ".join(words))
+    if related is None:
+        related = next((related_table[word] for word in words if word in related_table), None)
+    if related is not None:
+        # The related catalog word is what the customer means, so it carries the most weight
+        words = words + related * 2
+    features: Dict[int, float] = {}
+    for word in words:
+        keys = [f"w:{word}"] + [f"g:{gram}" for gram in _ngrams(word)]
+        weights = [WORD_WEIGHT] + [1.0] * (len(keys) - 1)
+        for key, weight in zip(keys, weights):
+            hashed = zlib.crc32(key.encode("utf-8"))
+            index = hashed % DIMENSIONS
+            # The sign bit keeps colliding features from always adding up
+            sign = 1.0 if hashed & 0x80000000 else -1.0
+            features[index] = features.get(index, 0.0) + sign * weight
+    return features
+
+def _ngrams(word: str) -> List[str]:
+    marked = f"<{word}>"
+    return [marked[start:start + size] for size in NGRAM_SIZES for start in range(len(marked) - size + 1)]
+
+def embed(texts: Sequence[str], related: Optional[Dict[str, List[str]]] = None) -> "np.ndarray":
+    """Unit-length embeddings, one float32 row per text (all zeros if a text has no words)"""
+    matrix = np.zeros((len(texts), DIMENSIONS), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for index, value in _features(text, related or {}).items():
+            matrix[row, index] = value
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+class SemanticIndex:
+    """Term embeddings grouped by category, for one catalog version.
+
+    Rows are stored category by category, so one ``maximum.reduceat`` turns
+    term scores into per-category scores.
+    """
+
+    def __init__(self, terms: Sequence[str], categories: Sequence[str], synonyms: Optional[Dict[str, str]] = None):
+        self.related = related_words(synonyms or {}, terms)
+        order = sorted(range(len(terms)), key=lambda position: (categories[position], position))
+        self.positions = np.array(order, dtype=np.int64)
+        self.categories: List[str] = []
+        starts = []
+        for row, position in enumerate(order):
+            if not self.categories or categories[position] != self.categories[-1]:
+                self.categories.append(categories[position])
+                starts.append(row)
+        self.starts = np.array(starts, dtype=np.int64)
+        self.ends = np.append(self.starts[1:], len(order))
+        # Embedding each distinct term once; large catalogs repeat a lot of names
+        unique: Dict[str, int] = {}
+        rows = [unique.setdefault(terms[position], len(unique)) for position in order]
+        self.matrix = embed(list(unique), self.related)[np.array(rows, dtype=np.int64)] if order else np.zeros((0, DIMENSIONS), np.float32)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def match(self, items: Sequence[str], top: int = TOP_CATEGORIES,
+              threshold: float = SCORE_THRESHOLD) -> List[Optional[Tuple[int, float, List[Tuple[str, float]]]]]:
+        """For each item: (catalog position, score, [(category, score)] best first), or None below ``threshold``"""
+        if not items or not len(self.positions):
+            return [None] * len(items)
+        queries = embed(items, self.related)
+        # One product for the whole query: (terms x dimensions) @ (dimensions x items)
+        scores = self.matrix @ queries.T
+        per_category = np.maximum.reduceat(scores, self.starts, axis=0)
+        matches = []
+        for column in range(len(items)):
+            ranked = np.argsort(-per_category[:, column])[:top]
+            best = int(ranked[0])
+            best_score = float(per_category[best, column])
+            if best_score < threshold:
+                matches.append(None)
+                continue
+            start, end = int(self.starts[best]), int(self.ends[best])
+            row = start + int(np.argmax(scores[start:end, column]))
+            categories = [(self.categories[number], round(float(per_category[number, column]), 3))
+                          for number in ranked]
+            matches.append((int(self.positions[row]), round(best_score, 3), categories))
+        return matches
@@ -0,0 +1,181 @@
+"""Load test for assistant_service.py.
+
+Opens many concurrent keep-alive sessions against a running service and
+reports latency percentiles, throughput and how often the service pushed
+back with 503:
+
+    python service_load_test.py --url http://127.0.0.1:8765 --sessions 50 --messages 40
+    python service_load_test.py --spawn --sessions 100
+
+--spawn starts a local service on a free port for the run and stops it after.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.parse
+from typing import Dict, List
+
+from assistant_engine import read_products
+from assistant_service import DEFAULT_PORT
+
+SERVICE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assistant_service.py")
+
+
+def sample_queries(products_db: Dict, count: int = 200, seed: int = 7) -> List[str]:
+    """Kiosk-like traffic: mostly product questions, some greetings and thanks"""
+    rng = random.Random(seed)
+    terms = [item for data in products_db.values() for item in data["items"]] or ["milk"]
+    templates = ["I need {a} and {b}", "where is the {a}?", "{a}", "do you have {a}, {b} and {c}",
+                 "looking for {a}", "where can I find {a} for breakfast"]
+    queries = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.05:
+            queries.append(rng.choice(["hello", "good morning", "hey there"]))
+        elif roll < 0.10:
+            queries.append(rng.choice(["thanks!", "thank you", "bye"]))
+        else:
+            a, b, c = (rng.choice(terms) for _ in range(3))
+            queries.append(rng.choice(templates).format(a=a, b=b, c=c))
+    return queries
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+async def http_request(reader, writer, host: str, method: str, path: str, payload=None):
+    body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    data = await reader.readexactly(length) if length else b""
+    return status, json.loads(data or b"{}")
+
+
+async def run_session(host: str, port: int, session_id: str, queries: List[str], latencies: List[float],
+                      counters: Dict):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for query in queries:
+            started = time.perf_counter()
+            status, _ = await http_request(reader, writer, host, "POST", "/reply",
+                                           {"text": query, "session": session_id})
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+                counters["ok"] += 1
+            elif status == 503:
+                counters["busy"] += 1
+            else:
+                counters["errors"] += 1
+    finally:
+        writer.close()
+
+
+async def run_load(host: str, port: int, sessions: int, messages: int, queries: List[str]) -> Dict:
+    latencies: List[float] = []
+    counters = {"ok": 0, "busy": 0, "errors": 0}
+    rng = random.Random(11)
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_session(host, port, f"load-{number}", [rng.choice(queries) for _ in range(messages)],
+                    latencies, counters)
+        for number in range(sessions)
+    ))
+    elapsed = time.perf_counter() - started
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, service_stats = await http_request(reader, writer, host, "GET", "/stats")
+    writer.close()
+
+    return {
+        "sessions": sessions,
+        "messages": sessions * messages,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_per_second": round(counters["ok"] / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {name: round(percentile(latencies, fraction) * 1000, 2)
+                       for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))},
+        **counters,
+        "service": service_stats
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(host: str, port: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"assistant service did not start on {host}:{port}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the assistant HTTP service")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{DEFAULT_PORT}")
+    parser.add_argument("--spawn", action="store_true", help="start a local service on a free port for the run")
+    parser.add_argument("--sessions", type=int, default=50, help="concurrent kiosk sessions")
+    parser.add_argument("--messages", type=int, default=40, help="messages sent by each session")
+    parser.add_argument("--products", default="products.json")
+    parser.add_argument("--queries", help="file with one query per line (default: generated from the catalog)")
+    parser.add_argument("-o", "--output", help="write the JSON report here as well")
+    args = parser.parse_args(argv)
+
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = sample_queries(read_products(args.products))
+
+    service = None
+    if args.spawn:
+        host, port = "127.0.0.1", free_port()
+        service = subprocess.Popen([sys.executable, SERVICE_SCRIPT, "--port", str(port),
+                                    "--products", args.products])
+        wait_until_up(host, port)
+    else:
+        parts = urllib.parse.urlsplit(args.url)
+        host, port = parts.hostname or "127.0.0.1", parts.port or DEFAULT_PORT
+
+    try:
+        report = asyncio.run(run_load(host, port, args.sessions, args.messages, queries))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+import queue
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from shopping_list import ListEntry, ShoppingList
+
+# Default session database, next to products.json
+SESSION_DB = "sessions.db"
+
+# Writes arriving within this window share one transaction (and one fsync)
+FLUSH_INTERVAL_SECONDS = 0.25
+
+# Which kiosk a session belongs to when several share one database file
+DEFAULT_KIOSK = socket.gethostname()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (id INTEGER PRIMARY KEY, started TEXT NOT NULL, ended TEXT,
+                                     kiosk TEXT NOT NULL DEFAULT '');
+CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY, session INTEGER NOT NULL, sender TEXT NOT NULL,
+                                     text TEXT NOT NULL, created TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS messages_by_session ON messages (session, id);
+CREATE TABLE IF NOT EXISTS items (session INTEGER NOT NULL, item TEXT NOT NULL, shelf TEXT NOT NULL,
+                                  category TEXT NOT NULL, quantity INTEGER NOT NULL, PRIMARY KEY (session, item));
+"""
+
+UPSERT_ITEM = ("INSERT INTO items (session, item, shelf, category, quantity) VALUES (?, ?, ?, ?, ?) "
+               "ON CONFLICT (session, item) DO UPDATE SET shelf = excluded.shelf, "
+               "category = excluded.category, quantity = excluded.quantity")
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+def connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path)
+    # WAL keeps the database readable while the writer commits; FULL fsyncs every commit
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=FULL")
+    return connection
+
+
+def read_conversations(path: str, sender: str = "user") -> Iterator[Tuple[int, List[str]]]:
+    """(session id, texts) for every recorded session, oldest first; used to replay real traffic"""
+    connection = connect(path)
+    try:
+        texts_by_session: Dict[int, List[str]] = {}
+        for session_id, text in connection.execute("SELECT session, text FROM messages WHERE sender = ? "
+                                                   "ORDER BY session, id", (sender,)):
+            texts_by_session.setdefault(session_id, []).append(text)
+    finally:
+        connection.close()
+    yield from texts_by_session.items()
+
+
+class SavedSession:
+    """A session read back from the store: its messages and shopping list"""
+
+    __slots__ = ("id", "started", "messages", "shopping_list")
+
+    def __init__(self, session_id: int, started: str, messages: List[Tuple[str, str, str]],
+                 shopping_list: ShoppingList):
+        self.id = session_id
+        self.started = started
+        # (sender, text, created) oldest first
+        self.messages = messages
+        self.shopping_list = shopping_list
+
+
+class SessionStore:
+    """Crash-safe record of chat sessions in SQLite (WAL mode).
+
+    Messages and shopping list changes are queued and written by one
+    background thread, which commits everything that arrived within
+    ``flush_interval`` in a single transaction. Each write has its own
+    savepoint, so one that fails is skipped without taking the others in
+    the batch with it. The list is stored as its
+    current rows rather than a log of changes, so restoring a session is a
+    couple of indexed reads and never goes through the NLP again.
+
+    Several kiosks may share the file. Each session records the ``kiosk``
+    that started it, and a kiosk only ever restores its own.
+    """
+
+    def __init__(self, path: str = SESSION_DB, flush_interval: float = FLUSH_INTERVAL_SECONDS,
+                 kiosk: str = DEFAULT_KIOSK):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.kiosk = kiosk
+        with connect(path) as connection:
+            connection.executescript(SCHEMA)
+            # Files written before sessions had an owner
+            if "kiosk" not in [row[1] for row in connection.execute("PRAGMA table_info(sessions)")]:
+                connection.execute("ALTER TABLE sessions ADD COLUMN kiosk TEXT NOT NULL DEFAULT ''")
+            connection.execute("CREATE INDEX IF NOT EXISTS sessions_by_kiosk ON sessions (kiosk, ended, id)")
+        connection.close()
+        self.commits = 0
+        self.writes = 0
+        self.failed_writes = 0
+        self.last_error: Optional[str] = None
+        self._pending = queue.Queue()
+        self._writer = threading.Thread(target=self._run, name="session-store", daemon=True)
+        self._writer.start()
+
+    def start_session(self) -> int:
+        """A new session id, assigned by SQLite so processes sharing the file never pick the same one"""
+        connection = connect(self.path)
+        try:
+            with connection:
+                return connection.execute("INSERT INTO sessions (started, kiosk) VALUES (?, ?)",
+                                          (_now(), self.kiosk)).lastrowid
+        finally:
+            connection.close()
+
+    def end_session(self, session_id: int):
+        self._pending.put(("UPDATE sessions SET ended = ? WHERE id = ?", (_now(), session_id)))
+
+    def record_message(self, session_id: int, sender: str, text: str):
+        self._pending.put(("INSERT INTO messages (session, sender, text, created) VALUES (?, ?, ?, ?)",
+                           (session_id, sender, text, _now())))
+
+    def record_item(self, session_id: int, entry: ListEntry):
+        self._pending.put((UPSERT_ITEM, (session_id, entry.item, entry.shelf, entry.category, entry.quantity)))
+
+    def record_removal(self, session_id: int, item: str):
+        self._pending.put(("DELETE FROM items WHERE session = ? AND item = ?", (session_id, item)))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far is committed"""
+        done = threading.Event()
+        self._pending.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        self._pending.put(None)
+        self._writer.join()
+
+    def _run(self):
+        connection = connect(self.path)
+        # Transactions and savepoints are managed here rather than by the sqlite3 module
+        connection.isolation_level = None
+        running = True
+        while running:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.flush_interval
+            # Gather whatever else arrives before the deadline; flush() and close() cut the wait short
+            while isinstance(batch[-1], tuple):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            writes = [operation for operation in batch if isinstance(operation, tuple)]
+            if writes:
+                self._write(connection, writes)
+            for operation in batch:
+                if operation is None:
+                    running = False
+                elif isinstance(operation, threading.Event):
+                    operation.set()
+        connection.close()
+
+    def _write(self, connection: sqlite3.Connection, writes: List[Tuple[str, tuple]]):
+        # One transaction (one fsync) for the batch; a failing statement rolls back only itself
+        failed = 0
+        try:
+            connection.execute("BEGIN")
+            for sql, parameters in writes:
+                connection.execute("SAVEPOINT write")
+                try:
+                    connection.execute(sql, parameters)
+                except sqlite3.Error as e:
+                    connection.execute("ROLLBACK TO write")
+                    failed += 1
+                    self.last_error = str(e)
+                connection.execute("RELEASE write")
+            connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            self.failed_writes += len(writes)
+            self.last_error = str(e)
+            return
+        self.commits += 1
+        self.writes += len(writes) - failed
+        self.failed_writes += failed
+        if not failed:
+            self.last_error = None
+
+    def load_session(self, session_id: int, message_limit: Optional[int] = None,
+                     connection: Optional[sqlite3.Connection] = None) -> Optional[SavedSession]:
+        """One session, with at most the last ``message_limit`` messages"""
+        owned = connection is None
+        if owned:
+            connection = connect(self.path)
+        try:
+            row = connection.execute("SELECT started FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            if message_limit is None:
+                messages = connection.execute("SELECT sender, text, created FROM messages WHERE session = ? "
+                                              "ORDER BY id", (session_id,)).fetchall()
+            else:
+                messages = connection.execute("SELECT sender, text, created FROM messages WHERE session = ? "
+                                              "ORDER BY id DESC LIMIT ?", (session_id, message_limit)).fetchall()
+                messages.reverse()
+            shopping_list = ShoppingList()
+            # rowid order is the order items were first added, which the not-found list keeps
+            for item, shelf, category, quantity in connection.execute(
+                    "SELECT item, shelf, category, quantity FROM items WHERE session = ? ORDER BY rowid", (session_id,)):
+                shopping_list.add(item, {"shelf": shelf, "category": category}, quantity)
+            return SavedSession(session_id, row[0], messages, shopping_list)
+        finally:
+            if owned:
+                connection.close()
+
+    def last_open_session(self, message_limit: Optional[int] = None) -> Optional[SavedSession]:
+        """This kiosk's most recent session that was never ended (it crashed or was closed mid-session)"""
+        with connect(self.path) as connection:
+            row = connection.execute("SELECT MAX(id) FROM sessions WHERE kiosk = ? AND ended IS NULL",
+                                     (self.kiosk,)).fetchone()
+            saved = self.load_session(row[0], message_limit, connection) if row[0] is not None else None
+        connection.close()
+        return saved
+
+    def saved_sessions(self) -> Iterator[SavedSession]:
+        """Every session with something on its list, oldest first"""
+        connection = connect(self.path)
+        try:
+            ids = [row[0] for row in connection.execute("SELECT DISTINCT session FROM items ORDER BY session")]
+            for session_id in ids:
+                saved = self.load_session(session_id, 0, connection)
+                if saved is not None:
+                    yield saved
+        finally:
+            connection.close()
+
+    def item_popularity(self) -> Dict[str, int]:
+        """How many saved sessions put each item on their list"""
+        connection = connect(self.path)
+        try:
+            return dict(connection.execute("SELECT item, COUNT(*) FROM items GROUP BY item"))
+        finally:
+            connection.close()
+
+    def stats(self) -> Dict:
+        return {"commits": self.commits, "writes": self.writes, "failed_writes": self.failed_writes,
+                "queued": self._pending.qsize(), "last_error": self.last_error}
@@ -0,0 +1,141 @@
+import bisect
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from catalog_index import fold_plural
+
+UNKNOWN_CATEGORY = "unknown"
+
+
+class ListEntry:
+    """One item on the shopping list"""
+
+    __slots__ = ("item", "shelf", "category", "quantity")
+
+    def __init__(self, item: str, shelf: str, category: str, quantity: int = 1):
+        self.item = item
+        self.shelf = shelf
+        self.category = category
+        self.quantity = quantity
+
+    def to_dict(self) -> Dict:
+        return {"shelf": self.shelf, "category": self.category, "quantity": self.quantity}
+
+
+class ShoppingList:
+    """Shopping list that keeps its category groups, sort order and counts current.
+
+    Every add, remove or quantity change updates the groups in place, so the
+    stats line and the list views never regroup the whole list. Items that
+    were not found in the store are kept in the order they were asked for.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, ListEntry] = {}
+        # Category -> item names in alphabetical order
+        self.groups: Dict[str, List[str]] = {}
+        self.not_found: List[str] = []
+        # Singular form -> item names with that form, oldest first, so "remove apples" finds "apple"
+        self.folded: Dict[str, List[str]] = {}
+        self.total_quantity = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __bool__(self):
+        return bool(self.entries)
+
+    def __contains__(self, item: str):
+        return item in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def get(self, item: str) -> Optional[ListEntry]:
+        return self.entries.get(item)
+
+    def find(self, item: str) -> Optional[str]:
+        """The name ``item`` is on the list under, allowing for plural forms"""
+        if item in self.entries:
+            return item
+        names = self.folded.get(fold_plural(item))
+        return names[0] if names else None
+
+    @property
+    def category_count(self) -> int:
+        return len(self.groups)
+
+    def add(self, item: str, info: Dict, quantity: Optional[int] = None) -> ListEntry:
+        """Add ``item`` at the location ``info``; an explicit ``quantity`` replaces the current one"""
+        entry = self.entries.get(item)
+        if entry is None:
+            entry = self.entries[item] = ListEntry(item, info["shelf"], info["category"], 0)
+            self._file(entry)
+        elif entry.category != info["category"]:
+            # The catalog moved the item since it was added
+            self._unfile(entry)
+            entry.category = info["category"]
+            self._file(entry)
+        entry.shelf = info["shelf"]
+        self.set_quantity(item, quantity if quantity is not None else max(entry.quantity, 1))
+        return entry
+
+    def update(self, results: Dict[str, Dict], quantities: Optional[Dict[str, int]] = None):
+        """Add every item of a reply's results (a repeated item keeps its quantity unless one is given)"""
+        quantities = quantities or {}
+        for item, info in results.items():
+            self.add(item, info, quantities.get(item))
+
+    def set_quantity(self, item: str, quantity: int):
+        """Change an item's quantity; zero or less removes it"""
+        entry = self.entries[item]
+        if quantity <= 0:
+            self.remove(item)
+            return
+        self.total_quantity += quantity - entry.quantity
+        entry.quantity = quantity
+
+    def remove(self, item: str) -> bool:
+        entry = self.entries.pop(item, None)
+        if entry is None:
+            return False
+        self._unfile(entry)
+        self.total_quantity -= entry.quantity
+        return True
+
+    def clear(self):
+        self.entries.clear()
+        self.groups.clear()
+        self.not_found.clear()
+        self.folded.clear()
+        self.total_quantity = 0
+
+    def _file(self, entry: ListEntry):
+        self.folded.setdefault(fold_plural(entry.item), []).append(entry.item)
+        if entry.category == UNKNOWN_CATEGORY:
+            self.not_found.append(entry.item)
+        else:
+            bisect.insort(self.groups.setdefault(entry.category, []), entry.item)
+
+    def _unfile(self, entry: ListEntry):
+        # "apple" and "apples" can both be on the list; the other one must stay findable
+        key = fold_plural(entry.item)
+        names = self.folded[key]
+        names.remove(entry.item)
+        if not names:
+            del self.folded[key]
+        if entry.category == UNKNOWN_CATEGORY:
+            self.not_found.remove(entry.item)
+            return
+        names = self.groups[entry.category]
+        del names[bisect.bisect_left(names, entry.item)]
+        if not names:
+            del self.groups[entry.category]
+
+    def grouped(self, order: Optional[List[str]] = None) -> List[Tuple[str, List[ListEntry]]]:
+        """(category, entries) pairs in ``order`` (default: alphabetical), entries sorted by name"""
+        categories = order if order is not None else sorted(self.groups)
+        return [(category, [self.entries[item] for item in self.groups[category]])
+                for category in categories if category in self.groups]
+
+    def to_dict(self) -> Dict[str, Dict]:
+        return {item: entry.to_dict() for item, entry in self.entries.items()}
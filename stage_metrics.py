@@ -0,0 +1,150 @@
+import bisect
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional
+
+# Stages timed for every message, in pipeline order
+STAGES = ["queue", "service", "intent", "spacy", "matching", "formatting", "render", "total"]
+
+# Most recent timings kept per stage for the percentiles
+WINDOW_SIZE = 1000
+
+# Upper bounds (seconds) of the exported Prometheus histogram buckets
+BUCKETS = [0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+
+# How often the metrics file is rewritten
+EXPORT_INTERVAL_SECONDS = 15.0
+
+
+class RollingHistogram:
+    """Recent timings for percentiles, plus cumulative buckets for export"""
+
+    def __init__(self, window: int = WINDOW_SIZE):
+        self.recent = deque(maxlen=window)
+        self.bucket_counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds: float):
+        self.recent.append(seconds)
+        self.count += 1
+        self.total += seconds
+        number = bisect.bisect_left(BUCKETS, seconds)
+        if number < len(BUCKETS):
+            self.bucket_counts[number] += 1
+
+    def summary(self) -> Dict:
+        ordered = sorted(self.recent)
+
+        def at(fraction: float) -> float:
+            if not ordered:
+                return 0.0
+            return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 3)
+
+        return {
+            "count": self.count,
+            "p50_ms": at(0.50),
+            "p95_ms": at(0.95),
+            "p99_ms": at(0.99),
+            "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0
+        }
+
+
+class StageMetrics:
+    """Per-stage latency histograms shared by the engine and the GUI.
+
+    Callers take ``time.perf_counter()`` before a stage and pass it to
+    ``record``; with ``enabled=False`` that call returns at once.
+    """
+
+    def __init__(self, enabled: bool = True, window: int = WINDOW_SIZE):
+        self.enabled = enabled
+        self.window = window
+        self.histograms: Dict[str, RollingHistogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, started: float, count: int = 1):
+        """Record the time since ``started``; a batch of ``count`` messages is split evenly between them"""
+        if not self.enabled:
+            return
+        seconds = (time.perf_counter() - started) / count
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = RollingHistogram(self.window)
+            for _ in range(count):
+                histogram.add(seconds)
+
+    def summary(self) -> Dict[str, Dict]:
+        with self._lock:
+            names = [stage for stage in STAGES if stage in self.histograms]
+            names += sorted(set(self.histograms) - set(STAGES))
+            return {stage: self.histograms[stage].summary() for stage in names}
+
+    def to_prometheus(self, extra: Optional[Dict[str, float]] = None) -> str:
+        """The histograms (and any extra gauges) in the Prometheus text exposition format"""
+        lines: List[str] = [
+            "# HELP supermarket_stage_seconds Time spent per message in each assistant stage",
+            "# TYPE supermarket_stage_seconds histogram"
+        ]
+        with self._lock:
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f'supermarket_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'supermarket_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'supermarket_stage_seconds_sum{{stage="{stage}"}} {histogram.total:.6f}')
+                lines.append(f'supermarket_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        for name, value in (extra or {}).items():
+            lines.append(f"# TYPE supermarket_{name} gauge")
+            lines.append(f"supermarket_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsExporter:
+    """Rewrites a Prometheus text file (node_exporter textfile style) every ``interval`` seconds"""
+
+    def __init__(self, metrics: StageMetrics, path: str, interval: float = EXPORT_INTERVAL_SECONDS,
+                 extra=None):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        # Optional callable returning more gauges, e.g. the intent router counters
+        self.extra = extra
+        self.exports = 0
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name="metrics-exporter", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.export()
+
+    def export(self) -> bool:
+        text = self.metrics.to_prometheus(self.extra() if self.extra else None)
+        # Scrapers must never see a half-written file
+        directory = os.path.dirname(os.path.abspath(self.path))
+        temp_path = None
+        try:
+            fd, temp_path = tempfile.mkstemp(prefix=".metrics-", dir=directory)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            if temp_path and os.path.exists(temp_path):
+                os.unlink(temp_path)
+            self.last_error = str(e)
+            return False
+        self.exports += 1
+        self.last_error = None
+        return True
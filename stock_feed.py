@@ -0,0 +1,283 @@
+"""Live shelf stock levels.
+
+The store's stock system (or a stand-in) writes one JSON object per update,
+either appended to a file or sent as UDP datagrams to a local port:
+
+    {"item": "milk", "quantity": 12}      # the shelf now holds 12
+    {"item": "milk", "delta": -1}         # one was sold
+
+A StockFeed thread reads both, collects the updates that arrive within
+``interval`` and applies them to a copy of the current StockSnapshot. The
+copy is then swapped into the engine with a single assignment. Queries take
+a reference to the snapshot once and never lock, however busy the feed is.
+"""
+import itertools
+import json
+import os
+import queue
+import select
+import socket
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from catalog_index import fold_plural
+
+# Updates arriving within this window are applied as one new snapshot
+APPLY_INTERVAL_SECONDS = 0.05
+
+# Largest UDP datagram read from the feed socket
+MAX_DATAGRAM = 65507
+
+_versions = itertools.count(1)
+
+
+def stock_key(item: str) -> str:
+    """Feed names and query items meet in one form ("Apples" and "apple" are the same shelf)"""
+    return fold_plural(item.strip().lower())
+
+def parse_update(line: str) -> Tuple[str, Optional[int], int]:
+    """(key, quantity or None, delta) from one feed line, raising ValueError with a readable reason"""
+    try:
+        update = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"not JSON: {e}") from None
+    if not isinstance(update, dict) or not isinstance(update.get("item"), str) or not update["item"].strip():
+        raise ValueError("an update needs an 'item' string")
+    if "quantity" not in update and "delta" not in update:
+        raise ValueError("an update needs a 'quantity' or a 'delta'")
+    for name in ("quantity", "delta"):
+        value = update.get(name, 0)
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise ValueError(f"'{name}' must be a whole number")
+    return stock_key(update["item"]), update.get("quantity"), update.get("delta", 0)
+
+
+class StockSnapshot:
+    """One immutable set of stock levels, keyed by stock_key()"""
+
+    __slots__ = ("_levels", "levels", "version", "updates", "applied_at")
+
+    def __init__(self, levels: Dict[str, int], updates: int = 0):
+        self._levels = levels
+        self.levels = MappingProxyType(levels)
+        self.version = next(_versions)
+        # Feed updates folded into this snapshot since the feed started
+        self.updates = updates
+        self.applied_at = time.time()
+
+    def updated(self, changes: Dict[str, int], updates: int) -> "StockSnapshot":
+        """A new snapshot with ``changes`` applied; this one, which readers may hold, is left as it was"""
+        # dict.copy() of the plain dict is a block copy; copying through the read-only proxy is far slower
+        levels = self._levels.copy()
+        levels.update(changes)
+        return StockSnapshot(levels, updates)
+
+    def level(self, item: str) -> Optional[int]:
+        """Units on the shelf, or None when the feed has never mentioned the item"""
+        return self.levels.get(stock_key(item))
+
+    def annotate(self, results: Dict[str, Dict]) -> Dict[str, Dict]:
+        """``results`` with "stock" and "in_stock" added to every tracked item.
+
+        Result dicts can be shared with the query cache, so tracked ones are
+        copied rather than changed.
+        """
+        annotated = {}
+        for item, info in results.items():
+            level = None
+            if info["category"] != "unknown":
+                level = self.level(info.get("matched") or item)
+                if level is None and info.get("matched"):
+                    level = self.level(item)
+            if level is None:
+                annotated[item] = info
+            else:
+                annotated[item] = dict(info, stock=level, in_stock=level > 0)
+        return annotated
+
+    def info(self) -> Dict:
+        return {
+            "version": self.version,
+            "items": len(self.levels),
+            "out_of_stock": sum(1 for level in self.levels.values() if level <= 0),
+            "updates": self.updates,
+            "applied_at": self.applied_at
+        }
+
+
+class StockFeed:
+    """Reads stock updates from a file and/or a local UDP port and swaps new snapshots into the engine.
+
+    All parsing and snapshot building happens on the feed thread, which is
+    the only writer; ``push`` lets other code (tests, benchmarks, an
+    in-process stock system) feed lines through the same path.
+    """
+
+    def __init__(self, engine, path: Optional[str] = None, port: Optional[int] = None, host: str = "127.0.0.1",
+                 interval: float = APPLY_INTERVAL_SECONDS, on_error: Optional[Callable[[Exception], None]] = None):
+        self.engine = engine
+        self.path = path
+        self.interval = interval
+        self.on_error = on_error
+        self.received = 0
+        self.rejected = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.apply_seconds = 0.0
+        self.last_error: Optional[str] = None
+        # Parsed updates not yet in a snapshot: key -> new level
+        self._pending: Dict[str, int] = {}
+        self._pushed = queue.SimpleQueue()
+        self._file = None
+        self._inode = None
+        self._position = 0
+        self._partial = b""
+        self._socket = None
+        if port is not None:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._socket.bind((host, port))
+            self._socket.setblocking(False)
+        self.address = self._socket.getsockname() if self._socket is not None else None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if engine.stock is None:
+            engine.swap_stock(StockSnapshot({}))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stock-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._socket is not None:
+            self._socket.close()
+        if self._file is not None:
+            self._file.close()
+
+    def push(self, lines: Iterable[str]):
+        """Queue feed lines from another thread; they go into the next snapshot"""
+        for line in lines:
+            self._pushed.put(line)
+
+    def _run(self):
+        while not self._stop.is_set():
+            deadline = time.monotonic() + self.interval
+            self._read_file()
+            # Wait on the socket until the batch is due; without one just sleep
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop.is_set():
+                    break
+                if self._socket is None:
+                    self._stop.wait(remaining)
+                elif select.select([self._socket], [], [], remaining)[0]:
+                    self._read_socket()
+            self._read_pushed()
+            self.apply_pending()
+
+    def _read_file(self):
+        if self.path is None:
+            return
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            # The stock system has not created the file yet
+            return
+        except OSError as e:
+            self._reject(e)
+            return
+        try:
+            # A replaced or truncated file is read again from its beginning
+            if self._file is None or stat.st_ino != self._inode or stat.st_size < self._position:
+                if self._file is not None:
+                    self._file.close()
+                self._file = open(self.path, "rb")
+                self._inode = stat.st_ino
+                self._position = 0
+                self._partial = b""
+            if stat.st_size == self._position:
+                return
+            self._file.seek(self._position)
+            chunk = self._file.read()
+            self._position += len(chunk)
+        except OSError as e:
+            self._reject(e)
+            return
+        # A line still being written is kept until its newline arrives
+        lines = (self._partial + chunk).split(b"\n")
+        self._partial = lines.pop()
+        self._take(line.decode("utf-8", "replace") for line in lines)
+
+    def _read_socket(self):
+        while True:
+            try:
+                datagram = self._socket.recv(MAX_DATAGRAM)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                self._reject(e)
+                return
+            self._take(datagram.decode("utf-8", "replace").split("\n"))
+
+    def _read_pushed(self):
+        lines = []
+        while True:
+            try:
+                lines.append(self._pushed.get_nowait())
+            except queue.Empty:
+                break
+        self._take(lines)
+
+    def _take(self, lines: Iterable[str]):
+        current = self.engine.stock.levels
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                key, quantity, delta = parse_update(line)
+            except ValueError as e:
+                self._reject(e)
+                continue
+            if quantity is None:
+                quantity = self._pending.get(key, current.get(key, 0))
+            self._pending[key] = max(0, quantity + delta)
+            self.received += 1
+
+    def _reject(self, error: Exception):
+        self.rejected += 1
+        self.last_error = str(error)
+        if self.on_error:
+            self.on_error(error)
+
+    def apply_pending(self) -> bool:
+        """Swap in a snapshot with every pending update (on the feed thread); returns True when there were any"""
+        if not self._pending:
+            return False
+        started = time.perf_counter()
+        pending, self._pending = self._pending, {}
+        self.engine.swap_stock(self.engine.stock.updated(pending, self.received))
+        self.apply_seconds += time.perf_counter() - started
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(pending))
+        return True
+
+    def stats(self) -> Dict:
+        snapshot = self.engine.stock
+        return {
+            "path": self.path,
+            "address": f"{self.address[0]}:{self.address[1]}" if self.address else None,
+            "interval_seconds": self.interval,
+            "received": self.received,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "largest_batch": self.largest_batch,
+            "average_apply_ms": round(self.apply_seconds / self.batches * 1000, 3) if self.batches else 0.0,
+            "last_error": self.last_error,
+            "snapshot": snapshot.info() if snapshot is not None else None
+        }
@@ -0,0 +1,82 @@
+import json
+import os
+
+import catalog_index
+from catalog_index import CatalogIndex, fold_plural
+
+PRODUCTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "products.json")
+
+
+def load_products():
+    with open(PRODUCTS, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def linear_scan(item, products_db):
+    """The exact-then-plural part of the original find_item_in_database"""
+    item = item.lower().strip()
+    for category, data in products_db.items():
+        if item in data["items"]:
+            return {"shelf": data["shelf"], "category": category}
+    for category, data in products_db.items():
+        for db_item in data["items"]:
+            if item + 's' == db_item or item == db_item + 's':
+                return {"shelf": data["shelf"], "category": category}
+    return dict(catalog_index.NOT_FOUND)
+
+
+def old_fold_plural(term):
+    """fold_plural before it shared rule_extractor.lemmatize"""
+    if len(term) > 4 and term.endswith("ies"):
+        return term[:-3] + "y"
+    if len(term) > 1 and term.endswith('s') and not term.endswith('ss'):
+        return term[:-1]
+    return term
+
+
+def old_plural_variants(term):
+    variants = [term]
+    if len(term) > 1 and term.endswith('s') and not term.endswith('ss'):
+        variants.append(term[:-1])
+        if len(term) > 3 and term.endswith('es'):
+            variants.append(term[:-2])
+        if len(term) > 4 and term.endswith('ies'):
+            variants.append(term[:-3] + 'y')
+    return variants
+
+
+def test_lookup_matches_linear_scan_for_catalog_names():
+    products_db = load_products()
+    index = CatalogIndex(products_db, max_edit_distance=0, semantic=False)
+    for data in products_db.values():
+        for term in data["items"]:
+            for query in (term, term.upper(), f" {term} ", term[:-1] if term.endswith("s") else term):
+                assert index.lookup(query) == linear_scan(query, products_db), query
+
+
+def test_partial_matches_need_whole_words():
+    index = CatalogIndex(load_products(), max_edit_distance=0, semantic=False)
+    # The old scan found "tea" inside "steak" and "paper" inside "toilet papers"
+    assert index.lookup("steak")["category"] == "unknown"
+    assert index.lookup("toilet papers")["category"] == "cleaning"
+    assert index.lookup("drink")["category"] == "beverages"
+
+
+def test_shared_lemmatizer_changes_only_the_listed_lookups(monkeypatch):
+    products_db = load_products()
+    terms = [term for data in products_db.values() for term in data["items"]]
+    # Irregular plurals now fold the way spaCy lemmatizes them
+    assert {term: fold_plural(term) for term in terms if fold_plural(term) != old_fold_plural(term)} == {
+        "mangoes": "mango", "cookies": "cookie", "potatoes": "potato"}
+
+    queries = sorted({query for term in terms for query in (term, term + "s", term + "es", term[:-1], term + "ss")})
+    current = CatalogIndex(products_db)
+    now = {query: current.lookup(query)["category"] for query in queries}
+    monkeypatch.setattr(catalog_index, "fold_plural", old_fold_plural)
+    monkeypatch.setattr(catalog_index, "plural_variants", old_plural_variants)
+    previous = CatalogIndex(products_db)
+    changed = {query: (previous.lookup(query)["category"], category)
+               for query, category in now.items() if previous.lookup(query)["category"] != category}
+    # Typos one letter past a plural are now measured from the real singular ("mango", not "mangoe")
+    assert changed == {"cookiess": ("unknown", "bakery"), "mangoess": ("fruits", "unknown"),
+                       "potatoess": ("vegetables", "unknown")}
@@ -0,0 +1,73 @@
+import json
+import os
+
+import pytest
+
+from assistant_engine import AssistantEngine
+from catalog_reload import Catalog, CatalogWatcher, validate_products
+
+PRODUCTS = {
+    "dairy": {"shelf": "Shelf 2 - Dairy Products", "items": ["milk", "cheese"]},
+    "bakery": {"shelf": "Shelf 3 - Bakery Items", "items": ["bread"]}
+}
+
+
+def write_catalog(path, products_db, stamp):
+    path.write_text(json.dumps(products_db), encoding="utf-8")
+    # Distinct modification times, whatever the file system's resolution
+    os.utime(path, ns=(stamp, stamp))
+
+
+def test_changed_file_is_swapped_in(tmp_path):
+    path = tmp_path / "products.json"
+    write_catalog(path, PRODUCTS, 1_000_000_000)
+    engine = AssistantEngine()
+    reloaded = []
+    watcher = CatalogWatcher(engine, str(path), on_reload=reloaded.append)
+    assert watcher.check()
+    first = engine.catalog
+    assert engine.resolve("where is the bread")[1]["bread"]["category"] == "bakery"
+    # Unchanged file: no new version
+    assert not watcher.check()
+
+    moved = dict(PRODUCTS, bakery={"shelf": "Shelf 9 - Bread", "items": ["bread", "bagels"]})
+    write_catalog(path, moved, 2_000_000_000)
+    assert watcher.check()
+    assert engine.catalog.version > first.version
+    assert engine.resolve("where is the bread")[1]["bread"]["shelf"] == "Shelf 9 - Bread"
+    # Readers holding the old snapshot still see it whole
+    assert first.index.lookup("bread")["shelf"] == "Shelf 3 - Bakery Items"
+    assert reloaded == [first, engine.catalog]
+
+
+def test_invalid_file_keeps_the_current_catalog(tmp_path):
+    path = tmp_path / "products.json"
+    write_catalog(path, PRODUCTS, 1_000_000_000)
+    engine = AssistantEngine()
+    errors = []
+    watcher = CatalogWatcher(engine, str(path), on_error=errors.append)
+    watcher.check()
+    current = engine.catalog
+    path.write_text('{"dairy": {"shelf": "Shelf 2", "items": "milk"}}', encoding="utf-8")
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert not watcher.check()
+    assert engine.catalog is current
+    assert watcher.failures == 1 and len(errors) == 1
+    assert "items" in watcher.last_error
+
+
+@pytest.mark.parametrize("products_db", [
+    [], {"dairy": []}, {"dairy": {"items": []}}, {"dairy": {"shelf": "S", "items": [1]}},
+    {"dairy": {"shelf": "S", "items": [], "position": [1]}},
+    {"dairy": {"shelf": "S", "items": [], "synonyms": {"pop": 1}}}
+])
+def test_schema_errors_are_reported(products_db):
+    with pytest.raises(ValueError):
+        validate_products(products_db)
+
+
+def test_catalog_from_bytes_records_checksum():
+    raw = json.dumps(PRODUCTS).encode("utf-8")
+    catalog = Catalog.from_bytes(raw)
+    assert catalog.checksum == Catalog.from_bytes(raw).checksum
+    assert catalog.info()["terms"] == 3
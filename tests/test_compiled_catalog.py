@@ -0,0 +1,42 @@
+import json
+import os
+
+from catalog_index import CatalogIndex
+from compiled_catalog import compile_catalog, open_compiled_catalog
+
+PRODUCTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "products.json")
+
+QUERIES = ["milk", "apples", "apple", "Bananas", "ice cream", "energy drink", "drink", "toilet papers",
+           "bananna", "choclate", "pop", "crisps", "steak", "tea", "zzqx", ""]
+
+
+def load_products():
+    with open(PRODUCTS, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_compiled_lookups_match_products_json(tmp_path):
+    products_db = load_products()
+    path = str(tmp_path / "products.catalog")
+    compile_catalog(products_db, path)
+    compiled = open_compiled_catalog(path)
+    index = CatalogIndex(products_db)
+    terms = [term for data in products_db.values() for term in data["items"]]
+    for query in QUERIES + terms:
+        assert compiled.index.lookup(query) == index.lookup(query), query
+    assert compiled.index.lookup_many(QUERIES) == index.lookup_many(QUERIES)
+    assert compiled.index.find_phrases("some ice cream and toilet paper") == \
+        index.find_phrases("some ice cream and toilet paper")
+
+
+def test_compiled_products_read_back(tmp_path):
+    products_db = load_products()
+    path = str(tmp_path / "products.catalog")
+    compile_catalog(products_db, path)
+    compiled = open_compiled_catalog(path)
+    assert list(compiled) == list(products_db)
+    for category, data in products_db.items():
+        read = compiled[category]
+        assert read["shelf"] == data["shelf"] and read["items"] == data["items"]
+        assert read["position"] == [float(value) for value in data["position"]]
+        assert read.get("synonyms") == data.get("synonyms")
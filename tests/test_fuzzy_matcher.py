@@ -0,0 +1,39 @@
+import json
+import os
+
+from catalog_index import CatalogIndex
+from fuzzy_matcher import SymSpellIndex, edit_distance
+
+PRODUCTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "products.json")
+
+
+def test_edit_distance_counts_swaps_once():
+    assert edit_distance("banana", "bananna", 2) == 1
+    assert edit_distance("chocolate", "chcoolate", 2) == 1
+    assert edit_distance("milk", "silk", 2) == 1
+    assert edit_distance("bread", "butter", 2) is None
+
+
+def test_allowed_distance_is_one_edit_per_four_letters():
+    index = SymSpellIndex(["banana", "jam", "ham", "strawberry"])
+    assert index.best("bananna") == (1, 0)
+    # Three letters allow no typo at all: "jam" never becomes "ham"
+    assert index.allowed_distance("hjm") == 0
+    assert index.best("hjm") is None
+    assert index.best("jham") == (1, 1)
+    assert index.best("strawbery") == (1, 3)
+    assert index.best("strwbery") == (2, 3)
+    assert index.best("stawbry") is None
+
+
+def test_catalog_typos_resolve():
+    with open(PRODUCTS, encoding="utf-8") as f:
+        index = CatalogIndex(json.load(f), semantic=False)
+    assert index.lookup("bananna") == {"shelf": "Shelf 1 - Fruits", "category": "fruits", "matched": "bananas"}
+    assert index.lookup("choclate")["matched"] == "chocolate"
+    assert index.lookup("bannanas")["category"] == "fruits"
+    # Short words stay strict
+    assert index.lookup("steak")["category"] == "unknown"
+    assert index.suggest("bananna")[0][:2] == ("bananas", 1)
+    assert CatalogIndex({"fruits": {"shelf": "Shelf 1", "items": ["bananas"]}}, max_edit_distance=0,
+                        semantic=False).lookup("bananna")["category"] == "unknown"
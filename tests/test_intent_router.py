@@ -0,0 +1,37 @@
+import pytest
+
+from intent_router import (CLEAR_LIST, GREETING, HELP, PRINT_LIST, PRODUCT, REMOVE_ITEMS, SHOW_LIST, THANKS,
+                           IntentRouter, removal_target)
+
+
+@pytest.mark.parametrize("text, intent", [
+    ("Hi!", GREETING), ("good morning there", GREETING), ("hey buddy", GREETING),
+    ("thanks so much", THANKS), ("hi, thanks!", THANKS), ("bye", THANKS),
+    ("help", HELP), ("what can you do?", HELP),
+    ("show my list", SHOW_LIST), ("what's on my shopping list", SHOW_LIST),
+    ("print my list", PRINT_LIST), ("start over", CLEAR_LIST),
+    ("remove milk", REMOVE_ITEMS), ("take the bread off my list", REMOVE_ITEMS),
+    ("drop the milk from my list", REMOVE_ITEMS),
+    # Words that start like a greeting or thanks are product queries
+    ("chips", PRODUCT), ("thick", PRODUCT), ("hiking socks", PRODUCT), ("yogurt", PRODUCT),
+    ("where is the tea", PRODUCT), ("ok", PRODUCT), ("cheese", PRODUCT),
+    # Everyday uses of loose removal verbs are not removals
+    ("forget it", PRODUCT), ("scratch that", PRODUCT), ("drop me a hint", PRODUCT),
+])
+def test_classify(text, intent):
+    assert IntentRouter().classify(text) == intent
+
+
+def test_removal_target():
+    assert removal_target("Remove milk from my list") == "milk"
+    assert removal_target("take the bread and eggs off my list") == "the bread and eggs"
+    assert removal_target("cancel the cheese from the list") == "the cheese"
+
+
+def test_stats_count_messages_that_skip_nlp():
+    router = IntentRouter()
+    for text in ("hi", "milk please", "thanks"):
+        router.route(text)
+    stats = router.stats()
+    assert stats["messages"] == 3 and stats["skipped_nlp"] == 2
+    assert stats["intents"][PRODUCT] == 1
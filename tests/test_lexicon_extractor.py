@@ -0,0 +1,38 @@
+import json
+import os
+
+from catalog_index import fold_plural
+from lexicon_extractor import LexiconExtractor, catalog_vocabulary
+from rule_extractor import lemmatize
+
+PRODUCTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "products.json")
+
+
+def catalog_extractor():
+    with open(PRODUCTS, encoding="utf-8") as f:
+        return LexiconExtractor(json.load(f))
+
+
+def test_nouns_are_kept_as_lemmas():
+    extractor = catalog_extractor()
+    assert sorted(extractor.extract("I need some fresh oranges and sweets please")) == ["orange", "sweet"]
+    assert extractor.extract("Do you sell baked beans?") == ["bean"]
+    assert sorted(extractor.extract("3 apples and 2 loaves of bread")) == ["apple", "bread", "loaf"]
+    # "stuffing" is a noun, "don't" a verb, and "what's" keeps only its word
+    assert extractor.extract("where is the stuffing") == ["stuffing"]
+    assert extractor.extract("I don't want cheese, what's cheap") == ["cheese"]
+    assert extractor.extract_many(["hello", "milk"]) == [[], ["milk"]]
+
+
+def test_catalog_items_are_kept_whatever_else_they_could_be():
+    assert LexiconExtractor().extract("kale fresh") == ["kale"]
+    extractor = LexiconExtractor({"produce": {"shelf": "Shelf 1", "items": ["fresh herbs", "Fresh"]}})
+    assert sorted(extractor.extract("kale fresh")) == ["fresh", "kale"]
+    assert catalog_vocabulary({"produce": {"shelf": "Shelf 1", "items": ["Cherries", "ice cream"]}}) == \
+        {"cherries", "cherry"}
+
+
+def test_one_lemmatizer_for_extraction_and_catalog_folding():
+    for word in ("cherries", "tomatoes", "loaves", "glasses", "mangoes", "cookies", "knives", "children"):
+        assert fold_plural(word) == lemmatize(word)
+    assert fold_plural("energy drinks") == "energy drink"
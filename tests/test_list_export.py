@@ -0,0 +1,58 @@
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+from list_export import FORMATS, ListExporter, export_snapshot, item_label, list_snapshot, read_saved_lists
+from shopping_list import ShoppingList
+
+GENERATED = datetime(2024, 5, 1, 9, 30)
+
+
+def sample_list():
+    shopping_list = ShoppingList()
+    shopping_list.add("milk", {"shelf": "Shelf 2 - Dairy Products", "category": "dairy"}, 2)
+    shopping_list.add("apples", {"shelf": "Shelf 1 - Fruits", "category": "fruits"}, 3)
+    shopping_list.add("<moon rocks>", {"shelf": "Not found", "category": "unknown"})
+    return shopping_list
+
+
+def test_snapshot_follows_the_given_order():
+    snapshot = list_snapshot(sample_list(), ["dairy", "fruits"], GENERATED)
+    assert [section["category"] for section in snapshot["sections"]] == ["dairy", "fruits"]
+    assert snapshot["total_items"] == 3 and snapshot["total_quantity"] == 6
+    assert snapshot["not_found"] == [{"item": "<moon rocks>", "quantity": 1}]
+    assert item_label("apples", 3) == "3 × Apples" and item_label("milk") == "Milk"
+
+
+def test_every_format_is_written_and_reads_back(tmp_path):
+    snapshot = list_snapshot(sample_list(), generated=GENERATED)
+    paths = export_snapshot(snapshot, sorted(FORMATS), str(tmp_path), "list")
+    assert sorted(os.listdir(tmp_path)) == ["list.csv", "list.html", "list.json", "list.txt"]
+    assert [name for name, _ in read_saved_lists(str(tmp_path))] == ["list"]
+    with open(tmp_path / "list.json", encoding="utf-8") as f:
+        assert json.load(f) == snapshot
+    with open(tmp_path / "list.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == ["category", "item", "quantity", "shelf"]
+    assert ["fruits", "apples", "3", "Shelf 1 - Fruits"] in rows
+    html = (tmp_path / "list.html").read_text(encoding="utf-8")
+    assert "&lt;moon rocks&gt;" in html and "<moon" not in html
+    assert "2 × Milk" in (tmp_path / "list.txt").read_text(encoding="utf-8")
+    assert len(paths) == 4
+
+
+def test_background_exporter_reports_results(tmp_path):
+    exporter = ListExporter(str(tmp_path))
+    exporter.submit(list_snapshot(sample_list(), generated=GENERATED), ["txt"])
+    exporter.submit(list_snapshot(sample_list(), generated=GENERATED), ["pdf"])
+    done = []
+    deadline = time.monotonic() + 5
+    while len(done) < 2 and time.monotonic() < deadline:
+        done += exporter.poll()
+        time.sleep(0.01)
+    assert done[0] == ([os.path.join(str(tmp_path), "SmartList_20240501_093000.txt")], None)
+    # A failing job is reported rather than stopping the exporter
+    assert done[1][0] == [] and done[1][1]
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".export-")]
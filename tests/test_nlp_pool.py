@@ -0,0 +1,35 @@
+import json
+import os
+import signal
+
+import pytest
+
+import assistant_engine
+from lexicon_extractor import LexiconExtractor
+from nlp_pool import NLPWorkerPool
+
+PRODUCTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "products.json")
+
+
+@pytest.fixture
+def lexicon(monkeypatch):
+    with open(PRODUCTS, encoding="utf-8") as f:
+        monkeypatch.setattr(assistant_engine, "nlp", LexiconExtractor(json.load(f)))
+    monkeypatch.setattr(assistant_engine, "extractor", "lexicon")
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGKILL"), reason="needs SIGKILL")
+def test_killed_worker_is_restarted_and_its_batch_answered(lexicon):
+    pool = NLPWorkerPool(1).start()
+    try:
+        assert pool.extract(["I need apples"]) == [["apple"]]
+        os.kill(pool.processes[0].pid, signal.SIGKILL)
+        pool.processes[0].join()
+        # The batch is queued for the dead worker and handed to its replacement
+        texts = ["bread and milk", "some toilet paper"]
+        answered = pool.submit(texts).result(60)
+        assert [sorted(items) for items in answered] == [sorted(assistant_engine.nlp.extract(text)) for text in texts]
+        assert pool.health[0].restarts == 1
+        assert pool.stats()["restart_method"] == "spawn"
+    finally:
+        pool.close()
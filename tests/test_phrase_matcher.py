@@ -0,0 +1,32 @@
+import json
+import os
+
+from assistant_engine import add_catalog_phrases
+from catalog_index import CatalogIndex
+from phrase_matcher import PhraseAutomaton, tokenize
+
+PRODUCTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "products.json")
+
+
+def test_longest_phrase_wins_and_order_is_kept():
+    automaton = PhraseAutomaton([("ice cream", 1), ("cream", 2), ("toilet paper", 3), ("paper", 4)])
+    words = tokenize("Some paper, ice cream and TOILET PAPER please")
+    assert automaton.find(words) == [(1, 2, 4), (2, 4, 1), (5, 7, 3)]
+    # Every occurrence is seen before overlaps are resolved
+    assert (3, 4, 2) in automaton.matches(words)
+
+
+def test_shared_prefixes_and_suffixes():
+    automaton = PhraseAutomaton([("red bell pepper", 1), ("bell pepper", 2), ("red wine", 3)])
+    assert automaton.find(tokenize("a red bell pepper")) == [(1, 4, 1)]
+    assert automaton.find(tokenize("red red wine and a bell pepper")) == [(1, 3, 3), (5, 7, 2)]
+    assert automaton.find([]) == []
+
+
+def test_catalog_phrases_replace_the_words_they_cover():
+    with open(PRODUCTS, encoding="utf-8") as f:
+        index = CatalogIndex(json.load(f))
+    text = "I need ice cream, energy drinks and toilet paper"
+    assert index.find_phrases(text)[0] == ["ice cream", "energy drinks", "toilet paper"]
+    items = add_catalog_phrases(text, ["ice", "cream", "energy", "drink", "toilet", "paper"], index)
+    assert items == ["ice cream", "energy drinks", "toilet paper"]
@@ -0,0 +1,52 @@
+from query_cache import QueryCache, normalize_query
+
+MILK = {"milk": {"shelf": "Shelf 2 - Dairy Products", "category": "dairy"}}
+
+
+def test_repeats_share_an_entry():
+    assert normalize_query("  Where is   the MILK?? ") == "where is the milk"
+    cache = QueryCache(4)
+    catalog = object()
+    assert cache.get("where is the milk", catalog) is None
+    cache.put("where is the milk", catalog, ["milk"], MILK)
+    assert cache.get("Where is the milk?", catalog) == (["milk"], MILK)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_least_recently_used_is_evicted():
+    cache = QueryCache(2)
+    catalog = object()
+    cache.put("a", catalog, ["a"], {})
+    cache.put("b", catalog, ["b"], {})
+    cache.get("a", catalog)
+    cache.put("c", catalog, ["c"], {})
+    assert cache.get("b", catalog) is None
+    assert cache.get("a", catalog) is not None and cache.get("c", catalog) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_catalog_change_empties_the_cache():
+    cache = QueryCache(4)
+    old, new = object(), object()
+    cache.put("milk", old, ["milk"], MILK)
+    assert cache.get("milk", new) is None
+    assert cache.stats()["invalidations"] == 1
+    assert cache.get("milk", old) is None
+
+
+def test_callers_get_copies():
+    cache = QueryCache(4)
+    catalog = object()
+    cache.put("milk", catalog, ["milk"], MILK)
+    items, results = cache.get("milk", catalog)
+    items.append("bread")
+    results["milk"]["quantity"] = 3
+    assert cache.get("milk", catalog) == (["milk"], MILK)
+
+
+def test_zero_size_caches_nothing():
+    cache = QueryCache(0)
+    catalog = object()
+    cache.put("milk", catalog, ["milk"], MILK)
+    assert cache.get("milk", catalog) is None
@@ -0,0 +1,36 @@
+import io
+import json
+import os
+
+import resolve_queries
+from assistant_engine import AssistantEngine, read_products
+
+PRODUCTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "products.json")
+
+QUERIES = ["I need 2 kg rice", "two bags of flour and some milk", "I want ice cream and toilet paper"]
+
+
+def test_output_matches_the_engine():
+    engine = AssistantEngine(read_products(PRODUCTS))
+    out = io.StringIO()
+    assert resolve_queries.resolve(iter(QUERIES), engine, out, batch_size=2) == 3
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    for record, (items, results) in zip(records, AssistantEngine(read_products(PRODUCTS)).resolve_many(QUERIES)):
+        assert record["items"] == sorted(items)
+        assert record["shelves"] == results
+    # Quantity words are dropped, as in the kiosk
+    assert "kg" not in records[0]["items"] and "2" not in records[0]["items"]
+
+
+def test_missing_spacy_falls_back_to_rules(tmp_path, monkeypatch):
+    def no_spacy():
+        raise ImportError("No module named 'spacy'")
+
+    monkeypatch.setattr(resolve_queries, "load_nlp", no_spacy)
+    monkeypatch.setattr(resolve_queries, "select_extractor", lambda name: None)
+    queries = tmp_path / "queries.txt"
+    queries.write_text("\n".join(QUERIES) + "\n", encoding="utf-8")
+    output = tmp_path / "resolved.jsonl"
+    assert resolve_queries.main([str(queries), "-o", str(output), "--products", PRODUCTS]) == 0
+    records = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert records[2]["shelves"]["toilet paper"]["category"] == "cleaning"
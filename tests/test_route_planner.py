@@ -0,0 +1,67 @@
+import itertools
+import random
+
+from assistant_engine import AssistantEngine
+from route_planner import RoutePlanner
+
+# Generous, so the tests never depend on machine speed
+TIME_BUDGET = 1.0
+
+
+def catalog(points):
+    return {name: {"shelf": name, "items": [], "position": list(point)} for name, point in points.items()}
+
+
+def test_rectangle_is_walked_around_the_edge():
+    planner = RoutePlanner(catalog({"a": (0, 10), "b": (20, 10), "c": (20, 0), "d": (0, 20), "e": (20, 20)}))
+    route = planner.order(["e", "a", "c", "b", "d"], TIME_BUDGET)
+    assert sorted(route) == ["a", "b", "c", "d", "e"]
+    # Out along one side and back along the other: the perimeter
+    assert planner.route_length(route) == 80
+
+
+def test_sections_without_position_go_last_in_given_order():
+    products_db = catalog({"a": (5, 5), "b": (10, 0)})
+    products_db["spices"] = {"shelf": "Shelf 10", "items": []}
+    products_db["frozen"] = {"shelf": "Shelf 8", "items": []}
+    planner = RoutePlanner(products_db)
+    route = planner.order(["spices", "b", "frozen", "a", "b"], TIME_BUDGET)
+    assert route[:2] in (["a", "b"], ["b", "a"])
+    assert route[2:] == ["spices", "frozen"]
+
+
+def test_two_opt_matches_brute_force_on_small_stores():
+    rng = random.Random(7)
+    for _ in range(25):
+        count = rng.randint(3, 7)
+        points = {f"s{number}": (rng.randint(0, 50), rng.randint(0, 50)) for number in range(count)}
+        planner = RoutePlanner(catalog(points))
+        route = planner.order(points, TIME_BUDGET)
+        assert sorted(route) == sorted(points)
+        nearest = [planner.names[stop] for stop in planner._nearest_neighbour(list(planner.numbers.values()))[1:]]
+        best = min(planner.route_length(list(order)) for order in itertools.permutations(points))
+        length = planner.route_length(route)
+        assert length <= planner.route_length(nearest)
+        # 2-opt is a local search, but no single reversal may still shorten the route
+        for first, second in itertools.combinations(range(len(route) + 1), 2):
+            reversed_route = route[:first] + route[first:second][::-1] + route[second:]
+            assert planner.route_length(reversed_route) >= length - 1e-9
+        assert length >= best
+
+
+def test_engine_without_positions_lists_sections_alphabetically():
+    products_db = {name: {"shelf": name, "items": [name]} for name in ("snacks", "dairy", "bakery")}
+    assert AssistantEngine().plan_route(["snacks", "dairy"]) == ["dairy", "snacks"]
+    assert AssistantEngine(products_db).plan_route(["snacks", "bakery", "dairy", "snacks"]) == [
+        "bakery", "dairy", "snacks"]
+    products_db["snacks"]["position"] = [1, 1]
+    products_db["dairy"]["position"] = [30, 30]
+    products_db["bakery"]["position"] = [2, 2]
+    assert AssistantEngine(products_db).plan_route(["dairy", "snacks", "bakery"]) == ["snacks", "bakery", "dairy"]
+
+
+def test_tiny_routes():
+    planner = RoutePlanner(catalog({"a": (5, 5), "b": (1, 1)}))
+    assert planner.order([], TIME_BUDGET) == []
+    assert planner.order(["a"], TIME_BUDGET) == ["a"]
+    assert planner.order(["a", "b"], TIME_BUDGET) == ["b", "a"]
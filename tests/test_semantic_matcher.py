@@ -0,0 +1,35 @@
+import json
+import os
+
+import pytest
+
+from assistant_engine import AssistantEngine
+from catalog_index import CatalogIndex, plural_form
+
+PRODUCTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "products.json")
+
+
+def load_products():
+    with open(PRODUCTS, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_plural_form():
+    assert plural_form("soft drink") == "soft drinks"
+    assert plural_form("berry") == "berries" and plural_form("toy") == "toys"
+    assert plural_form("dish") == "dishes" and plural_form("glass") == "glasses"
+
+
+def test_multi_word_synonyms_are_matched_before_extraction():
+    engine = AssistantEngine(load_products())
+    items, shelves = engine.resolve("some soft drinks")
+    assert items == ["soda"] and shelves["soda"]["category"] == "beverages"
+    assert engine.resolve("a fizzy drink and energy drinks")[0] == ["soda", "energy drinks"]
+    assert engine.resolve("I need a loo roll")[0] == ["toilet paper"]
+
+
+def test_single_word_synonyms_use_the_fallback():
+    pytest.importorskip("numpy")
+    index = CatalogIndex(load_products())
+    assert index.find_phrases("some pop")[0] == []
+    assert index.lookup_many(["pop"])["pop"]["category"] == "beverages"
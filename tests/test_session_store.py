@@ -0,0 +1,105 @@
+import sqlite3
+
+import pytest
+
+from session_store import SessionStore
+from shopping_list import ListEntry
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.db"), flush_interval=0.01)
+    yield store
+    store.close()
+
+
+def test_session_round_trip(store):
+    session_id = store.start_session()
+    store.record_message(session_id, "user", "I need milk and apples")
+    store.record_message(session_id, "bot", "Milk is on Shelf 2")
+    store.record_item(session_id, ListEntry("milk", "Shelf 2 - Dairy Products", "dairy", 2))
+    store.record_item(session_id, ListEntry("moon rocks", "Not found", "unknown"))
+    store.record_item(session_id, ListEntry("apples", "Shelf 1 - Fruits", "fruits"))
+    # A later change to the same item replaces its row
+    store.record_item(session_id, ListEntry("milk", "Shelf 2 - Dairy Products", "dairy", 3))
+    store.record_removal(session_id, "apples")
+    assert store.flush(5)
+
+    saved = store.load_session(session_id)
+    assert [(sender, text) for sender, text, _ in saved.messages] == [
+        ("user", "I need milk and apples"), ("bot", "Milk is on Shelf 2")]
+    assert saved.shopping_list.to_dict() == {
+        "milk": {"shelf": "Shelf 2 - Dairy Products", "category": "dairy", "quantity": 3},
+        "moon rocks": {"shelf": "Not found", "category": "unknown", "quantity": 1}}
+    assert saved.shopping_list.not_found == ["moon rocks"]
+    assert saved.shopping_list.total_quantity == 4
+    assert [text for _, text, _ in store.load_session(session_id, message_limit=1).messages] == ["Milk is on Shelf 2"]
+
+
+def test_last_open_session_skips_ended_ones(store):
+    first = store.start_session()
+    second = store.start_session()
+    assert second > first
+    store.record_message(first, "user", "hello")
+    store.end_session(second)
+    assert store.flush(5)
+    assert store.last_open_session().id == first
+    store.end_session(first)
+    assert store.flush(5)
+    assert store.last_open_session() is None
+    assert store.load_session(second + 1) is None
+
+
+def test_stores_sharing_a_file_get_distinct_sessions(store):
+    other = SessionStore(store.path)
+    try:
+        assert len({store.start_session(), other.start_session(), store.start_session()}) == 3
+    finally:
+        other.close()
+
+
+def test_kiosks_sharing_a_file_restore_only_their_own(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first, second = SessionStore(path, kiosk="till-1"), SessionStore(path, kiosk="till-2")
+    try:
+        mine = first.start_session()
+        first.record_message(mine, "user", "I need milk")
+        assert first.flush(5)
+        assert second.last_open_session() is None
+        theirs = second.start_session()
+        assert first.last_open_session().id == mine
+        assert second.last_open_session().id == theirs
+    finally:
+        first.close()
+        second.close()
+
+
+def test_files_without_kiosk_column_are_upgraded(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE sessions (id INTEGER PRIMARY KEY, started TEXT NOT NULL, ended TEXT)")
+    connection.execute("INSERT INTO sessions (started) VALUES ('2024-05-01T09:30:00')")
+    connection.commit()
+    connection.close()
+    store = SessionStore(path, kiosk="till-1")
+    try:
+        # The old open session has no owner, so no kiosk picks it up
+        assert store.last_open_session() is None
+        assert store.start_session() == 2
+        assert store.last_open_session().id == 2
+    finally:
+        store.close()
+
+
+def test_failing_write_does_not_lose_the_batch(store):
+    session_id = store.start_session()
+    store.record_message(session_id, "user", "before")
+    # NULL text breaks the NOT NULL constraint
+    store.record_message(session_id, "user", None)
+    store.record_message(session_id, "user", "after")
+    assert store.flush(5)
+    assert [text for _, text, _ in store.load_session(session_id).messages] == ["before", "after"]
+    stats = store.stats()
+    assert stats["failed_writes"] == 1
+    assert stats["writes"] == 2
+    assert "NOT NULL" in stats["last_error"]
@@ -0,0 +1,98 @@
+from shopping_list import UNKNOWN_CATEGORY, ShoppingList
+
+DAIRY = {"shelf": "Shelf 2 - Dairy Products", "category": "dairy"}
+FRUITS = {"shelf": "Shelf 1 - Fruits", "category": "fruits"}
+UNKNOWN = {"shelf": "Not found", "category": UNKNOWN_CATEGORY}
+
+
+def assert_consistent(shopping_list: ShoppingList):
+    """The incrementally kept groups and counts match a regrouping from scratch"""
+    groups = {}
+    not_found = []
+    for item, entry in shopping_list.entries.items():
+        if entry.category == UNKNOWN_CATEGORY:
+            not_found.append(item)
+        else:
+            groups.setdefault(entry.category, []).append(item)
+    assert shopping_list.groups == {category: sorted(items) for category, items in groups.items()}
+    assert sorted(shopping_list.not_found) == sorted(not_found)
+    assert shopping_list.total_quantity == sum(entry.quantity for entry in shopping_list.entries.values())
+    assert shopping_list.category_count == len(groups)
+    for item in shopping_list.entries:
+        assert shopping_list.find(item) == item
+
+
+def test_groups_stay_sorted_and_counted():
+    shopping_list = ShoppingList()
+    shopping_list.update({"milk": DAIRY, "cheese": DAIRY, "bananas": FRUITS}, {"milk": 2})
+    shopping_list.add("butter", DAIRY, 3)
+    assert shopping_list.groups == {"dairy": ["butter", "cheese", "milk"], "fruits": ["bananas"]}
+    assert shopping_list.total_quantity == 7
+    assert [category for category, _ in shopping_list.grouped(["fruits", "dairy"])] == ["fruits", "dairy"]
+    assert_consistent(shopping_list)
+
+
+def test_repeated_add_keeps_quantity_unless_given():
+    shopping_list = ShoppingList()
+    shopping_list.add("milk", DAIRY, 4)
+    shopping_list.add("milk", DAIRY)
+    assert shopping_list.get("milk").quantity == 4
+    shopping_list.add("milk", DAIRY, 1)
+    assert shopping_list.get("milk").quantity == 1
+    assert shopping_list.total_quantity == 1
+    assert_consistent(shopping_list)
+
+
+def test_zero_quantity_removes_and_empty_group_goes():
+    shopping_list = ShoppingList()
+    shopping_list.add("milk", DAIRY, 2)
+    shopping_list.add("bananas", FRUITS)
+    shopping_list.set_quantity("milk", 0)
+    assert "milk" not in shopping_list
+    assert "dairy" not in shopping_list.groups
+    assert shopping_list.total_quantity == 1
+    assert not shopping_list.remove("milk")
+    assert_consistent(shopping_list)
+
+
+def test_item_moved_by_the_catalog_changes_group():
+    shopping_list = ShoppingList()
+    shopping_list.add("yogurt", FRUITS)
+    shopping_list.add("yogurt", DAIRY)
+    assert shopping_list.groups == {"dairy": ["yogurt"]}
+    assert shopping_list.get("yogurt").shelf == DAIRY["shelf"]
+    assert_consistent(shopping_list)
+
+
+def test_not_found_items_keep_asking_order():
+    shopping_list = ShoppingList()
+    for item in ("zebra cakes", "moon rocks", "anchovies"):
+        shopping_list.add(item, UNKNOWN)
+    shopping_list.remove("moon rocks")
+    assert shopping_list.not_found == ["zebra cakes", "anchovies"]
+    assert UNKNOWN_CATEGORY not in shopping_list.groups
+    assert_consistent(shopping_list)
+
+
+def test_plural_forms_stay_findable():
+    shopping_list = ShoppingList()
+    shopping_list.add("apple", FRUITS)
+    shopping_list.add("apples", FRUITS, 2)
+    assert shopping_list.find("apple") == "apple"
+    shopping_list.remove("apple")
+    # The other entry with the same singular form is still found by either name
+    assert shopping_list.find("apple") == "apples"
+    assert shopping_list.find("apples") == "apples"
+    shopping_list.remove("apples")
+    assert shopping_list.find("apple") is None
+    assert shopping_list.folded == {}
+    assert_consistent(shopping_list)
+
+
+def test_clear_resets_everything():
+    shopping_list = ShoppingList()
+    shopping_list.update({"milk": DAIRY, "moon rocks": UNKNOWN})
+    shopping_list.clear()
+    assert not shopping_list
+    assert shopping_list.total_quantity == 0
+    assert (shopping_list.groups, shopping_list.not_found, shopping_list.folded) == ({}, [], {})
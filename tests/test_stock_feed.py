@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from assistant_engine import AssistantEngine
+from stock_feed import StockFeed, StockSnapshot, parse_update
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "the feed did not apply the updates in time"
+        time.sleep(0.01)
+
+
+def test_parse_update():
+    assert parse_update('{"item": "Apples", "quantity": 12}') == ("apple", 12, 0)
+    assert parse_update('{"item": "milk", "delta": -1}') == ("milk", None, -1)
+    for line in ('not json', '{"quantity": 1}', '{"item": "milk"}', '{"item": "milk", "delta": 1.5}',
+                 '{"item": "milk", "quantity": true}', '{"item": " ", "quantity": 1}'):
+        with pytest.raises(ValueError):
+            parse_update(line)
+
+
+def test_updated_snapshot_leaves_the_old_one_alone():
+    old = StockSnapshot({"milk": 3})
+    new = old.updated({"milk": 0, "apple": 5}, updates=2)
+    assert dict(old.levels) == {"milk": 3}
+    assert dict(new.levels) == {"milk": 0, "apple": 5}
+    assert new.version > old.version
+    assert new.level("Apples") == 5
+    assert new.level("bread") is None
+    assert new.info()["out_of_stock"] == 1
+
+
+def test_annotate_copies_tracked_results():
+    snapshot = StockSnapshot({"milk": 0, "soda": 4})
+    milk = {"shelf": "Shelf 2", "category": "dairy"}
+    pop = {"shelf": "Shelf 6", "category": "beverages", "matched": "soda"}
+    bread = {"shelf": "Shelf 3", "category": "bakery"}
+    unknown = {"shelf": "Not found", "category": "unknown"}
+    annotated = snapshot.annotate({"milk": milk, "pop": pop, "bread": bread, "soda": unknown})
+    assert annotated["milk"] == dict(milk, stock=0, in_stock=False)
+    assert annotated["pop"] == dict(pop, stock=4, in_stock=True)
+    # Untracked and unknown items pass through unchanged; shared result dicts are never modified
+    assert annotated["bread"] is bread and annotated["soda"] is unknown
+    assert "stock" not in milk
+
+
+def test_feed_applies_quantities_and_deltas():
+    engine = AssistantEngine()
+    feed = StockFeed(engine, interval=0.01).start()
+    try:
+        first = engine.stock
+        feed.push(['{"item": "milk", "quantity": 5}', '{"item": "milk", "delta": -2}',
+                   '{"item": "eggs", "delta": -1}', 'garbage', '{"item": "Apples", "quantity": 7}'])
+        wait_for(lambda: engine.stock is not first)
+        assert dict(engine.stock.levels) == {"milk": 3, "egg": 0, "apple": 7}
+        assert feed.rejected == 1
+
+        # A later delta starts from the level in the live snapshot
+        second = engine.stock
+        feed.push(['{"item": "apple", "delta": -3}'])
+        wait_for(lambda: engine.stock is not second)
+        assert engine.stock.level("apples") == 4
+        assert engine.stock.level("milk") == 3
+        assert dict(second.levels)["apple"] == 7
+    finally:
+        feed.stop()
+
+
+def test_feed_reads_appended_file_lines(tmp_path):
+    path = tmp_path / "stock.jsonl"
+    path.write_text('{"item": "bread", "quantity": 2}\n{"item": "bread", "del')
+    engine = AssistantEngine()
+    feed = StockFeed(engine, path=str(path), interval=0.01).start()
+    try:
+        wait_for(lambda: engine.stock.level("bread") == 2)
+        # The half-written line is only applied once its newline arrives
+        with open(path, "a") as f:
+            f.write('ta": -1}\n')
+        wait_for(lambda: engine.stock.level("bread") == 1)
+        assert feed.rejected == 0
+    finally:
+        feed.stop()
@@ -0,0 +1,41 @@
+import json
+import os
+
+from typeahead import SCAN_LIMIT, Typeahead, catalog_terms
+
+PRODUCTS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "products.json")
+
+
+def catalog_typeahead(popularity=None):
+    with open(PRODUCTS, encoding="utf-8") as f:
+        typeahead = Typeahead(popularity)
+        typeahead.rebuild(catalog_terms(json.load(f)))
+    return typeahead
+
+
+def test_suggestions_complete_the_last_word():
+    typeahead = catalog_typeahead()
+    assert (0, "milk") in typeahead.suggest("mi")
+    # Later words of a term count too, and the start says where the completion goes
+    assert (7, "toilet paper") in typeahead.suggest("I need pa")
+    assert typeahead.suggest("ice cr") == [(0, "ice cream")]
+    assert typeahead.suggest("m") == [] and typeahead.suggest("milk ") == []
+
+
+def test_popular_items_come_first():
+    typeahead = catalog_typeahead({"bananas": 1})
+    assert typeahead.suggest("ba")[0] == (0, "bananas")
+    # Asked-for items arrive lemmatized; "bagel" overtakes "bananas" once asked for more
+    typeahead.record("bagel", 3)
+    assert typeahead.suggest("ba")[0][1].startswith("bagel")
+
+
+def test_large_ranges_stay_ranked_as_popularity_changes():
+    terms = [f"item {number:04d}" for number in range(SCAN_LIMIT * 2)]
+    typeahead = Typeahead()
+    typeahead.rebuild(terms)
+    assert "it" in typeahead.index.top
+    assert [term for _, term in typeahead.suggest("it")] == terms[:5]
+    typeahead.record("item 0300", 2)
+    typeahead.record("item 0400")
+    assert [term for _, term in typeahead.suggest("it", 3)] == ["item 0300", "item 0400", "item 0000"]
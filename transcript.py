@@ -0,0 +1,85 @@
+import tkinter as tk
+from tkinter import ttk
+from collections import deque
+
+# Default number of messages kept on screen before the oldest are dropped
+MAX_HISTORY = 500
+
+
+class TextTranscript:
+    """Chat transcript drawn into a single tagged Text widget.
+
+    Adding a message is a couple of inserts into the Text B-tree, so its cost
+    does not depend on how long the session has been running. Only the last
+    ``max_history`` messages are kept; older ones are deleted from the top.
+    """
+
+    def __init__(self, parent, max_history: int = MAX_HISTORY):
+        if max_history < 1:
+            raise ValueError("max_history must be at least 1")
+        self.max_history = max_history
+        self.message_marks = deque()
+        self.message_count = 0
+
+        self.text = tk.Text(parent, bg="#F5F5F5", relief="flat", wrap=tk.WORD,
+                            font=("Arial", 11), padx=10, pady=10,
+                            cursor="arrow", highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.text.yview)
+        self.text.configure(yscrollcommand=self.scrollbar.set)
+        self.text.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        # User bubbles on the right in blue, assistant bubbles on the left in white
+        self.text.tag_configure("user", justify=tk.RIGHT, lmargin1=200, lmargin2=200, rmargin=15,
+                                background="#1976D2", foreground="white",
+                                spacing1=8, spacing3=2)
+        self.text.tag_configure("user_time", justify=tk.RIGHT, rmargin=15, font=("Arial", 8),
+                                foreground="#888888", spacing3=8)
+        self.text.tag_configure("assistant", justify=tk.LEFT, lmargin1=15, lmargin2=45, rmargin=200,
+                                background="white", foreground="#333333",
+                                spacing1=8, spacing3=2)
+        self.text.tag_configure("assistant_time", justify=tk.LEFT, lmargin1=45, font=("Arial", 8),
+                                foreground="#888888", spacing3=8)
+        self.text.tag_configure("bold", font=("Arial", 11, "bold"))
+        self.text.configure(state=tk.DISABLED)
+
+    def add_message(self, sender: str, message: str, timestamp: str):
+        tag = "user" if sender == "user" else "assistant"
+        avatar = "👤" if sender == "user" else "🤖"
+
+        self.text.configure(state=tk.NORMAL)
+        mark = f"message{self.message_count}"
+        self.message_count += 1
+        self.text.mark_set(mark, "end-1c")
+        self.text.mark_gravity(mark, tk.LEFT)
+        self.message_marks.append(mark)
+
+        if sender == "user":
+            self._insert_formatted(message, tag)
+            self.text.insert(tk.END, f" {avatar}\n", tag)
+        else:
+            self.text.insert(tk.END, f"{avatar} ", tag)
+            self._insert_formatted(message, tag)
+            self.text.insert(tk.END, "\n", tag)
+        self.text.insert(tk.END, f"{timestamp}\n", f"{tag}_time")
+
+        while len(self.message_marks) > self.max_history:
+            self.text.delete("1.0", self.message_marks[1])
+            self.text.mark_unset(self.message_marks.popleft())
+
+        self.text.configure(state=tk.DISABLED)
+        self.text.see(tk.END)
+
+    def _insert_formatted(self, message: str, tag: str):
+        # Render the **bold** markers used in assistant messages
+        for position, part in enumerate(message.split("**")):
+            if part:
+                self.text.insert(tk.END, part, (tag, "bold") if position % 2 else tag)
+
+    def clear(self):
+        self.text.configure(state=tk.NORMAL)
+        self.text.delete("1.0", tk.END)
+        for mark in self.message_marks:
+            self.text.mark_unset(mark)
+        self.message_marks.clear()
+        self.text.configure(state=tk.DISABLED)
@@ -0,0 +1,167 @@
+"""Typeahead suggestions for the message box.
+
+Catalog terms are kept as one sorted array of lowercase keys: every term
+under its full name, and multi-word terms also under each later word
+("toilet paper" is found from "pa"). A prefix is a bisect range of that
+array. Ranges small enough to rank on every keystroke are scanned. Larger
+ones, the short prefixes of a big catalog, get their best terms computed
+when the index is built, and those lists are kept current as popularity
+changes. No spaCy and no catalog lookups are involved.
+"""
+import bisect
+import heapq
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from catalog_index import fold_plural
+
+# Characters typed before anything is suggested
+MIN_PREFIX = 2
+
+# Suggestions shown under the message box
+MAX_SUGGESTIONS = 5
+
+# Ranges up to this size are ranked on every keystroke; larger ones are ranked in advance
+SCAN_LIMIT = 256
+
+# Best terms kept for each large range
+CACHED_SUGGESTIONS = 10
+
+WORD_PATTERN = re.compile(r"[a-z0-9][a-z0-9'&-]*")
+
+
+def catalog_terms(products_db) -> List[str]:
+    """Every item name in a products_db (products.json or a compiled catalog)"""
+    return [item for data in products_db.values() for item in data["items"]]
+
+def popularity_key(term: str) -> str:
+    # Asked-for items arrive lemmatized ("apple"), catalog terms may be plural ("apples")
+    return fold_plural(term.strip().lower())
+
+def _keys(term: str) -> List[str]:
+    words = term.split()
+    return [" ".join(words[start:]) for start in range(len(words))]
+
+
+class PrefixIndex:
+    """Sorted-array prefix index over one catalog version's terms"""
+
+    def __init__(self, terms: Iterable[str], popularity: Dict[str, int]):
+        self.popularity = popularity
+        entries = set()
+        # popularity key -> catalog terms, so a recorded "apple" can move "apples" up
+        self.by_key: Dict[str, List[str]] = {}
+        for term in terms:
+            term = " ".join(term.lower().split())
+            if not term:
+                continue
+            for key in _keys(term):
+                entries.add((key, term))
+            variants = self.by_key.setdefault(popularity_key(term), [])
+            if term not in variants:
+                variants.append(term)
+        ordered = sorted(entries)
+        self.keys = [key for key, _ in ordered]
+        self.targets = [term for _, term in ordered]
+        self.top: Dict[str, List[str]] = {}
+        self._rank_large_ranges()
+
+    def __len__(self):
+        return len(self.by_key)
+
+    def rank(self, term: str) -> Tuple[int, int, str]:
+        # Most asked-for first, then the shorter (more general) name; terms are already lowercase
+        return (-self.popularity.get(fold_plural(term), 0), len(term), term)
+
+    def _range(self, prefix: str) -> Tuple[int, int]:
+        low = bisect.bisect_left(self.keys, prefix)
+        return low, bisect.bisect_left(self.keys, prefix + "\uffff", low)
+
+    def _best(self, low: int, high: int, limit: int, rank=None) -> List[str]:
+        return heapq.nsmallest(limit, set(self.targets[low:high]), key=rank or self.rank)
+
+    def _rank_large_ranges(self):
+        # Ranking every term once and comparing positions is much cheaper than ranking per range
+        position = {term: number for number, term in enumerate(sorted(set(self.targets), key=self.rank))}
+        prefixes = {key[:MIN_PREFIX] for key in self.keys if len(key) >= MIN_PREFIX}
+        while prefixes:
+            longer = set()
+            for prefix in prefixes:
+                low, high = self._range(prefix)
+                if high - low > SCAN_LIMIT:
+                    self.top[prefix] = self._best(low, high, CACHED_SUGGESTIONS, position.__getitem__)
+                    size = len(prefix) + 1
+                    longer.update(key[:size] for key in self.keys[low:high] if len(key) >= size)
+            prefixes = longer
+
+    def complete(self, prefix: str, limit: int = MAX_SUGGESTIONS) -> List[str]:
+        """The best ``limit`` terms starting with ``prefix`` (or with a word that does)"""
+        prefix = " ".join(prefix.lower().split())
+        if len(prefix) < MIN_PREFIX:
+            return []
+        ranked = self.top.get(prefix)
+        if ranked is not None:
+            return ranked[:limit]
+        low, high = self._range(prefix)
+        return self._best(low, high, limit) if high > low else []
+
+    def promote(self, key: str):
+        """Re-rank the cached lists after ``key`` became more popular"""
+        for term in self.by_key.get(key, ()):
+            for entry in _keys(term):
+                for size in range(MIN_PREFIX, len(entry) + 1):
+                    ranked = self.top.get(entry[:size])
+                    if ranked is None:
+                        continue
+                    if term in ranked or len(ranked) < CACHED_SUGGESTIONS or self.rank(term) < self.rank(ranked[-1]):
+                        # A new list is swapped in, so a reader never sees one half-sorted
+                        self.top[entry[:size]] = sorted(set(ranked) | {term}, key=self.rank)[:CACHED_SUGGESTIONS]
+
+
+class Typeahead:
+    """Suggestions for the message being typed, ranked by how often items are asked for.
+
+    ``rebuild`` runs off the Tk thread whenever a catalog is loaded; the
+    new index replaces the old one with a single assignment. Popularity is
+    kept across catalog versions.
+    """
+
+    def __init__(self, popularity: Optional[Dict[str, int]] = None):
+        self.popularity: Dict[str, int] = {}
+        for term, count in (popularity or {}).items():
+            key = popularity_key(term)
+            self.popularity[key] = self.popularity.get(key, 0) + count
+        self.index: Optional[PrefixIndex] = None
+
+    def rebuild(self, terms: Iterable[str]):
+        self.index = PrefixIndex(terms, self.popularity)
+
+    def record(self, term: str, count: int = 1):
+        """Count one more request for ``term``"""
+        key = popularity_key(term)
+        self.popularity[key] = self.popularity.get(key, 0) + count
+        index = self.index
+        if index is not None:
+            index.promote(key)
+
+    def suggest(self, text: str, limit: int = MAX_SUGGESTIONS) -> List[Tuple[int, str]]:
+        """(start, term) pairs for the word being typed at the end of ``text``.
+
+        ``text[:start] + term`` completes the message; two-word prefixes
+        ("ice cr") are tried before the last word alone.
+        """
+        index = self.index
+        if index is None or not text or not text[-1].isalnum():
+            return []
+        words = list(WORD_PATTERN.finditer(text.lower()))
+        if not words or words[-1].end() != len(text):
+            return []
+        starts = [words[-1].start()]
+        if len(words) > 1 and not text[words[-2].end():words[-1].start()].strip():
+            starts.insert(0, words[-2].start())
+        for start in starts:
+            terms = index.complete(text[start:], limit)
+            # "ice cr" offers "ice cream" only, not "ice crackers"
+            if terms:
+                return [(start, term) for term in terms]
+        return []